@@ -0,0 +1,222 @@
+-- BaseDatos/benchmarks/resumen_ejecutivo.sql
+-- Compara el resumen ejecutivo del dashboard antes (seis consultas, con
+-- MONTH()/YEAR() sobre facturas) y después (la consulta única de
+-- DashboardAvanzado.get_executive_summary: ventas/gastos del mes desde
+-- resumen_mensual_facturas, rangos de fecha y el resto como agregados
+-- en CROSS JOIN) sobre tablas sintéticas.
+--
+-- Se ejecuta en una base de pruebas (crea y borra tablas dbo.bench_*):
+--   sqlcmd -S .\SQLEXPRESS -d ContaPruebas -i BaseDatos\benchmarks\resumen_ejecutivo.sql
+--
+-- Al final muestra, por consulta, lecturas lógicas y milisegundos de la
+-- segunda ejecución (caché caliente), medidos con sys.dm_exec_requests de
+-- la propia sesión. Copiar esa tabla en la sección RESULTADOS de abajo
+-- al correrlo en el servidor de referencia.
+--
+-- RESULTADOS
+--   Pendiente de medir en un SQL Server: el script todavía no se ejecutó
+--   sobre la tabla de 2 millones de filas.
+SET NOCOUNT ON;
+
+DECLARE @filas INT = 2000000;   -- facturas sintéticas (diez años)
+
+IF OBJECT_ID('dbo.bench_facturas', 'U') IS NOT NULL DROP TABLE dbo.bench_facturas;
+IF OBJECT_ID('dbo.bench_resumen_mensual_facturas', 'U') IS NOT NULL DROP TABLE dbo.bench_resumen_mensual_facturas;
+IF OBJECT_ID('dbo.bench_movimientos_bancarios', 'U') IS NOT NULL DROP TABLE dbo.bench_movimientos_bancarios;
+IF OBJECT_ID('dbo.bench_cuentas_bancarias', 'U') IS NOT NULL DROP TABLE dbo.bench_cuentas_bancarias;
+IF OBJECT_ID('dbo.bench_conciliaciones', 'U') IS NOT NULL DROP TABLE dbo.bench_conciliaciones;
+
+CREATE TABLE dbo.bench_facturas (
+    id_factura INT IDENTITY(1,1) PRIMARY KEY,
+    tipo VARCHAR(10) NOT NULL,
+    fecha DATE NOT NULL,
+    fecha_vencimiento DATE NULL,
+    id_cliente INT NULL,
+    total DECIMAL(18, 2) NOT NULL,
+    estatus VARCHAR(20) NOT NULL
+);
+
+-- Diez años de facturas repartidas al azar
+WITH n AS (
+    SELECT TOP (@filas) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS i
+    FROM sys.all_objects a CROSS JOIN sys.all_objects b CROSS JOIN sys.all_objects c
+)
+INSERT INTO dbo.bench_facturas (tipo, fecha, fecha_vencimiento, id_cliente, total, estatus)
+SELECT
+    CASE WHEN i % 3 = 0 THEN 'egreso' ELSE 'ingreso' END,
+    DATEADD(day, -(ABS(CHECKSUM(NEWID())) % 3650), CAST(GETDATE() AS date)),
+    NULL,
+    CASE WHEN i % 3 = 0 THEN NULL ELSE ABS(CHECKSUM(NEWID())) % 5000 + 1 END,
+    CAST(ABS(CHECKSUM(NEWID())) % 100000 AS DECIMAL(18, 2)) / 10,
+    CASE WHEN i % 20 = 0 THEN 'cancelada' ELSE 'activa' END
+FROM n;
+
+UPDATE dbo.bench_facturas SET fecha_vencimiento = DATEADD(day, 30, fecha);
+
+-- Mismos índices que facturas (BaseDatos.sql + migración 0001)
+CREATE NONCLUSTERED INDEX idx_bench_fecha ON dbo.bench_facturas (fecha);
+CREATE NONCLUSTERED INDEX idx_bench_estatus_vencimiento ON dbo.bench_facturas (estatus, fecha_vencimiento)
+    INCLUDE (tipo, total);
+
+-- resumen_mensual_facturas (migración 0002), cargado igual que allí
+CREATE TABLE dbo.bench_resumen_mensual_facturas (
+    periodo INT NOT NULL,
+    tipo VARCHAR(10) NOT NULL,
+    estatus VARCHAR(20) NOT NULL,
+    total DECIMAL(18, 2) NOT NULL,
+    cantidad INT NOT NULL,
+    PRIMARY KEY CLUSTERED (periodo, tipo, estatus)
+);
+INSERT INTO dbo.bench_resumen_mensual_facturas (periodo, tipo, estatus, total, cantidad)
+SELECT YEAR(fecha) * 100 + MONTH(fecha), tipo, estatus, SUM(total), COUNT(*)
+FROM dbo.bench_facturas
+GROUP BY YEAR(fecha) * 100 + MONTH(fecha), tipo, estatus;
+
+-- Bancos y conciliaciones: tamaños chicos, iguales en ambas variantes
+CREATE TABLE dbo.bench_cuentas_bancarias (
+    id_cuenta_bancaria INT PRIMARY KEY
+);
+INSERT INTO dbo.bench_cuentas_bancarias (id_cuenta_bancaria)
+SELECT TOP (10) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) FROM sys.all_objects;
+
+CREATE TABLE dbo.bench_movimientos_bancarios (
+    id_movimiento INT IDENTITY(1,1) PRIMARY KEY,
+    id_cuenta_bancaria INT NOT NULL,
+    monto DECIMAL(18, 2) NOT NULL,
+    conciliado BIT NOT NULL
+);
+INSERT INTO dbo.bench_movimientos_bancarios (id_cuenta_bancaria, monto, conciliado)
+SELECT TOP (200000)
+    ABS(CHECKSUM(NEWID())) % 10 + 1,
+    CAST(CHECKSUM(NEWID()) % 100000 AS DECIMAL(18, 2)) / 10,
+    CASE WHEN ABS(CHECKSUM(NEWID())) % 4 = 0 THEN 0 ELSE 1 END
+FROM sys.all_objects a CROSS JOIN sys.all_objects b;
+
+CREATE TABLE dbo.bench_conciliaciones (
+    id_conciliacion INT IDENTITY(1,1) PRIMARY KEY,
+    estatus VARCHAR(20) NOT NULL
+);
+INSERT INTO dbo.bench_conciliaciones (estatus)
+SELECT TOP (2000) CASE WHEN ABS(CHECKSUM(NEWID())) % 5 = 0 THEN 'pendiente' ELSE 'conciliada' END
+FROM sys.all_objects a CROSS JOIN sys.all_objects b;
+
+DBCC FREEPROCCACHE;
+
+-- ========================
+-- MEDICIÓN
+-- ========================
+-- Cada consulta corre dos veces; se guarda la segunda. Las lecturas
+-- lógicas son la diferencia del contador de la solicitud en curso.
+CREATE TABLE #resultados (
+    variante VARCHAR(10) NOT NULL,
+    consulta VARCHAR(40) NOT NULL,
+    lecturas_logicas BIGINT NOT NULL,
+    ms INT NOT NULL
+);
+
+DECLARE @vuelta INT, @lecturas BIGINT, @inicio DATETIME2;
+DECLARE @d1 DECIMAL(18, 2), @d2 DECIMAL(18, 2), @d3 DECIMAL(18, 2), @d4 DECIMAL(18, 2);
+DECLARE @n1 INT, @n2 INT, @n3 INT, @n4 INT;
+
+SET @vuelta = 1;
+WHILE @vuelta <= 2
+BEGIN
+    -- === ANTES: seis consultas, MONTH()/YEAR() ===
+    SELECT @lecturas = logical_reads, @inicio = SYSDATETIME() FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+    SELECT @d1 = ISNULL(SUM(total), 0) FROM dbo.bench_facturas
+    WHERE tipo = 'ingreso' AND estatus = 'activa'
+    AND MONTH(fecha) = MONTH(GETDATE()) AND YEAR(fecha) = YEAR(GETDATE());
+    IF @vuelta = 2
+        INSERT INTO #resultados SELECT 'antes', 'total_ventas', logical_reads - @lecturas, DATEDIFF(ms, @inicio, SYSDATETIME())
+        FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+
+    SELECT @lecturas = logical_reads, @inicio = SYSDATETIME() FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+    SELECT @d2 = ISNULL(SUM(total), 0) FROM dbo.bench_facturas
+    WHERE tipo = 'egreso' AND estatus = 'activa'
+    AND MONTH(fecha) = MONTH(GETDATE()) AND YEAR(fecha) = YEAR(GETDATE());
+    IF @vuelta = 2
+        INSERT INTO #resultados SELECT 'antes', 'total_gastos', logical_reads - @lecturas, DATEDIFF(ms, @inicio, SYSDATETIME())
+        FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+
+    SELECT @lecturas = logical_reads, @inicio = SYSDATETIME() FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+    SELECT @d3 = ISNULL(SUM(CASE WHEN mb.monto >= 0 THEN mb.monto ELSE 0 END), 0),
+           @d4 = ISNULL(SUM(CASE WHEN mb.monto < 0 THEN ABS(mb.monto) ELSE 0 END), 0)
+    FROM dbo.bench_movimientos_bancarios mb
+    INNER JOIN dbo.bench_cuentas_bancarias cb ON mb.id_cuenta_bancaria = cb.id_cuenta_bancaria
+    WHERE mb.conciliado = 1;
+    IF @vuelta = 2
+        INSERT INTO #resultados SELECT 'antes', 'saldo_bancos', logical_reads - @lecturas, DATEDIFF(ms, @inicio, SYSDATETIME())
+        FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+
+    SELECT @lecturas = logical_reads, @inicio = SYSDATETIME() FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+    SELECT @n1 = ISNULL(COUNT(DISTINCT id_cliente), 0) FROM dbo.bench_facturas
+    WHERE id_cliente IS NOT NULL AND fecha >= DATEADD(day, -90, GETDATE());
+    IF @vuelta = 2
+        INSERT INTO #resultados SELECT 'antes', 'clientes_activos', logical_reads - @lecturas, DATEDIFF(ms, @inicio, SYSDATETIME())
+        FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+
+    SELECT @lecturas = logical_reads, @inicio = SYSDATETIME() FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+    SELECT @n2 = ISNULL(COUNT(*), 0) FROM dbo.bench_facturas
+    WHERE estatus = 'activa' AND fecha_vencimiento IS NOT NULL AND fecha_vencimiento < GETDATE();
+    IF @vuelta = 2
+        INSERT INTO #resultados SELECT 'antes', 'facturas_pendientes', logical_reads - @lecturas, DATEDIFF(ms, @inicio, SYSDATETIME())
+        FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+
+    SELECT @lecturas = logical_reads, @inicio = SYSDATETIME() FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+    SELECT @n3 = ISNULL(COUNT(*), 0) FROM dbo.bench_conciliaciones WHERE estatus = 'pendiente';
+    IF @vuelta = 2
+        INSERT INTO #resultados SELECT 'antes', 'conciliaciones_pendientes', logical_reads - @lecturas, DATEDIFF(ms, @inicio, SYSDATETIME())
+        FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+
+    -- === DESPUÉS: la consulta de get_executive_summary ===
+    SELECT @lecturas = logical_reads, @inicio = SYSDATETIME() FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+    SELECT @d1 = m.total_ventas, @d2 = m.total_gastos, @n1 = f.clientes_activos,
+           @n2 = v.facturas_pendientes, @d3 = b.saldo_bancos, @n3 = c.conciliaciones_pendientes
+    FROM (
+        SELECT
+            ISNULL(SUM(CASE WHEN tipo = 'ingreso' THEN total END), 0) AS total_ventas,
+            ISNULL(SUM(CASE WHEN tipo = 'egreso' THEN total END), 0) AS total_gastos
+        FROM dbo.bench_resumen_mensual_facturas
+        WHERE periodo = YEAR(GETDATE()) * 100 + MONTH(GETDATE())
+        AND estatus = 'activa'
+    ) m
+    CROSS JOIN (
+        SELECT COUNT(DISTINCT id_cliente) AS clientes_activos
+        FROM dbo.bench_facturas
+        WHERE fecha >= DATEADD(day, -90, GETDATE())
+    ) f
+    CROSS JOIN (
+        SELECT COUNT(*) AS facturas_pendientes
+        FROM dbo.bench_facturas
+        WHERE estatus = 'activa'
+        AND fecha_vencimiento < GETDATE()
+    ) v
+    CROSS JOIN (
+        SELECT ISNULL(SUM(mb.monto), 0) AS saldo_bancos
+        FROM dbo.bench_movimientos_bancarios mb
+        INNER JOIN dbo.bench_cuentas_bancarias cb ON mb.id_cuenta_bancaria = cb.id_cuenta_bancaria
+        WHERE mb.conciliado = 1
+    ) b
+    CROSS JOIN (
+        SELECT COUNT(*) AS conciliaciones_pendientes
+        FROM dbo.bench_conciliaciones
+        WHERE estatus = 'pendiente'
+    ) c;
+    IF @vuelta = 2
+        INSERT INTO #resultados SELECT 'despues', 'resumen_completo', logical_reads - @lecturas, DATEDIFF(ms, @inicio, SYSDATETIME())
+        FROM sys.dm_exec_requests WHERE session_id = @@SPID;
+
+    SET @vuelta += 1;
+END
+
+SELECT variante, consulta, lecturas_logicas, ms FROM #resultados
+UNION ALL
+SELECT variante, 'TOTAL', SUM(lecturas_logicas), SUM(ms) FROM #resultados GROUP BY variante
+ORDER BY variante, consulta;
+
+DROP TABLE #resultados;
+DROP TABLE dbo.bench_conciliaciones;
+DROP TABLE dbo.bench_movimientos_bancarios;
+DROP TABLE dbo.bench_cuentas_bancarias;
+DROP TABLE dbo.bench_resumen_mensual_facturas;
+DROP TABLE dbo.bench_facturas;
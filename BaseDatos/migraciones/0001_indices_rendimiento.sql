@@ -0,0 +1,47 @@
+-- BaseDatos/migraciones/0001_indices_rendimiento.sql
+-- Índices para los filtros más usados por dashboard, mayor general,
+-- registro de saldos y alertas. Cada índice se crea solo si no existe,
+-- así el script puede aplicarse sobre instalaciones que ya lo tengan.
+
+-- Movimientos por cuenta y rango de fechas (mayor, saldos, inactividad)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'idx_asientos_cuenta_fecha' AND object_id = OBJECT_ID('dbo.asientos_contables'))
+    CREATE NONCLUSTERED INDEX [idx_asientos_cuenta_fecha] ON [dbo].[asientos_contables]
+    (
+        [id_cuenta] ASC,
+        [fecha] ASC
+    )
+    INCLUDE ([debe], [haber])
+GO
+
+-- Listado y resumen de comprobantes ordenados por fecha
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'idx_comprobantes_fecha_creado' AND object_id = OBJECT_ID('dbo.comprobantes'))
+    CREATE NONCLUSTERED INDEX [idx_comprobantes_fecha_creado] ON [dbo].[comprobantes]
+    (
+        [fecha] ASC,
+        [creado_en] ASC
+    )
+    INCLUDE ([estado], [total])
+GO
+
+-- Facturas vencidas / activas (alertas, cuentas por cobrar)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'idx_facturas_estatus_vencimiento' AND object_id = OBJECT_ID('dbo.facturas'))
+    CREATE NONCLUSTERED INDEX [idx_facturas_estatus_vencimiento] ON [dbo].[facturas]
+    (
+        [estatus] ASC,
+        [fecha_vencimiento] ASC
+    )
+    INCLUDE ([tipo], [total])
+GO
+
+-- Conciliaciones pendientes
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'idx_conciliaciones_estatus' AND object_id = OBJECT_ID('dbo.conciliaciones'))
+    CREATE NONCLUSTERED INDEX [idx_conciliaciones_estatus] ON [dbo].[conciliaciones]
+    (
+        [estatus] ASC
+    )
+    INCLUDE ([id_cuenta_bancaria], [fecha_fin], [diferencia])
+GO
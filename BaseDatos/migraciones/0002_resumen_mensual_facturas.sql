@@ -0,0 +1,25 @@
+-- BaseDatos/migraciones/0002_resumen_mensual_facturas.sql
+-- Totales mensuales de facturas por tipo y estatus. Los mantienen las
+-- escrituras de models/factura.py (ver models/resumen_facturas.py) y se
+-- pueden reconstruir con `flask --app app resumen-facturas`.
+
+IF OBJECT_ID('dbo.resumen_mensual_facturas', 'U') IS NULL
+    CREATE TABLE [dbo].[resumen_mensual_facturas] (
+        [periodo] [int] NOT NULL,                -- AAAAMM, como saldos_cuentas
+        [tipo] [varchar](10) NOT NULL,
+        [estatus] [varchar](20) NOT NULL,
+        [total] [decimal](18, 2) NOT NULL DEFAULT 0,
+        [cantidad] [int] NOT NULL DEFAULT 0,
+        [actualizado_en] [datetime2] NOT NULL DEFAULT SYSDATETIME(),
+        CONSTRAINT [PK_resumen_mensual_facturas] PRIMARY KEY CLUSTERED ([periodo], [tipo], [estatus])
+    )
+GO
+
+-- Carga inicial desde las facturas existentes
+DELETE FROM dbo.resumen_mensual_facturas
+GO
+INSERT INTO dbo.resumen_mensual_facturas (periodo, tipo, estatus, total, cantidad)
+SELECT YEAR(fecha) * 100 + MONTH(fecha), tipo, ISNULL(estatus, ''), SUM(total), COUNT(*)
+FROM dbo.facturas
+GROUP BY YEAR(fecha) * 100 + MONTH(fecha), tipo, ISNULL(estatus, '')
+GO
@@ -0,0 +1,24 @@
+-- BaseDatos/migraciones/0003_alertas.sql
+-- Alertas del sistema precalculadas. Las mantiene models/alertas.py: un
+-- recálculo periódico (`flask --app app alertas`) y las escrituras de
+-- facturas y asientos, que revisan solo el registro que cambiaron.
+
+IF OBJECT_ID('dbo.alertas', 'U') IS NULL
+    CREATE TABLE [dbo].[alertas] (
+        [id_alerta] [int] IDENTITY(1,1) NOT NULL,
+        [tipo] [varchar](40) NOT NULL,
+        [clave] [varchar](100) NOT NULL,         -- registro que la origina (id de factura, tipo-folio, cuenta)
+        [descripcion] [nvarchar](300) NOT NULL,
+        [severidad] [tinyint] NOT NULL,          -- 3 alta, 2 media, 1 baja
+        [creada_en] [datetime2] NOT NULL DEFAULT SYSDATETIME(),
+        [actualizada_en] [datetime2] NOT NULL DEFAULT SYSDATETIME(),
+        CONSTRAINT [PK_alertas] PRIMARY KEY CLUSTERED ([id_alerta]),
+        CONSTRAINT [UQ_alertas_tipo_clave] UNIQUE ([tipo], [clave])
+    )
+GO
+
+-- Listado y top-N del dashboard: más severas y más recientes primero
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_alertas_severidad' AND object_id = OBJECT_ID('dbo.alertas'))
+    CREATE INDEX idx_alertas_severidad ON dbo.alertas (severidad DESC, creada_en DESC)
+        INCLUDE (tipo, descripcion)
+GO
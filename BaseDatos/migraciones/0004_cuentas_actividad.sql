@@ -0,0 +1,34 @@
+-- BaseDatos/migraciones/0004_cuentas_actividad.sql
+-- Actividad por cuenta: primera y última fecha con movimiento y cantidad
+-- de movimientos (total, últimos 30 y 90 días). La mantienen los asientos
+-- de models/comprobantes.py (ver models/cuentas_actividad.py) y se puede
+-- reconstruir con `flask --app app cuentas-actividad`.
+
+IF OBJECT_ID('dbo.cuentas_actividad', 'U') IS NULL
+    CREATE TABLE [dbo].[cuentas_actividad] (
+        [codigo] [varchar](20) NOT NULL,         -- cuentas_contables.codigo
+        [primera_fecha] [date] NOT NULL,
+        [ultima_fecha] [date] NOT NULL,
+        [movimientos] [int] NOT NULL,
+        [movimientos_30] [int] NOT NULL,         -- al momento de actualizado_en
+        [movimientos_90] [int] NOT NULL,
+        [actualizado_en] [datetime2] NOT NULL DEFAULT SYSDATETIME(),
+        CONSTRAINT [PK_cuentas_actividad] PRIMARY KEY CLUSTERED ([codigo])
+    )
+GO
+
+-- Cuentas inactivas: rango sobre la última fecha de movimiento
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_cuentas_actividad_ultima' AND object_id = OBJECT_ID('dbo.cuentas_actividad'))
+    CREATE INDEX idx_cuentas_actividad_ultima ON dbo.cuentas_actividad (ultima_fecha)
+GO
+
+-- Carga inicial desde los asientos existentes
+DELETE FROM dbo.cuentas_actividad
+GO
+INSERT INTO dbo.cuentas_actividad (codigo, primera_fecha, ultima_fecha, movimientos, movimientos_30, movimientos_90)
+SELECT id_cuenta, MIN(fecha), MAX(fecha), COUNT(*),
+       SUM(CASE WHEN fecha >= DATEADD(day, -30, CAST(GETDATE() AS date)) THEN 1 ELSE 0 END),
+       SUM(CASE WHEN fecha >= DATEADD(day, -90, CAST(GETDATE() AS date)) THEN 1 ELSE 0 END)
+FROM dbo.asientos_contables
+GROUP BY id_cuenta
+GO
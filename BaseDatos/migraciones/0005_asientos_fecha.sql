@@ -0,0 +1,15 @@
+-- BaseDatos/migraciones/0005_asientos_fecha.sql
+-- Libro diario: asientos de un rango de fechas en orden cronológico. La
+-- clave del índice agrupado (tipo, folio, consecutivo) va implícita
+-- detrás de la fecha, así el orden (fecha, tipo, folio, consecutivo) de
+-- la paginación por posición sale directo del índice, y los totales del
+-- periodo se calculan sin leer la tabla.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'idx_asientos_fecha' AND object_id = OBJECT_ID('dbo.asientos_contables'))
+    CREATE NONCLUSTERED INDEX [idx_asientos_fecha] ON [dbo].[asientos_contables]
+    (
+        [fecha] ASC
+    )
+    INCLUDE ([id_cuenta], [debe], [haber])
+GO
@@ -1,10 +1,17 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file #, jsonifyMODEL
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify, make_response, Response, stream_with_context
 from auth.login import authenticate_user
+from config.db import get_connection, get_pool_stats, init_app as init_db
+from utils.migraciones import init_app as init_migraciones
+from models.resumen_facturas import init_app as init_resumen_facturas
+from models.alertas import init_app as init_alertas, listar_alertas, alerta_a_dict
+from models.cuentas_actividad import init_app as init_cuentas_actividad
+from utils.listados import Listado, Filtro
 
 
 from models.factura import (
     listar_facturas,
+    iter_facturas,
     cancelar_factura_con_anulacion,
     cancelar_factura,
     crear_factura_db,
@@ -16,7 +23,10 @@ from models.factura import (
 
 
 from models.conciliacion import get_cuentas_bancarias, crear_conciliacion, listar_conciliaciones
-from models.dashboard_avanzado import DashboardAvanzado
+from models.dashboard_avanzado import (
+    DashboardAvanzado, WIDGETS, cache_dashboard, canal_dashboard, cargar_widgets,
+    server_timing, widget_json, etag_widget, parametros_widget
+)
 
 
 
@@ -28,13 +38,26 @@ from utils.export2 import exportar_asientos_a_excel
 from utils.pdf2 import exportar_asientos_a_pdf
 
 import io
+import json
 from io import BytesIO
+from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from urllib.parse import urlencode
 
 app = Flask(__name__)
 app.secret_key = 'tu_clave_secreta_muy_segura'  # Cambia en producción
 
+# Una conexión por solicitud, confirmada/revertida y devuelta al pool al terminar
+init_db(app)
+
+# Comandos `flask migrar` (BaseDatos/migraciones), `flask resumen-facturas`,
+# `flask cuentas-actividad` y `flask alertas` (más el recálculo periódico
+# de alertas)
+init_migraciones(app)
+init_resumen_facturas(app)
+init_cuentas_actividad(app)
+init_alertas(app)
+
 # ======================
 # INICIALIZAR DASHBOARD
 # ======================
@@ -232,7 +255,7 @@ def cancelar_factura_view(id_factura):
 # --- Exportaciones de facturas ---
 @app.route('/facturas/exportar')
 def exportar_facturas():
-    facturas = listar_facturas()
+    facturas = iter_facturas()
     output = exportar_facturas_a_excel(facturas)
     return send_file(
         io.BytesIO(output.getvalue()),
@@ -243,7 +266,7 @@ def exportar_facturas():
 
 @app.route('/facturas/exportar-pdf')
 def exportar_facturas_pdf():
-    facturas = listar_facturas()
+    facturas = iter_facturas()
     pdf_buffer = exportar_facturas_a_pdf(facturas)
     return send_file(
         pdf_buffer,
@@ -437,59 +460,45 @@ def anular_asiento_view(id_asiento):
     return redirect(url_for('ver_asiento', id_asiento=id_asiento))
 
 # --- Exportaciones de asientos ---
+LISTADO_ASIENTOS = Listado(
+    columnas="""
+        a.id_asiento, a.fecha, a.concepto, a.referencia,
+        d.nombre AS diario, u.nombre AS creador,
+        c.nombre AS cliente, pr.nombre AS proveedor
+    """,
+    origen="""asientos a
+        JOIN diarios d ON a.id_diario = d.id_diario
+        JOIN usuarios u ON a.id_usuario_creador = u.id_usuario
+        LEFT JOIN partidas p ON a.id_asiento = p.id_asiento
+        LEFT JOIN clientes c ON p.id_cliente = c.id_cliente
+        LEFT JOIN proveedores pr ON p.id_proveedor = pr.id_proveedor""",
+    filtros=[
+        Filtro('id_cliente', 'p.id_cliente', '=', 'entero'),
+        Filtro('id_proveedor', 'p.id_proveedor', '=', 'entero'),
+        Filtro('fecha_inicio', 'a.fecha', '>=', 'fecha'),
+        Filtro('fecha_fin', 'a.fecha', '<=', 'fecha'),
+        Filtro('concepto', 'a.concepto', 'LIKE'),
+    ],
+    ordenes={'fecha': "a.fecha DESC, a.id_asiento DESC"},
+    agrupar="a.id_asiento, a.fecha, a.concepto, a.referencia, d.nombre, u.nombre, c.nombre, pr.nombre",
+)
+
+def _filtros_asientos():
+    return {
+        'id_cliente': request.args.get('id_cliente', type=int),
+        'id_proveedor': request.args.get('id_proveedor', type=int),
+        'fecha_inicio': request.args.get('fecha_inicio'),
+        'fecha_fin': request.args.get('fecha_fin'),
+        'concepto': request.args.get('concepto', '').strip()
+    }
+
 @app.route('/asientos/exportar-excel')
 def exportar_asientos_excel():
     if session.get('rol_id') not in [1, 2]:
         flash('Acceso denegado', 'error')
         return redirect(url_for('menu'))
 
-    id_cliente = request.args.get('id_cliente', type=int)
-    id_proveedor = request.args.get('id_proveedor', type=int)
-    fecha_inicio = request.args.get('fecha_inicio')
-    fecha_fin = request.args.get('fecha_fin')
-    concepto = request.args.get('concepto', '').strip()
-
-    from config.db import get_connection
-    conn = get_connection()
-    cursor = conn.cursor()
-    query = """
-        SELECT 
-            a.id_asiento, a.fecha, a.concepto, a.referencia,
-            d.nombre AS diario, u.nombre AS creador,
-            c.nombre AS cliente, pr.nombre AS proveedor
-        FROM asientos a
-        JOIN diarios d ON a.id_diario = d.id_diario
-        JOIN usuarios u ON a.id_usuario_creador = u.id_usuario
-        LEFT JOIN partidas p ON a.id_asiento = p.id_asiento
-        LEFT JOIN clientes c ON p.id_cliente = c.id_cliente
-        LEFT JOIN proveedores pr ON p.id_proveedor = pr.id_proveedor
-        WHERE 1=1
-    """
-    params = []
-    if id_cliente:
-        query += " AND p.id_cliente = ?"
-        params.append(id_cliente)
-    if id_proveedor:
-        query += " AND p.id_proveedor = ?"
-        params.append(id_proveedor)
-    if fecha_inicio:
-        query += " AND a.fecha >= ?"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND a.fecha <= ?"
-        params.append(fecha_fin)
-    if concepto:
-        query += " AND a.concepto LIKE ?"
-        params.append(f"%{concepto}%")
-
-    query += """
-        GROUP BY a.id_asiento, a.fecha, a.concepto, a.referencia, d.nombre, u.nombre, c.nombre, pr.nombre
-        ORDER BY a.fecha DESC, a.id_asiento DESC
-    """
-
-    cursor.execute(query, params)
-    asientos = cursor.fetchall()
-    conn.close()
+    asientos = LISTADO_ASIENTOS.iterar(_filtros_asientos())
 
     output = exportar_asientos_a_excel(asientos)
     return send_file(
@@ -505,53 +514,7 @@ def exportar_asientos_pdf():
         flash('Acceso denegado', 'error')
         return redirect(url_for('menu'))
 
-    id_cliente = request.args.get('id_cliente', type=int)
-    id_proveedor = request.args.get('id_proveedor', type=int)
-    fecha_inicio = request.args.get('fecha_inicio')
-    fecha_fin = request.args.get('fecha_fin')
-    concepto = request.args.get('concepto', '').strip()
-
-    from config.db import get_connection
-    conn = get_connection()
-    cursor = conn.cursor()
-    query = """
-        SELECT 
-            a.id_asiento, a.fecha, a.concepto, a.referencia,
-            d.nombre AS diario, u.nombre AS creador,
-            c.nombre AS cliente, pr.nombre AS proveedor
-        FROM asientos a
-        JOIN diarios d ON a.id_diario = d.id_diario
-        JOIN usuarios u ON a.id_usuario_creador = u.id_usuario
-        LEFT JOIN partidas p ON a.id_asiento = p.id_asiento
-        LEFT JOIN clientes c ON p.id_cliente = c.id_cliente
-        LEFT JOIN proveedores pr ON p.id_proveedor = pr.id_proveedor
-        WHERE 1=1
-    """
-    params = []
-    if id_cliente:
-        query += " AND p.id_cliente = ?"
-        params.append(id_cliente)
-    if id_proveedor:
-        query += " AND p.id_proveedor = ?"
-        params.append(id_proveedor)
-    if fecha_inicio:
-        query += " AND a.fecha >= ?"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND a.fecha <= ?"
-        params.append(fecha_fin)
-    if concepto:
-        query += " AND a.concepto LIKE ?"
-        params.append(f"%{concepto}%")
-
-    query += """
-        GROUP BY a.id_asiento, a.fecha, a.concepto, a.referencia, d.nombre, u.nombre, c.nombre, pr.nombre
-        ORDER BY a.fecha DESC, a.id_asiento DESC
-    """
-
-    cursor.execute(query, params)
-    asientos = cursor.fetchall()
-    conn.close()
+    asientos = LISTADO_ASIENTOS.iterar(_filtros_asientos())
 
     pdf_buffer = exportar_asientos_a_pdf(asientos)
     return send_file(
@@ -758,46 +721,104 @@ def dashboard_view():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
+    # Solo el esqueleto de la página: cada widget se pide después por
+    # separado a /api/dashboard/<widget> y se dibuja al llegar
+    return render_template('dashboard.html',
+                           nombre=session['nombre'],
+                           rol_id=session['rol_id'])
+
+@app.route('/api/dashboard/<widget>')
+def api_dashboard_widget(widget):
+    """
+    Un widget del dashboard en JSON, con ETag según su contenido. Si el
+    navegador envía If-None-Match con el mismo ETag se responde 304 sin
+    cuerpo.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'No autorizado'}), 401
+    if widget not in WIDGETS:
+        return jsonify({'error': 'Widget desconocido'}), 404
+    
+    datos, tiempos = cargar_widgets(dashboard.cargadores([widget], session['user_id']))
+    if tiempos[widget][1] != 'ok':
+        response = jsonify({'error': f'No se pudo cargar el widget ({tiempos[widget][1]})'})
+        response.status_code = 503
+    else:
+        cuerpo = widget_json(datos[widget])
+        response = make_response(cuerpo)
+        response.mimetype = 'application/json'
+        response.set_etag(etag_widget(cuerpo))
+        response = response.make_conditional(request)
+    # El navegador puede guardar la respuesta pero debe revalidarla siempre
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Server-Timing'] = server_timing(tiempos)
+    return response
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    Varios widgets en una sola solicitud, calculados en paralelo:
+    
+        POST {"widgets": {"saldos": {"top_n": 5}, "facturas": {}},
+              "etags": {"saldos": "\"1a2b...\""}}
+    
+    Responde {"widgets": {nombre: {"etag": ..., "datos": ...}}}; si el
+    ETag enviado coincide, el widget va como {"etag": ..., "sin_cambios": true}
+    y un widget que falla como {"error": ...}.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    pedido = request.get_json(silent=True) or {}
+    widgets = pedido.get('widgets') or {}
+    etags = pedido.get('etags') or {}
+    if not isinstance(widgets, dict) or not isinstance(etags, dict):
+        return jsonify({'error': 'Formato no válido'}), 400
     try:
-        # Obtener datos del dashboard
-        summary = dashboard.get_executive_summary(session['user_id'])
-        saldos = dashboard.get_saldos_por_cuenta()
-        facturas = dashboard.get_facturas_recientes()
-        conciliaciones = dashboard.get_conciliaciones_pendientes()
-        top_clientes = dashboard.get_top_clientes()
-        movimientos = dashboard.get_movimientos_bancarios_recientes()
-        alertas = dashboard.get_alertas_sistema()
-        
-        # Gráficos
-        ventas_chart = dashboard.get_ventas_mensuales()
-        saldos_chart = dashboard.get_saldos_por_tipo_cuenta()
-        
-        return render_template('dashboard.html',
-                             nombre=session['nombre'],
-                             rol_id=session['rol_id'],
-                             summary=summary,
-                             saldos=saldos,
-                             facturas=facturas,
-                             conciliaciones=conciliaciones,
-                             top_clientes=top_clientes,
-                             movimientos=movimientos,
-                             alertas=alertas,
-                             ventas_chart=ventas_chart,
-                             saldos_chart=saldos_chart)
-    except Exception as e:
-        flash(f'Error al cargar el dashboard: {str(e)}', 'error')
-        return render_template('dashboard.html',
-                             nombre=session['nombre'],
-                             rol_id=session['rol_id'],
-                             summary={},
-                             saldos=[],
-                             facturas=[],
-                             conciliaciones=[],
-                             top_clientes=[],
-                             movimientos=[],
-                             alertas=[],
-                             ventas_chart=None,
-                             saldos_chart=None)
+        parametros = {nombre: parametros_widget(nombre, valores)
+                      for nombre, valores in widgets.items()}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    datos, tiempos = cargar_widgets(
+        dashboard.cargadores(list(parametros), session['user_id'], parametros))
+    
+    # El JSON de cada widget ya es canónico (widget_json): se arma la
+    # respuesta sin volver a serializarlo
+    partes = []
+    for nombre in parametros:
+        if tiempos[nombre][1] != 'ok':
+            parte = json.dumps({'error': tiempos[nombre][1]})
+        else:
+            cuerpo = widget_json(datos[nombre])
+            etag = f'"{etag_widget(cuerpo)}"'
+            if etags.get(nombre) == etag:
+                parte = json.dumps({'etag': etag, 'sin_cambios': True})
+            else:
+                parte = '{"etag":%s,"datos":%s}' % (json.dumps(etag), cuerpo)
+        partes.append(f'{json.dumps(nombre)}:{parte}')
+    
+    response = make_response('{"widgets":{%s}}' % ','.join(partes))
+    response.mimetype = 'application/json'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['Server-Timing'] = server_timing(tiempos)
+    return response
+
+@app.route('/api/dashboard/eventos')
+def api_dashboard_eventos():
+    """
+    Canal Server-Sent Events: cada vez que una escritura cambia un widget
+    se envía un evento `widget` con {widget, etag, datos} a todos los
+    clientes. Si la conexión se corta el navegador vuelve a sondear.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    response = Response(stream_with_context(canal_dashboard.flujo()),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # sin buffer en nginx
+    return response
 
 @app.route('/api/dashboard-data')
 def api_dashboard_data():
@@ -812,7 +833,7 @@ def api_dashboard_data():
         return jsonify({
             'success': True,
             'summary': summary,
-            'estado_resultados': estado_resultados.to_dict('records') if not estado_resultados.empty else [],
+            'estado_resultados': estado_resultados,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -826,7 +847,10 @@ def api_saldos():
     if 'user_id' not in session:
         return jsonify({'error': 'No autorizado'}), 401
     
-    saldos = dashboard.get_saldos_por_cuenta()
+    try:
+        saldos = dashboard.get_saldos_por_cuenta()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
     result = []
     for s in saldos:
         result.append({
@@ -862,6 +886,30 @@ def api_facturas():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/alertas', methods=['GET'])
+def api_alertas():
+    """
+    Alertas paginadas. Parámetros: page, per_page (máx. 100), tipo,
+    severidad (1-3) y orden ('severidad' o 'recientes').
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    page = request.args.get('page', 1, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    try:
+        filas, total, page, total_pages = listar_alertas(
+            request.args, page, per_page, request.args.get('orden'))
+        return jsonify({
+            'alertas': [alerta_a_dict(f) for f in filas],
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': total_pages
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/health')
 def health_check():
     """Endpoint para verificar salud del sistema"""
@@ -869,7 +917,11 @@ def health_check():
         return jsonify({
             'status': 'ok',
             'timestamp': datetime.now().isoformat(),
-            'database': 'connected'
+            'database': 'connected',
+            'pool': get_pool_stats(),
+            'cache_dashboard': cache_dashboard.estadisticas(),
+            'cache_informes': cache_informes.estadisticas(),
+            'sse_dashboard': canal_dashboard.estadisticas()
         })
     except Exception as e:
         return jsonify({
@@ -889,7 +941,8 @@ from models.tablas_maestras import (
     get_plan_cuentas, get_cuenta_por_id, crear_cuenta, actualizar_cuenta, eliminar_cuenta,
     get_cuentas_bancarias_full, get_cuenta_bancaria_por_id, crear_cuenta_bancaria, actualizar_cuenta_bancaria, eliminar_cuenta_bancaria,
     get_usuarios, get_usuario_por_id, crear_usuario, actualizar_usuario, eliminar_usuario,
-    get_tasas_iva, get_tasa_iva_por_id, crear_tasa_iva, actualizar_tasa_iva, eliminar_tasa_iva
+    get_tasas_iva, get_tasa_iva_por_id, crear_tasa_iva, actualizar_tasa_iva, eliminar_tasa_iva,
+    CONSULTAS_EXPORTACION, iter_tabla_maestra
 )
 
 @app.route('/admin')
@@ -1317,21 +1370,12 @@ def admin_exportar(tabla, formato):
         flash('Acceso denegado', 'error')
         return redirect(url_for('menu'))
     
-    # Mapeo de tablas a funciones
-    funciones = {
-        'clientes': get_clientes,
-        'proveedores': get_proveedores,
-        'plan_cuentas': get_plan_cuentas,
-        'cuentas_bancarias': get_cuentas_bancarias_full,
-        'Usuarios': get_usuarios,
-        'Tasa_iva': get_tasas_iva
-    }
-
-    if tabla not in funciones:
+    # Tablas exportables (ver CONSULTAS_EXPORTACION en models/tablas_maestras.py)
+    if tabla not in CONSULTAS_EXPORTACION:
         flash('Tabla no válida', 'error')
         return redirect(url_for('admin_panel'))
     
-    datos = funciones[tabla]()
+    datos = iter_tabla_maestra(tabla)
     
     if formato == 'excel':
         output = exportar_a_excel(datos, tabla)
@@ -1356,7 +1400,7 @@ def admin_exportar(tabla, formato):
 
 
 
-from routes.informes import informes_bp
+from routes.informes import informes_bp, cache_informes
 
 app.register_blueprint(informes_bp)        
 
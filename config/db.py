@@ -1,12 +1,650 @@
-# config/db.py
-import pyodbc
-
-def get_connection():
-    # Usa autenticación de Windows (trusted_connection=yes)
-    conn = pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        "SERVER=.\\SQLEXPRESS;"  # Cambia si tu servidor es remoto
-        "DATABASE=Conta;"
-        "Trusted_Connection=yes;"
-    )
-    return conn
\ No newline at end of file
+# config/db.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pyodbc
+from flask import g, has_request_context
+
+from config import db_monitor
+
+logger = logging.getLogger(__name__)
+
+# Usa autenticación de Windows (trusted_connection=yes)
+CONNECTION_STRING = os.environ.get(
+    "DB_CONNECTION_STRING",
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=.\\SQLEXPRESS;"  # Cambia si tu servidor es remoto
+    "DATABASE=Conta;"
+    "Trusted_Connection=yes;"
+    "MARS_Connection=yes;"  # varios cursores activos sobre la conexión compartida de la solicitud
+)
+
+# Réplica de solo lectura / secundaria para dashboard, informes y exportaciones
+# (p. ej. con ApplicationIntent=ReadOnly). Sin definir, todo va al primario.
+REPORTING_CONNECTION_STRING = os.environ.get("DB_REPORTING_CONNECTION_STRING")
+REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG_SECONDS", 30))
+REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 15))  # segundos entre verificaciones de retraso
+# Debe devolver el retraso en segundos (NULL = sin retraso). Para réplicas que no
+# son Always On (log shipping, copias) se puede definir, p. ej., "SELECT 0".
+REPLICA_LAG_QUERY = os.environ.get(
+    "DB_REPLICA_LAG_QUERY",
+    "SELECT MAX(secondary_lag_seconds) FROM sys.dm_hadr_database_replica_states "
+    "WHERE is_local = 1 AND database_id = DB_ID()"
+)
+
+# ======================
+# CONFIGURACIÓN DEL POOL
+# ======================
+POOL_MIN = int(os.environ.get("DB_POOL_MIN", 2))
+POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 15))            # segundos esperando una conexión libre
+POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800))  # segundos antes de reciclar una conexión
+POOL_PING_INTERVAL = float(os.environ.get("DB_POOL_PING_INTERVAL", 30))  # validar con SELECT 1 si estuvo inactiva más de esto
+ITER_BATCH_SIZE = int(os.environ.get("DB_ITER_BATCH_SIZE", 500))          # filas por fetchmany en iter_rows()
+
+
+class PoolAgotadoError(Exception):
+    """No se obtuvo una conexión del pool dentro del tiempo de espera."""
+
+
+class _ConexionFisica:
+    """Conexión pyodbc real junto con sus marcas de tiempo."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.creada_en = time.monotonic()
+        self.usada_en = self.creada_en
+
+
+class ConexionPool:
+    """
+    Envoltorio devuelto por get_connection(). Se comporta como una conexión
+    pyodbc, pero close() la devuelve al pool en lugar de cerrarla.
+    """
+
+    def __init__(self, pool, fisica):
+        self._pool = pool
+        self._fisica = fisica
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+        if self._fisica is None:
+            raise pyodbc.ProgrammingError("La conexión ya fue devuelta al pool")
+        return getattr(self._fisica.raw, nombre)
+
+    def cursor(self):
+        if self._fisica is None:
+            raise pyodbc.ProgrammingError("La conexión ya fue devuelta al pool")
+        return db_monitor.instrumentar(self._fisica.raw.cursor())
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def close(self):
+        if getattr(self, '_fisica', None) is not None:
+            fisica, self._fisica = self._fisica, None
+            self._pool.liberar(fisica)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Red de seguridad para llamadores que olvidan close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PoolConexiones:
+    """
+    Pool acotado y thread-safe de conexiones pyodbc.
+
+    - Mantiene al menos `minimo` conexiones abiertas y nunca más de `maximo`.
+    - Valida la conexión al entregarla si estuvo inactiva más de `ping_intervalo`.
+    - Recicla las conexiones que superan `vida_maxima` segundos.
+    - Registra métricas de espera para diagnosticar saturación.
+    """
+
+    def __init__(self, connection_string, minimo=POOL_MIN, maximo=POOL_MAX,
+                 timeout=POOL_TIMEOUT, vida_maxima=POOL_MAX_LIFETIME,
+                 ping_intervalo=POOL_PING_INTERVAL):
+        self.connection_string = connection_string
+        self.minimo = max(0, minimo)
+        self.maximo = max(1, maximo, self.minimo)
+        self.timeout = timeout
+        self.vida_maxima = vida_maxima
+        self.ping_intervalo = ping_intervalo
+
+        self._libres = []
+        self._total = 0
+        self._cond = threading.Condition(threading.RLock())
+        self._stats = {
+            'creadas': 0,
+            'recicladas': 0,
+            'descartadas': 0,
+            'entregas': 0,
+            'esperas': 0,
+            'tiempo_espera_total': 0.0,
+            'tiempo_espera_max': 0.0,
+            'agotado': 0,
+        }
+
+    # --- ciclo de vida de conexiones físicas ---
+
+    def _abrir(self):
+        raw = pyodbc.connect(self.connection_string, autocommit=False)
+        with self._cond:
+            self._stats['creadas'] += 1
+        return _ConexionFisica(raw)
+
+    def _cerrar(self, fisica):
+        try:
+            fisica.raw.close()
+        except Exception:
+            pass
+
+    def _expirada(self, fisica, ahora):
+        return self.vida_maxima and ahora - fisica.creada_en > self.vida_maxima
+
+    def _sana(self, fisica, ahora):
+        if ahora - fisica.usada_en < self.ping_intervalo:
+            return True
+        try:
+            cursor = fisica.raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def precalentar(self):
+        """Abre conexiones hasta alcanzar el mínimo configurado."""
+        while True:
+            with self._cond:
+                if self._total >= self.minimo:
+                    return
+                self._total += 1
+            try:
+                fisica = self._abrir()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._libres.append(fisica)
+                self._cond.notify()
+
+    # --- entrega y devolución ---
+
+    def obtener(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        espero = False
+
+        while True:
+            fisica = None
+            abrir_nueva = False
+            with self._cond:
+                while not self._libres and self._total >= self.maximo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._stats['agotado'] += 1
+                        raise PoolAgotadoError(
+                            f"No hay conexiones disponibles tras {self.timeout:.0f}s "
+                            f"(máximo {self.maximo})"
+                        )
+                    espero = True
+                    self._cond.wait(restante)
+
+                if self._libres:
+                    fisica = self._libres.pop()
+                else:
+                    self._total += 1
+                    abrir_nueva = True
+
+            if abrir_nueva:
+                try:
+                    fisica = self._abrir()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                ahora = time.monotonic()
+                if self._expirada(fisica, ahora):
+                    self._descartar(fisica, 'recicladas')
+                    continue
+                if not self._sana(fisica, ahora):
+                    self._descartar(fisica, 'descartadas')
+                    continue
+
+            espera = time.monotonic() - inicio
+            with self._cond:
+                self._stats['entregas'] += 1
+                if espero:
+                    self._stats['esperas'] += 1
+                self._stats['tiempo_espera_total'] += espera
+                self._stats['tiempo_espera_max'] = max(self._stats['tiempo_espera_max'], espera)
+            return ConexionPool(self, fisica)
+
+    def liberar(self, fisica):
+        # Nunca devolver al pool una transacción a medio camino
+        try:
+            fisica.raw.rollback()
+        except pyodbc.Error:
+            self._descartar(fisica, 'descartadas')
+            return
+
+        ahora = time.monotonic()
+        if self._expirada(fisica, ahora):
+            self._descartar(fisica, 'recicladas')
+            return
+
+        fisica.usada_en = ahora
+        with self._cond:
+            self._libres.append(fisica)
+            self._cond.notify()
+
+    def _descartar(self, fisica, motivo):
+        self._cerrar(fisica)
+        with self._cond:
+            self._total -= 1
+            self._stats[motivo] += 1
+            self._cond.notify()
+
+    def cerrar_todas(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)."""
+        with self._cond:
+            libres, self._libres = self._libres, []
+            self._total -= len(libres)
+            self._cond.notify_all()
+        for fisica in libres:
+            self._cerrar(fisica)
+
+    def estadisticas(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['abiertas'] = self._total
+            stats['libres'] = len(self._libres)
+            stats['en_uso'] = self._total - len(self._libres)
+            stats['minimo'] = self.minimo
+            stats['maximo'] = self.maximo
+        entregas = stats['entregas'] or 1
+        stats['tiempo_espera_promedio'] = stats['tiempo_espera_total'] / entregas
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = PoolConexiones(CONNECTION_STRING)
+                try:
+                    pool.precalentar()
+                except pyodbc.Error:
+                    # El servidor puede no estar listo aún; las conexiones se abren bajo demanda
+                    pass
+                _pool = pool
+    return _pool
+
+
+# ======================
+# RÉPLICA DE LECTURA
+# ======================
+
+class EstadoReplica:
+    """
+    Decide si las lecturas pueden ir a la réplica. El resultado de la última
+    verificación (conexión + retraso) se reutiliza durante `intervalo` segundos,
+    así una réplica caída o atrasada no se reintenta en cada consulta.
+    """
+
+    def __init__(self, pool, retraso_maximo=REPLICA_MAX_LAG,
+                 intervalo=REPLICA_CHECK_INTERVAL, consulta_retraso=REPLICA_LAG_QUERY):
+        self.pool = pool
+        self.retraso_maximo = retraso_maximo
+        self.intervalo = intervalo
+        self.consulta_retraso = consulta_retraso
+        self.disponible = False
+        self.retraso = None
+        self.motivo = 'sin verificar'
+        self.verificada_en = None
+        self._lock = threading.Lock()
+
+    def _verificar(self):
+        try:
+            conn = self.pool.obtener()
+        except (pyodbc.Error, PoolAgotadoError) as e:
+            return False, None, f'sin conexión: {e}'
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.consulta_retraso)
+            fila = cursor.fetchone()
+            cursor.close()
+        except pyodbc.Error as e:
+            # Sin forma de medir el retraso no se arriesga a leer datos viejos
+            return False, None, f'no se pudo medir el retraso: {e}'
+        finally:
+            conn.close()
+        retraso = float(fila[0]) if fila and fila[0] is not None else 0.0
+        if retraso > self.retraso_maximo:
+            return False, retraso, f'retraso de {retraso:.0f}s'
+        return True, retraso, 'ok'
+
+    def usable(self):
+        ahora = time.monotonic()
+        if self.verificada_en is None or ahora - self.verificada_en >= self.intervalo:
+            # Un solo hilo verifica; los demás usan el último resultado
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.disponible, self.retraso, self.motivo = self._verificar()
+                    self.verificada_en = time.monotonic()
+                finally:
+                    self._lock.release()
+        return self.disponible
+
+    def marcar_caida(self, motivo):
+        self.disponible = False
+        self.motivo = motivo
+        self.verificada_en = time.monotonic()
+
+    def estadisticas(self):
+        stats = self.pool.estadisticas()
+        stats.update(disponible=self.disponible, retraso=self.retraso, motivo=self.motivo)
+        return stats
+
+
+_replica = None
+
+
+def get_replica():
+    """Estado de la réplica de lectura, o None si no hay DSN de reportes configurado."""
+    global _replica
+    if _replica is None and REPORTING_CONNECTION_STRING:
+        with _pool_lock:
+            if _replica is None:
+                _replica = EstadoReplica(PoolConexiones(REPORTING_CONNECTION_STRING))
+    return _replica
+
+
+@contextmanager
+def leer_del_primario():
+    """
+    Dentro del bloque, get_connection(readonly=True) usa el primario: para
+    releer justo después de una escritura sin esperar a la réplica.
+    """
+    anterior = getattr(_local, 'primario', False)
+    _local.primario = True
+    try:
+        yield
+    finally:
+        _local.primario = anterior
+
+
+def _conexion_replica():
+    """Conexión del pool de la réplica, o None para usar el primario."""
+    if getattr(_local, 'primario', False):
+        return None
+    replica = get_replica()
+    if replica is None or not replica.usable():
+        return None
+    try:
+        return replica.pool.obtener()
+    except (pyodbc.Error, PoolAgotadoError) as e:
+        replica.marcar_caida(f'sin conexión: {e}')
+        return None
+
+
+# ======================
+# UNIDAD DE TRABAJO POR SOLICITUD
+# ======================
+
+class ConexionCompartida:
+    """
+    Vista de la conexión de la unidad de trabajo. Los modelos la usan igual
+    que una conexión pyodbc: close() no hace nada (la cierra el teardown) y
+    commit()/rollback() se difieren si hay una transacción explícita abierta.
+    """
+
+    def __init__(self, unidad):
+        self._unidad = unidad
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+        return getattr(self._unidad.conexion, nombre)
+
+    def commit(self):
+        self._unidad.commit()
+
+    def rollback(self):
+        self._unidad.rollback()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+class UnidadDeTrabajo:
+    """Una conexión del pool compartida por todos los modelos durante una solicitud."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.conexion = None
+        self.nivel_transaccion = 0
+        self.solo_rollback = False
+        self.al_confirmar = []  # funciones a ejecutar tras el commit real
+
+    def obtener(self):
+        if self.conexion is None:
+            self.conexion = self._pool.obtener()
+        return ConexionCompartida(self)
+
+    def commit(self):
+        if self.nivel_transaccion:
+            return  # se confirma al cerrar la transacción externa
+        if self.conexion is not None:
+            self.conexion.commit()
+
+    def rollback(self):
+        if self.nivel_transaccion:
+            self.solo_rollback = True
+            return
+        if self.conexion is not None:
+            self.conexion.rollback()
+
+    @contextmanager
+    def transaccion(self):
+        conn = self.obtener()
+        self.nivel_transaccion += 1
+        try:
+            yield conn
+        except Exception:
+            self.solo_rollback = True
+            raise
+        finally:
+            self.nivel_transaccion -= 1
+            if self.nivel_transaccion == 0:
+                fallo, self.solo_rollback = self.solo_rollback, False
+                pendientes, self.al_confirmar = self.al_confirmar, []
+                if self.conexion is not None:
+                    if fallo:
+                        self.conexion.rollback()
+                    else:
+                        self.conexion.commit()
+                        _ejecutar_al_confirmar(pendientes)
+
+    def finalizar(self, error=None):
+        if self.conexion is None:
+            return
+        try:
+            if error is not None or self.solo_rollback:
+                self.conexion.rollback()
+            else:
+                self.conexion.commit()
+        finally:
+            self.conexion.close()
+            self.conexion = None
+            self.nivel_transaccion = 0
+            self.solo_rollback = False
+            self.al_confirmar = []
+
+
+def _ejecutar_al_confirmar(funciones):
+    for funcion in funciones:
+        try:
+            funcion()
+        except Exception:
+            logger.exception("Error en una acción posterior al commit")
+
+
+def al_confirmar(funcion):
+    """
+    Ejecuta funcion() cuando la escritura en curso quede confirmada: de
+    inmediato si no hay una transaccion() abierta (el modelo ya hizo su
+    commit), o al confirmarse el bloque externo. Si el bloque se revierte
+    no se ejecuta. Para avisos y notificaciones, no para escrituras.
+    """
+    unidad = _unidad_actual(crear=False)
+    if unidad is None or not unidad.nivel_transaccion:
+        _ejecutar_al_confirmar([funcion])
+    else:
+        unidad.al_confirmar.append(funcion)
+
+
+_local = threading.local()
+
+
+def _unidad_actual(crear=True):
+    if has_request_context():
+        unidad = g.get('_unidad_trabajo')
+        if unidad is None and crear:
+            unidad = g._unidad_trabajo = UnidadDeTrabajo(get_pool())
+        return unidad
+    # Fuera de una solicitud (hilos, scripts) solo existe dentro de transaccion()
+    return getattr(_local, 'unidad', None)
+
+
+def get_connection(readonly=False):
+    """
+    Obtiene una conexión. Dentro de una solicitud Flask todos los modelos
+    comparten la misma conexión; fuera de ella se toma una del pool.
+    En ambos casos close() es seguro de llamar.
+
+    Con readonly=True (dashboard, informes, exportaciones) se usa la réplica
+    de reportes si está configurada, disponible y al día; si no, el primario.
+    Esa conexión es propia del llamador: no ve escrituras sin confirmar de
+    la solicitud y debe cerrarse con close().
+    """
+    if readonly:
+        conn = _conexion_replica()
+        if conn is not None:
+            return conn
+    unidad = _unidad_actual()
+    if unidad is not None:
+        return unidad.obtener()
+    return get_pool().obtener()
+
+
+@contextmanager
+def transaccion():
+    """
+    Agrupa varias escrituras en una sola transacción:
+
+        with transaccion():
+            crear_factura_db(...)
+            cancelar_factura_con_anulacion(...)
+
+    Los commit() de los modelos se difieren hasta el final del bloque; si
+    algo falla (o un modelo hace rollback) se revierte todo el bloque.
+    """
+    unidad = _unidad_actual()
+    propia = unidad is None
+    if propia:
+        unidad = _local.unidad = UnidadDeTrabajo(get_pool())
+    try:
+        with unidad.transaccion() as conn:
+            yield conn
+    finally:
+        if propia:
+            _local.unidad = None
+            unidad.finalizar()
+
+
+# ======================
+# LECTURA EN STREAMING
+# ======================
+
+def iter_rows(query, params=None, batch_size=ITER_BATCH_SIZE, readonly=False, tipos=None):
+    """
+    Generador de filas para resultados grandes (exportaciones, informes).
+    Lee de a `batch_size` filas con fetchmany() en lugar de fetchall(), así
+    la memoria no crece con el tamaño del libro. Usa una conexión propia del
+    pool, abierta solo mientras dura la iteración: se devuelve al agotar el
+    generador, al cortarlo con break o si el consumidor falla.
+
+    Las filas son pyodbc.Row (acceso por índice y por nombre de columna).
+    No ve escrituras sin confirmar de la unidad de trabajo de la solicitud.
+    Con readonly=True lee de la réplica de reportes cuando está disponible.
+    `tipos` se pasa a setinputsizes() (ver utils/listados.py).
+    """
+    conn = (_conexion_replica() if readonly else None) or get_pool().obtener()
+    try:
+        cursor = conn.cursor()
+        if tipos:
+            cursor.setinputsizes(tipos)
+        cursor.execute(query, params or [])
+        while True:
+            filas = cursor.fetchmany(batch_size)
+            if not filas:
+                break
+            yield from filas
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def cerrar_unidad_trabajo(error=None):
+    """Confirma o revierte y devuelve al pool la conexión de la solicitud."""
+    unidad = g.pop('_unidad_trabajo', None)
+    if unidad is not None:
+        unidad.finalizar(error)
+
+
+def init_app(app):
+    """
+    Registra el cierre automático de la unidad de trabajo al final de cada
+    solicitud y el resumen de consultas SQL (log y cabeceras X-DB-*).
+    """
+    app.teardown_request(cerrar_unidad_trabajo)
+    db_monitor.init_app(app)
+
+
+def get_pool_stats():
+    """Métricas del pool (conexiones abiertas, en uso, tiempos de espera) y de la réplica."""
+    stats = get_pool().estadisticas()
+    replica = get_replica()
+    if replica is not None:
+        stats['replica'] = replica.estadisticas()
+    return stats
@@ -0,0 +1,216 @@
+# config/db_monitor.py
+"""
+Instrumentación de SQL: cada cursor entregado por get_connection() mide sus
+consultas (SQL normalizado, forma de los parámetros, duración, filas leídas
+y ruta que la originó). Por solicitud se genera un resumen en el log y en
+las cabeceras de la respuesta; las consultas lentas van a un log rotativo.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+from flask import g, has_request_context, request
+
+MONITOR_ACTIVO = os.environ.get("DB_MONITOR", "1") != "0"
+UMBRAL_LENTA_MS = float(os.environ.get("DB_SLOW_QUERY_MS", 500))
+LOG_LENTAS = os.environ.get("DB_SLOW_QUERY_LOG", os.path.join("logs", "slow_queries.log"))
+UMBRAL_REPETIDAS = int(os.environ.get("DB_REPEATED_QUERY_WARN", 10))  # posible N+1
+
+logger = logging.getLogger(__name__)
+
+_logger_lentas = None
+_logger_lentas_lock = threading.Lock()
+
+
+def _get_logger_lentas():
+    global _logger_lentas
+    if _logger_lentas is None:
+        with _logger_lentas_lock:
+            if _logger_lentas is None:
+                lentas = logging.getLogger("sql.lentas")
+                lentas.setLevel(logging.WARNING)
+                lentas.propagate = False
+                try:
+                    os.makedirs(os.path.dirname(LOG_LENTAS) or ".", exist_ok=True)
+                    handler = RotatingFileHandler(LOG_LENTAS, maxBytes=5 * 1024 * 1024,
+                                                  backupCount=5, encoding="utf-8")
+                    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                    lentas.addHandler(handler)
+                except OSError as e:
+                    logger.warning(f"No se pudo abrir el log de consultas lentas: {e}")
+                    lentas.propagate = True
+                _logger_lentas = lentas
+    return _logger_lentas
+
+
+# ======================
+# NORMALIZACIÓN
+# ======================
+
+_RE_CADENAS = re.compile(r"N?'(?:[^']|'')*'")
+_RE_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_sql(sql):
+    """Colapsa espacios y reemplaza literales para agrupar consultas equivalentes."""
+    sql = _RE_CADENAS.sub("'?'", sql)
+    sql = _RE_NUMEROS.sub("0", sql)
+    return _RE_ESPACIOS.sub(" ", sql).strip()
+
+
+def forma_parametros(params):
+    """Describe los parámetros sin sus valores, p. ej. '(int, str, date)'."""
+    if not params:
+        return "()"
+    if len(params) == 1 and isinstance(params[0], (list, tuple)):
+        params = params[0]
+    return "(" + ", ".join(type(p).__name__ for p in params) + ")"
+
+
+def _ruta_actual():
+    if has_request_context():
+        return request.endpoint or request.path
+    return threading.current_thread().name
+
+
+# ======================
+# REGISTRO
+# ======================
+
+class ConsultaRegistrada:
+    __slots__ = ("sql", "parametros", "duracion", "filas", "ruta")
+
+    def __init__(self, sql, parametros, ruta):
+        self.sql = sql
+        self.parametros = parametros
+        self.duracion = 0.0
+        self.filas = 0
+        self.ruta = ruta
+
+
+def _registrar(consulta):
+    if has_request_context():
+        consultas = g.get("_consultas_sql")
+        if consultas is None:
+            consultas = g._consultas_sql = []
+        consultas.append(consulta)
+
+
+def _revisar_lenta(consulta):
+    ms = consulta.duracion * 1000
+    if ms >= UMBRAL_LENTA_MS:
+        _get_logger_lentas().warning(
+            f"{ms:.1f}ms filas={consulta.filas} ruta={consulta.ruta} "
+            f"params={consulta.parametros} sql={consulta.sql}"
+        )
+
+
+class CursorInstrumentado:
+    """Envoltorio de un cursor pyodbc que mide execute() y cuenta filas leídas."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_actual", None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # p. ej. cursor.fast_executemany = True
+        setattr(self._cursor, nombre, valor)
+
+    def _medir(self, ejecutar, sql, forma):
+        consulta = ConsultaRegistrada(normalizar_sql(sql), forma, _ruta_actual())
+        inicio = time.perf_counter()
+        try:
+            ejecutar()
+        finally:
+            consulta.duracion = time.perf_counter() - inicio
+            object.__setattr__(self, "_actual", consulta)
+            _registrar(consulta)
+            _revisar_lenta(consulta)
+        return self
+
+    def execute(self, sql, *params):
+        return self._medir(lambda: self._cursor.execute(sql, *params), sql,
+                           forma_parametros(params))
+
+    def executemany(self, sql, filas):
+        filas = list(filas)
+        return self._medir(lambda: self._cursor.executemany(sql, filas), sql,
+                           f"lote[{len(filas)}]{forma_parametros(filas[:1])}")
+
+    def _contar(self, resultado, cuantas):
+        consulta = self._actual
+        if consulta is not None:
+            consulta.filas += cuantas
+        return resultado
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        return self._contar(fila, 1 if fila is not None else 0)
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        return self._contar(filas, len(filas))
+
+    def fetchmany(self, tamano=None):
+        filas = self._cursor.fetchmany(tamano) if tamano is not None else self._cursor.fetchmany()
+        return self._contar(filas, len(filas))
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._contar(None, 1)
+            yield fila
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+
+def instrumentar(cursor):
+    return CursorInstrumentado(cursor) if MONITOR_ACTIVO else cursor
+
+
+# ======================
+# RESUMEN POR SOLICITUD
+# ======================
+
+def resumen_solicitud():
+    """Cantidad de consultas, tiempo total en BD y consultas repetidas de la solicitud actual."""
+    consultas = g.get("_consultas_sql") or []
+    total = sum(c.duracion for c in consultas)
+    repetidas = Counter(c.sql for c in consultas)
+    return {
+        "consultas": len(consultas),
+        "tiempo_ms": round(total * 1000, 2),
+        "filas": sum(c.filas for c in consultas),
+        "repetidas": {sql: n for sql, n in repetidas.items() if n >= UMBRAL_REPETIDAS},
+    }
+
+
+def _agregar_resumen(response):
+    if not g.get("_consultas_sql"):
+        return response
+    resumen = resumen_solicitud()
+    response.headers["X-DB-Query-Count"] = str(resumen["consultas"])
+    response.headers["X-DB-Time-ms"] = f"{resumen['tiempo_ms']:.2f}"
+    logger.info(
+        f"{request.method} {request.path} [{request.endpoint}] "
+        f"consultas={resumen['consultas']} bd={resumen['tiempo_ms']:.1f}ms filas={resumen['filas']}"
+    )
+    for sql, veces in resumen["repetidas"].items():
+        logger.warning(f"Consulta repetida {veces} veces en {request.endpoint} (¿N+1?): {sql[:200]}")
+    return response
+
+
+def init_app(app):
+    if MONITOR_ACTIVO:
+        app.after_request(_agregar_resumen)
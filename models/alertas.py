@@ -0,0 +1,282 @@
+# models/alertas.py
+"""
+Alertas del sistema precalculadas en la tabla `alertas`.
+
+Cada tipo de alerta tiene una consulta "fuente" con las alertas que deben
+existir; sincronizar() la compara con la tabla (MERGE) e inserta las
+nuevas y borra las resueltas. Se ejecuta:
+
+- completa, cada ALERTAS_INTERVALO segundos o con `flask --app app alertas`
+  (las facturas se vencen con el paso del tiempo, sin ninguna escritura);
+- para un solo registro, cuando una factura o un comprobante cambia
+  (eventos 'factura', 'comprobante' y 'asiento').
+
+El dashboard y /api/alertas solo leen la tabla.
+"""
+import os
+import threading
+import time
+
+from config.db import get_connection
+from utils.eventos import al_ocurrir
+from utils.listados import Listado, Filtro
+
+ALERTAS_INTERVALO = int(os.environ.get("ALERTAS_INTERVALO", 600))  # segundos; 0 desactiva el recálculo en proceso
+
+# severidad -> prioridad usada por las plantillas (clases alert-high, etc.)
+PRIORIDADES = {3: 'high', 2: 'medium', 1: 'low'}
+
+
+class TipoAlerta:
+    """
+    `fuente` devuelve (clave, descripcion) de las alertas vigentes y tiene
+    un {filtro} en el WHERE; `filtro` lo restringe a un registro con los
+    mismos parámetros que forman la clave (unidos con '-').
+    """
+
+    def __init__(self, nombre, severidad, fuente, filtro):
+        self.nombre = nombre
+        self.severidad = severidad
+        self.fuente = fuente
+        self.filtro = filtro
+
+    def sql_fuente(self, filtrado=False):
+        return self.fuente.format(filtro=self.filtro if filtrado else '')
+
+
+TIPOS_ALERTA = {t.nombre: t for t in [
+    TipoAlerta(
+        'Factura Vencida', 3,
+        fuente="""
+            SELECT CAST(f.id_factura AS varchar(100)) AS clave,
+                   'Factura ' + ISNULL(f.folio, 'Sin folio') + ' vencida' AS descripcion
+            FROM facturas f
+            WHERE f.estatus = 'activa'
+            AND f.fecha_vencimiento < GETDATE()
+            {filtro}
+        """,
+        filtro="AND f.id_factura = ?",
+    ),
+    TipoAlerta(
+        'Asiento Desbalanceado', 2,
+        fuente="""
+            SELECT ISNULL(ac.id_comprobante_tipo, 'Sin tipo') + '-' +
+                   ISNULL(ac.id_comprobante_folio, 'Sin folio') AS clave,
+                   'Comprobante ' + ISNULL(ac.id_comprobante_tipo, 'Sin tipo') +
+                   '-' + ISNULL(ac.id_comprobante_folio, 'Sin folio') AS descripcion
+            FROM asientos_contables ac
+            WHERE 1 = 1 {filtro}
+            GROUP BY ac.id_comprobante_tipo, ac.id_comprobante_folio
+            HAVING ABS(ISNULL(SUM(ac.debe), 0) - ISNULL(SUM(ac.haber), 0)) > 0.01
+        """,
+        filtro="AND ac.id_comprobante_tipo = ? AND ac.id_comprobante_folio = ?",
+    ),
+    # Cuentas de detalle con movimientos, pero ninguno en 30 días: rango
+    # sobre cuentas_actividad.ultima_fecha (ver models/cuentas_actividad.py)
+    TipoAlerta(
+        'Cuenta Inactiva', 1,
+        fuente="""
+            SELECT cc.codigo AS clave,
+                   'Cuenta ' + cc.codigo + ' - ' + cc.nombre + ' sin movimiento reciente' AS descripcion
+            FROM cuentas_actividad ca
+            INNER JOIN cuentas_contables cc ON cc.codigo = ca.codigo
+            WHERE ca.ultima_fecha < DATEADD(day, -30, CAST(GETDATE() AS date))
+            AND cc.nivel = 3
+            {filtro}
+        """,
+        filtro="AND ca.codigo = ?",
+    ),
+]}
+
+_SQL_SINCRONIZAR = """
+    MERGE alertas WITH (HOLDLOCK) AS a
+    USING ({fuente}) AS f
+    ON a.tipo = ? AND a.clave = f.clave
+    WHEN MATCHED AND a.descripcion <> f.descripcion THEN
+        UPDATE SET descripcion = f.descripcion, actualizada_en = SYSDATETIME()
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (tipo, clave, descripcion, severidad)
+        VALUES (?, f.clave, f.descripcion, ?)
+    WHEN NOT MATCHED BY SOURCE AND a.tipo = ? {alcance} THEN
+        DELETE;
+"""
+
+
+def sincronizar(cursor, nombre, claves=None):
+    """
+    Sincroniza las alertas de un tipo: todas, o solo la del registro
+    identificado por `claves` (p. ej. (id_factura,) o (tipo, folio)).
+    """
+    tipo = TIPOS_ALERTA[nombre]
+    filtrado = claves is not None
+    sql = _SQL_SINCRONIZAR.format(fuente=tipo.sql_fuente(filtrado),
+                                  alcance="AND a.clave = ?" if filtrado else "")
+    params = list(claves or ()) + [nombre, nombre, tipo.severidad, nombre]
+    if filtrado:
+        params.append('-'.join(str(c) for c in claves))
+    cursor.execute(sql, params)
+
+
+def recalcular_alertas():
+    """Recalcula todos los tipos. Devuelve {tipo: alertas vigentes}."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for nombre in TIPOS_ALERTA:
+            sincronizar(cursor, nombre)
+        conn.commit()
+        cursor.execute("SELECT tipo, COUNT(*) FROM alertas GROUP BY tipo")
+        return {fila[0]: fila[1] for fila in cursor.fetchall()}
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def _sincronizar_registro(nombre, claves):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        sincronizar(cursor, nombre, claves)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error al actualizar alertas ({nombre}): {str(e)}")
+    finally:
+        conn.close()
+
+
+# ========================
+# ACTUALIZACIÓN POR ESCRITURAS
+# ========================
+
+def _al_cambiar_factura(id_factura, **_):
+    _sincronizar_registro('Factura Vencida', (id_factura,))
+
+
+def _al_cambiar_comprobante(tipo, folio, cuentas=(), **_):
+    _sincronizar_registro('Asiento Desbalanceado', (tipo, folio))
+    for cuenta in set(cuentas):
+        _sincronizar_registro('Cuenta Inactiva', (cuenta,))
+
+
+al_ocurrir('factura', _al_cambiar_factura)
+al_ocurrir('comprobante', _al_cambiar_comprobante)
+al_ocurrir('asiento', _al_cambiar_comprobante)
+
+
+# ========================
+# CONSULTAS
+# ========================
+
+LISTADO_ALERTAS = Listado(
+    columnas="id_alerta, tipo, clave, descripcion, severidad, creada_en",
+    origen="alertas",
+    filtros=[
+        Filtro('tipo', 'tipo'),
+        Filtro('severidad', 'severidad', tipo='entero'),
+    ],
+    ordenes={
+        'severidad': "severidad DESC, creada_en DESC, id_alerta DESC",
+        'recientes': "creada_en DESC, id_alerta DESC",
+    },
+)
+
+
+def alerta_a_dict(fila):
+    return {
+        'id': fila.id_alerta,
+        'tipo': fila.tipo,
+        'clave': fila.clave,
+        'descripcion': fila.descripcion,
+        'severidad': fila.severidad,
+        'prioridad': PRIORIDADES.get(fila.severidad, 'low'),
+        'creada_en': fila.creada_en,
+    }
+
+
+def listar_alertas(valores, page=1, per_page=20, orden=None):
+    """Página de alertas: (filas, total, page, total_pages)."""
+    return LISTADO_ALERTAS.pagina(valores, page, per_page, orden, readonly=True)
+
+
+def resumen_alertas(limite=5):
+    """
+    Lo que muestra el dashboard: total, cantidad por tipo y las `limite`
+    alertas más severas y recientes.
+    """
+    conn = get_connection(readonly=True)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT tipo, MAX(severidad) AS severidad, COUNT(*) AS cantidad
+            FROM alertas
+            GROUP BY tipo
+            ORDER BY MAX(severidad) DESC, tipo
+        """)
+        por_tipo = [{'tipo': f.tipo, 'prioridad': PRIORIDADES.get(f.severidad, 'low'), 'cantidad': f.cantidad}
+                    for f in cursor.fetchall()]
+
+        cursor.execute(f"""
+            SELECT TOP(?) {LISTADO_ALERTAS.columnas}
+            FROM alertas
+            ORDER BY {LISTADO_ALERTAS.ordenes['severidad']}
+        """, (limite,))
+        alertas = [alerta_a_dict(f) for f in cursor.fetchall()]
+
+        return {
+            'total': sum(t['cantidad'] for t in por_tipo),
+            'por_tipo': por_tipo,
+            'alertas': alertas,
+        }
+    finally:
+        conn.close()
+
+
+# ========================
+# RECÁLCULO PERIÓDICO
+# ========================
+
+_recalculo_iniciado = False
+_recalculo_lock = threading.Lock()
+
+
+def _recalcular_periodicamente(intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            recalcular_alertas()
+        except Exception as e:
+            print(f"Error en el recálculo periódico de alertas: {str(e)}")
+
+
+def iniciar_recalculo_periodico(intervalo=ALERTAS_INTERVALO):
+    """Arranca (una sola vez por proceso) el hilo que recalcula las alertas."""
+    global _recalculo_iniciado
+    if intervalo <= 0:
+        return
+    with _recalculo_lock:
+        if _recalculo_iniciado:
+            return
+        _recalculo_iniciado = True
+    threading.Thread(target=_recalcular_periodicamente, args=(intervalo,),
+                     name='alertas-recalculo', daemon=True).start()
+
+
+def init_app(app):
+    """
+    Registra el comando `flask alertas` y arranca el recálculo periódico
+    con la primera solicitud (no al ejecutar comandos como `flask migrar`).
+    """
+    import click
+
+    @app.cli.command('alertas')
+    def alertas():
+        """Recalcula la tabla alertas."""
+        for tipo, cantidad in sorted(recalcular_alertas().items()):
+            click.echo(f"{tipo}: {cantidad}")
+
+    @app.before_request
+    def _iniciar_recalculo():
+        iniciar_recalculo_periodico()
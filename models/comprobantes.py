@@ -14,11 +14,48 @@ from reportlab.lib.units import inch
 import os
 
 from config.db import get_connection
+from utils.listados import Listado, Filtro
+from utils.eventos import emitir_al_confirmar
+from models.cuentas_actividad import actualizar_actividad
 
 
 # Crear Blueprint
 comprobantes_bp = Blueprint('comprobantes', __name__, template_folder='templates/comprobantes')
 
+# Listados con forma de consulta estable (ver utils/listados.py)
+LISTADO_COMPROBANTES = Listado(
+    columnas="""tipo, folio, fecha, concepto, total, estado,
+                id_cliente, id_proveedor, creado_en""",
+    origen="comprobantes",
+    filtros=[
+        Filtro('tipo', 'tipo', 'LIKE'),
+        Filtro('folio', 'folio', 'LIKE'),
+        Filtro('estado', 'estado'),
+        Filtro('fecha_desde', 'fecha', '>=', 'fecha'),
+        Filtro('fecha_hasta', 'fecha', '<=', 'fecha'),
+        Filtro('id_cliente', 'id_cliente', '=', 'entero'),
+    ],
+    ordenes={
+        'fecha': "fecha DESC, creado_en DESC, tipo, folio",
+        'folio': "tipo, folio",
+    },
+)
+
+LISTADO_ASIENTOS_COMPROBANTE = Listado(
+    columnas="""consecutivo, id_cuenta, fecha, concepto,
+                debe, haber, referencia, creado_en,
+                id_comprobante_tipo, id_comprobante_folio""",
+    origen="asientos_contables",
+    filtros=[
+        Filtro('tipo', 'id_comprobante_tipo', obligatorio=True),
+        Filtro('folio', 'id_comprobante_folio', obligatorio=True),
+        Filtro('id_cuenta', 'id_cuenta', 'LIKE'),
+        Filtro('concepto', 'concepto', 'LIKE', 'ntexto'),
+        Filtro('referencia', 'referencia', 'LIKE', 'ntexto'),
+    ],
+    ordenes={'consecutivo': "consecutivo"},
+)
+
 # Formulario para Comprobantes
 class ComprobanteForm(FlaskForm):
     tipo = StringField('Tipo', validators=[DataRequired(), Length(max=10)])
@@ -47,12 +84,10 @@ class AsientoForm(FlaskForm):
 # Ruta principal de comprobantes
 @comprobantes_bp.route('/comprobantes')
 def comprobantes():
-    from config.db import get_connection
     from urllib.parse import urlencode  # Agregar este import
     
     page = request.args.get('page', 1, type=int)
     per_page = 20
-    offset = (page - 1) * per_page
     
     # Obtener valores de filtros del request
     filtros = {
@@ -63,67 +98,9 @@ def comprobantes():
         'fecha_hasta': request.args.get('fecha_hasta', '')
     }
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Construir query base
-    query_base = """
-        FROM comprobantes
-        WHERE 1=1
-    """
-    params = []
-    
-    # Aplicar filtros
-    if filtros['tipo']:
-        query_base += " AND tipo LIKE ?"
-        params.append(f'%{filtros["tipo"]}%')
-    
-    if filtros['folio']:
-        query_base += " AND folio LIKE ?"
-        params.append(f'%{filtros["folio"]}%')
-    
-    if filtros['estado']:
-        query_base += " AND estado = ?"
-        params.append(filtros['estado'])
-    
-    if filtros['fecha_desde']:
-        query_base += " AND fecha >= ?"
-        params.append(filtros['fecha_desde'])
-    
-    if filtros['fecha_hasta']:
-        query_base += " AND fecha <= ?"
-        params.append(filtros['fecha_hasta'])
-    
-    # Primero contar el total de registros
-    count_query = "SELECT COUNT(*) " + query_base
-    cursor.execute(count_query, params)
-    total = cursor.fetchone()[0]
-    
-    # Calcular total de páginas
-    total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-    
-    # Asegurar que page esté dentro del rango válido
-    if page < 1:
-        page = 1
-    elif page > total_pages:
-        page = total_pages
-    
-    # Consulta paginada
-    query = """
-        SELECT tipo, folio, fecha, concepto, total, estado, 
-               id_cliente, id_proveedor, creado_en
-    """ + query_base + """
-        ORDER BY fecha DESC, creado_en DESC
-        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
-    """
-    
-    # Agregar parámetros de paginación
-    params_paginated = params + [offset, per_page]
-    
-    cursor.execute(query, params_paginated)
-    comprobantes = cursor.fetchall()
-    
-    conn.close()
+    comprobantes, total, page, total_pages = LISTADO_COMPROBANTES.pagina(
+        filtros, page=page, per_page=per_page, orden=request.args.get('orden')
+    )
     
     # Convertir a lista de diccionarios para facilitar el uso en templates
     comprobantes_list = []
@@ -199,6 +176,7 @@ def nuevo_comprobante():
                 ))
                 
                 conn.commit()
+                emitir_al_confirmar('comprobante', tipo=form.tipo.data, folio=form.folio.data)
                 flash('Comprobante creado exitosamente!', 'success')
                 return redirect(url_for('comprobantes.comprobantes'))
                 
@@ -292,6 +270,8 @@ def editar_comprobante(tipo, folio):
                     form.estado.data, form.id_cliente.data or None, 
                     form.id_proveedor.data or None, tipo, folio))
                 conn.commit()
+                # El encabezado (concepto, fecha) también sale en el mayor general
+                emitir_al_confirmar('comprobante', tipo=tipo, folio=folio)
                 flash('Actualizado correctamente', 'success')
                 return redirect(url_for('comprobantes.comprobantes'))
             except Exception as e:
@@ -318,13 +298,20 @@ def eliminar_comprobante(tipo, folio):
         cursor = conn.cursor()
         
         # Primero eliminar los asientos relacionados (si existe la tabla asientos_contables)
+        cuentas = []
         try:
+            cursor.execute("""
+                SELECT DISTINCT id_cuenta FROM asientos_contables
+                WHERE id_comprobante_tipo = ? AND id_comprobante_folio = ?
+            """, (tipo, folio))
+            cuentas = [fila[0] for fila in cursor.fetchall()]
             cursor.execute("""
                 DELETE FROM asientos_contables 
                 WHERE id_comprobante_tipo = ? AND id_comprobante_folio = ?
             """, (tipo, folio))
         except:
             pass  # La tabla puede no existir
+        actualizar_actividad(cursor, *cuentas)
         
         # Luego eliminar el comprobante
         cursor.execute("""
@@ -333,6 +320,7 @@ def eliminar_comprobante(tipo, folio):
         """, (tipo, folio))
         
         conn.commit()
+        emitir_al_confirmar('asiento', tipo=tipo, folio=folio, cuentas=cuentas)
         flash('Comprobante eliminado exitosamente!', 'success')
         
     except Exception as e:
@@ -348,61 +336,10 @@ def eliminar_comprobante(tipo, folio):
 # Ruta para exportar a Excel
 @comprobantes_bp.route('/comprobantes/exportar/excel')
 def comprobantes_excel():
-    from config.db import get_connection
     from io import BytesIO
     
-    # Obtener filtros
-    tipo = request.args.get('tipo', '')
-    folio = request.args.get('folio', '')
-    estado = request.args.get('estado', '')
-    fecha_desde = request.args.get('fecha_desde', '')
-    fecha_hasta = request.args.get('fecha_hasta', '')
-    id_cliente = request.args.get('id_cliente', '')
-    
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Construir query con filtros
-    where_clauses = []
-    params = []
-    
-    if tipo:
-        where_clauses.append("tipo LIKE ?")
-        params.append(f'%{tipo}%')
-    
-    if folio:
-        where_clauses.append("folio LIKE ?")
-        params.append(f'%{folio}%')
-    
-    if estado:
-        where_clauses.append("estado = ?")
-        params.append(estado)
-    
-    if fecha_desde:
-        where_clauses.append("fecha >= ?")
-        params.append(fecha_desde)
-    
-    if fecha_hasta:
-        where_clauses.append("fecha <= ?")
-        params.append(fecha_hasta)
-    
-    if id_cliente:
-        where_clauses.append("id_cliente = ?")
-        params.append(int(id_cliente))
-    
-    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
-    
-    query = f"""
-        SELECT tipo, folio, fecha, concepto, total, estado, 
-               id_cliente, id_proveedor, creado_en
-        FROM comprobantes
-        WHERE {where_sql}
-        ORDER BY fecha DESC, creado_en DESC
-    """
-    
-    cursor.execute(query, params)
-    comprobantes = cursor.fetchall()
-    conn.close()
+    # Se recorre en streaming (fetchmany) mientras se arma el reporte
+    comprobantes = LISTADO_COMPROBANTES.iterar(request.args)
     
     # Crear DataFrame
     data = []
@@ -444,45 +381,13 @@ def comprobantes_excel():
 # Ruta para exportar a PDF
 @comprobantes_bp.route('/comprobantes/exportar/pdf')
 def comprobantes_pdf():
-    from config.db import get_connection
-    
     # Obtener filtros
     tipo = request.args.get('tipo', '')
     folio = request.args.get('folio', '')
     estado = request.args.get('estado', '')
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Construir query con filtros
-    where_clauses = []
-    params = []
-    
-    if tipo:
-        where_clauses.append("tipo LIKE ?")
-        params.append(f'%{tipo}%')
-    
-    if folio:
-        where_clauses.append("folio LIKE ?")
-        params.append(f'%{folio}%')
-    
-    if estado:
-        where_clauses.append("estado = ?")
-        params.append(estado)
-    
-    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
-    
-    query = f"""
-        SELECT tipo, folio, fecha, concepto, total, estado, 
-               id_cliente, id_proveedor, creado_en
-        FROM comprobantes
-        WHERE {where_sql}
-        ORDER BY fecha DESC, creado_en DESC
-    """
-    
-    cursor.execute(query, params)
-    comprobantes = cursor.fetchall()
-    conn.close()
+    # Se recorre en streaming (fetchmany) mientras se arma el reporte
+    comprobantes = LISTADO_COMPROBANTES.iterar({'tipo': tipo, 'folio': folio, 'estado': estado})
     
     # Crear PDF
     buffer = BytesIO()
@@ -613,7 +518,6 @@ def asientos(tipo, folio):
     
     page = request.args.get('page', 1, type=int)
     per_page = 20
-    offset = (page - 1) * per_page
     
     # Filtros para asientos
     id_cuenta = request.args.get('id_cuenta', '')
@@ -651,43 +555,11 @@ def asientos(tipo, folio):
             'creado_en': comprobante_row.creado_en.strftime('%Y-%m-%d %H:%M:%S') if hasattr(comprobante_row.creado_en, 'strftime') else str(comprobante_row.creado_en)
         }
         
-        # Construir WHERE clause para asientos
-        where_clauses = ["id_comprobante_tipo = ?", "id_comprobante_folio = ?"]
-        params = [tipo, folio]
-        
-        if id_cuenta:
-            where_clauses.append("id_cuenta LIKE ?")
-            params.append(f'%{id_cuenta}%')
-        
-        if concepto:
-            where_clauses.append("concepto LIKE ?")
-            params.append(f'%{concepto}%')
-        
-        if referencia:
-            where_clauses.append("referencia LIKE ?")
-            params.append(f'%{referencia}%')
-        
-        where_sql = " AND ".join(where_clauses)
-        
-        # Contar total de asientos
-        count_query = f"SELECT COUNT(*) FROM asientos_contables WHERE {where_sql}"
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()[0]
-        
-        # Obtener asientos paginados
-        query = f"""
-            SELECT consecutivo, id_cuenta, fecha, concepto, 
-                   debe, haber, referencia, creado_en,
-                   id_comprobante_tipo, id_comprobante_folio
-            FROM asientos_contables
-            WHERE {where_sql}
-            ORDER BY consecutivo
-            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
-        """
-        
-        params_paginated = params + [offset, per_page]
-        cursor.execute(query, params_paginated)
-        asientos_data = cursor.fetchall()
+        asientos_data, total, page, total_pages = LISTADO_ASIENTOS_COMPROBANTE.pagina(
+            {'tipo': tipo, 'folio': folio, 'id_cuenta': id_cuenta,
+             'concepto': concepto, 'referencia': referencia},
+            page=page, per_page=per_page
+        )
         
         # Convertir a lista de diccionarios
         asientos_list = []
@@ -714,9 +586,6 @@ def asientos(tipo, folio):
             total_debe += debe_val
             total_haber += haber_val
         
-        # Calcular total de páginas
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        
         # Crear un objeto de paginación simulado
         class Pagination:
             def __init__(self, items, page, per_page, total):
@@ -854,8 +723,10 @@ def nuevo_asiento(tipo, folio):
                     float(form.haber.data) if form.haber.data else 0.0,
                     form.referencia.data or ''
                 ))
+                actualizar_actividad(cursor, form.id_cuenta.data)
                 
                 conn.commit()
+                emitir_al_confirmar('asiento', tipo=tipo, folio=folio, cuentas=[form.id_cuenta.data])
                 flash('Asiento creado exitosamente!', 'success')
                 return redirect(url_for('comprobantes.asientos', tipo=tipo, folio=folio))
                 
@@ -883,17 +754,19 @@ def editar_asiento(tipo, folio, consecutivo):
             cursor = conn.cursor()
             
             try:
-                # Verificar si el asiento existe
+                # Verificar si el asiento existe (y con qué cuenta estaba)
                 cursor.execute("""
-                    SELECT COUNT(*) FROM asientos_contables 
+                    SELECT id_cuenta FROM asientos_contables 
                     WHERE id_comprobante_tipo = ? 
                     AND id_comprobante_folio = ? 
                     AND consecutivo = ?
                 """, (tipo, folio, consecutivo))
                 
-                if cursor.fetchone()[0] == 0:
+                anterior = cursor.fetchone()
+                if not anterior:
                     flash('Asiento no encontrado', 'danger')
                     return redirect(url_for('comprobantes.asientos', tipo=tipo, folio=folio))
+                cuentas = [anterior[0], form.id_cuenta.data]
                 
                 # Actualizar asiento
                 cursor.execute("""
@@ -914,8 +787,10 @@ def editar_asiento(tipo, folio, consecutivo):
                     folio,
                     consecutivo
                 ))
+                actualizar_actividad(cursor, *cuentas)
                 
                 conn.commit()
+                emitir_al_confirmar('asiento', tipo=tipo, folio=folio, cuentas=cuentas)
                 flash('Asiento actualizado exitosamente!', 'success')
                 return redirect(url_for('comprobantes.asientos', tipo=tipo, folio=folio))
                 
@@ -989,15 +864,16 @@ def eliminar_asiento(tipo, folio, consecutivo):
         conn = get_connection()
         cursor = conn.cursor()
         
-        # Verificar si el asiento existe
+        # Verificar si el asiento existe (y con qué cuenta)
         cursor.execute("""
-            SELECT COUNT(*) FROM asientos_contables 
+            SELECT id_cuenta FROM asientos_contables 
             WHERE id_comprobante_tipo = ? 
             AND id_comprobante_folio = ? 
             AND consecutivo = ?
         """, (tipo, folio, consecutivo))
         
-        if cursor.fetchone()[0] == 0:
+        asiento = cursor.fetchone()
+        if not asiento:
             flash('Asiento no encontrado', 'danger')
         else:
             # Eliminar asiento
@@ -1007,8 +883,10 @@ def eliminar_asiento(tipo, folio, consecutivo):
                 AND id_comprobante_folio = ? 
                 AND consecutivo = ?
             """, (tipo, folio, consecutivo))
+            actualizar_actividad(cursor, asiento[0])
             
             conn.commit()
+            emitir_al_confirmar('asiento', tipo=tipo, folio=folio, cuentas=[asiento[0]])
             flash('Asiento eliminado exitosamente!', 'success')
         
     except Exception as e:
@@ -1031,7 +909,7 @@ def asientos_excel(tipo, folio):
     id_cuenta = request.args.get('id_cuenta', '')
     concepto = request.args.get('concepto', '')
     
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     try:
@@ -1144,7 +1022,7 @@ def asientos_pdf(tipo, folio):
     # Obtener filtros
     id_cuenta = request.args.get('id_cuenta', '')
     
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     try:
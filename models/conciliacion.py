@@ -1,5 +1,6 @@
 # models/conciliacion.py
 from config.db import get_connection
+from utils.eventos import emitir_al_confirmar
 from datetime import datetime
 
 def get_cuentas_bancarias():
@@ -34,6 +35,7 @@ def crear_conciliacion(id_cuenta, fecha_inicio, fecha_fin, saldo_banco):
         
         id_conc = cursor.fetchone()[0]
         conn.commit()
+        emitir_al_confirmar('conciliacion', id_conciliacion=id_conc)
         return id_conc
     except Exception as e:
         conn.rollback()
@@ -79,6 +81,7 @@ def conciliar_conciliacion(id_conciliacion, id_usuario, saldo_sistema, observaci
         """, (saldo_sistema, diferencia, datetime.now(), id_usuario, observaciones, id_conciliacion))
 
         conn.commit()
+        emitir_al_confirmar('conciliacion', id_conciliacion=id_conciliacion)
     except Exception as e:
         conn.rollback()
         raise e
@@ -0,0 +1,83 @@
+# models/cuentas_actividad.py
+"""
+Tabla cuentas_actividad: por cuenta, primera y última fecha con
+movimiento, cantidad de movimientos y cuántos cayeron en los últimos 30 y
+90 días. Los asientos de models/comprobantes.py la actualizan en la misma
+transacción con actualizar_actividad(); la alerta de cuentas inactivas la
+consulta por rango sobre ultima_fecha en vez de recorrer los asientos.
+
+Los conteos de 30/90 días son al momento de `actualizado_en`: las cuentas
+sin movimientos nuevos solo se recalculan al reconstruir (programar
+`flask --app app cuentas-actividad` una vez al día).
+"""
+from config.db import get_connection
+
+# Recalcula la fila de una cuenta desde sus asientos (búsqueda por el
+# índice id_cuenta, fecha); sin asientos, la fila se borra
+_SQL_ACTUALIZAR = """
+    MERGE cuentas_actividad WITH (HOLDLOCK) AS ca
+    USING (
+        SELECT ? AS codigo, MIN(fecha) AS primera_fecha, MAX(fecha) AS ultima_fecha,
+               COUNT(*) AS movimientos,
+               ISNULL(SUM(CASE WHEN fecha >= DATEADD(day, -30, CAST(GETDATE() AS date)) THEN 1 ELSE 0 END), 0) AS movimientos_30,
+               ISNULL(SUM(CASE WHEN fecha >= DATEADD(day, -90, CAST(GETDATE() AS date)) THEN 1 ELSE 0 END), 0) AS movimientos_90
+        FROM asientos_contables
+        WHERE id_cuenta = ?
+    ) AS a
+    ON ca.codigo = a.codigo
+    WHEN MATCHED AND a.movimientos = 0 THEN
+        DELETE
+    WHEN MATCHED THEN
+        UPDATE SET primera_fecha = a.primera_fecha, ultima_fecha = a.ultima_fecha,
+                   movimientos = a.movimientos, movimientos_30 = a.movimientos_30,
+                   movimientos_90 = a.movimientos_90, actualizado_en = SYSDATETIME()
+    WHEN NOT MATCHED AND a.movimientos > 0 THEN
+        INSERT (codigo, primera_fecha, ultima_fecha, movimientos, movimientos_30, movimientos_90)
+        VALUES (a.codigo, a.primera_fecha, a.ultima_fecha, a.movimientos, a.movimientos_30, a.movimientos_90);
+"""
+
+
+def actualizar_actividad(cursor, *cuentas):
+    """
+    Recalcula la actividad de las cuentas indicadas usando el cursor de la
+    escritura en curso. Para un asiento modificado: la cuenta anterior y
+    la nueva.
+    """
+    for cuenta in sorted({c for c in cuentas if c}):
+        cursor.execute(_SQL_ACTUALIZAR, (cuenta, cuenta))
+
+
+def reconstruir_cuentas_actividad():
+    """Recalcula toda la tabla desde asientos_contables. Devuelve la cantidad de filas."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM cuentas_actividad")
+        cursor.execute("""
+            INSERT INTO cuentas_actividad
+            (codigo, primera_fecha, ultima_fecha, movimientos, movimientos_30, movimientos_90)
+            SELECT id_cuenta, MIN(fecha), MAX(fecha), COUNT(*),
+                   SUM(CASE WHEN fecha >= DATEADD(day, -30, CAST(GETDATE() AS date)) THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN fecha >= DATEADD(day, -90, CAST(GETDATE() AS date)) THEN 1 ELSE 0 END)
+            FROM asientos_contables
+            GROUP BY id_cuenta
+        """)
+        filas = cursor.rowcount
+        conn.commit()
+        return filas
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Registra el comando `flask cuentas-actividad`."""
+    import click
+
+    @app.cli.command('cuentas-actividad')
+    def cuentas_actividad():
+        """Reconstruye cuentas_actividad desde asientos_contables."""
+        filas = reconstruir_cuentas_actividad()
+        click.echo(f"Actividad de cuentas reconstruida ({filas} cuentas)")
@@ -11,6 +11,7 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import inch
+from utils.eventos import emitir_al_confirmar
 
 # Crear Blueprint
 cuentas_bp = Blueprint('cuentas', __name__, template_folder='templates/cuentas_contables')
@@ -522,6 +523,7 @@ def nuevo_saldo_cuenta():
                 
                 db.session.add(saldo)
                 db.session.commit()
+                emitir_al_confirmar('saldo', id_cuenta=saldo.id_cuenta, periodo=saldo.periodo)
                 
                 flash('Saldo de cuenta creado exitosamente!', 'success')
                 return redirect(url_for('cuentas.saldos_cuentas'))
@@ -550,6 +552,7 @@ def editar_saldo_cuenta(id_cuenta, periodo):
             saldo.saldo_final = form.saldo_final.data
             
             db.session.commit()
+            emitir_al_confirmar('saldo', id_cuenta=id_cuenta, periodo=periodo)
             flash('Saldo de cuenta actualizado exitosamente!', 'success')
             return redirect(url_for('cuentas.saldos_cuentas'))
             
@@ -572,6 +575,7 @@ def eliminar_saldo_cuenta(id_cuenta, periodo):
         
         db.session.delete(saldo)
         db.session.commit()
+        emitir_al_confirmar('saldo', id_cuenta=id_cuenta, periodo=periodo)
         
         flash('Saldo de cuenta eliminado exitosamente!', 'success')
         
@@ -615,6 +619,7 @@ def calcular_saldo_final(id_cuenta, periodo):
         
         saldo.saldo_final = saldo_final
         db.session.commit()
+        emitir_al_confirmar('saldo', id_cuenta=id_cuenta, periodo=periodo)
         
         flash(f'Saldo final calculado: ${saldo_final:,.2f}', 'success')
         
@@ -665,6 +670,7 @@ def procesar_movimientos(id_cuenta, periodo):
         
         saldo.saldo_final = saldo_final
         db.session.commit()
+        emitir_al_confirmar('saldo', id_cuenta=id_cuenta, periodo=periodo)
         
         flash(f'Movimientos procesados. Saldo final: ${saldo_final:,.2f}', 'success')
         
@@ -720,6 +726,7 @@ def procesar_todos_saldos(periodo):
             procesadas += 1
         
         db.session.commit()
+        emitir_al_confirmar('saldo', id_cuenta=None, periodo=periodo)
         flash(f'Procesados {procesadas} saldos para el período {periodo}', 'success')
         
     except Exception as e:
@@ -966,6 +973,7 @@ def procesar_comprobante_contable(tipo, folio):
                 saldo.saldo_final += float(asiento.haber) - float(asiento.debe)
         
         db.session.commit()
+        emitir_al_confirmar('saldo', id_cuenta=None, periodo=periodo)
         return True, "Comprobante procesado exitosamente"
         
     except Exception as e:
@@ -1,21 +1,269 @@
 # models/dashboard_avanzado.py
 
-from datetime import datetime, timedelta
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from functools import partial
+import hashlib
+import os
+import threading
+import time
 import json
 
-from config.db import get_connection
+import numpy as np
+
+from config.db import get_connection, leer_del_primario
+from utils.cache import CacheTTL, cacheado
+from utils.eventos import CanalSSE, al_ocurrir
+from models.alertas import resumen_alertas
+from models.libro_mayor import libro_mayor, a_decimal
+
+# Carga concurrente de widgets: cada uno usa su propia conexión del pool
+# (los hilos no tienen contexto de solicitud) y pyodbc libera el GIL
+# mientras espera al servidor.
+WIDGETS_HILOS = int(os.environ.get("DASHBOARD_WORKERS", 8))  # por debajo de DB_POOL_MAX
+WIDGET_TIMEOUT = float(os.environ.get("DASHBOARD_WIDGET_TIMEOUT", 10))  # segundos por widget
+
+_executor = ThreadPoolExecutor(max_workers=WIDGETS_HILOS, thread_name_prefix='dashboard')
+
+
+def _medir_widget(funcion, args):
+    inicio = time.perf_counter()
+    try:
+        return funcion(*args), None, time.perf_counter() - inicio
+    except Exception as e:
+        return None, e, time.perf_counter() - inicio
+
+
+def cargar_widgets(cargadores, timeout=WIDGET_TIMEOUT):
+    """
+    Ejecuta en paralelo los cargadores {nombre: (funcion, args, vacio)}.
+    Un widget que falla o supera `timeout` segundos queda con su valor
+    `vacio` en lugar de romper la página.
+
+    Devuelve (datos, tiempos) donde tiempos[nombre] = (ms, estado) con
+    estado 'ok', 'error' o 'timeout'.
+    """
+    inicio = time.perf_counter()
+    futuros = {nombre: _executor.submit(_medir_widget, funcion, args)
+               for nombre, (funcion, args, _) in cargadores.items()}
+    limite = inicio + timeout
+
+    datos, tiempos = {}, {}
+    for nombre, futuro in futuros.items():
+        vacio = cargadores[nombre][2]
+        try:
+            resultado, error, duracion = futuro.result(timeout=max(0, limite - time.perf_counter()))
+        except FuturesTimeout:
+            futuro.cancel()  # si aún no empezó; si ya corre, termina en segundo plano
+            datos[nombre] = vacio
+            tiempos[nombre] = ((time.perf_counter() - inicio) * 1000, 'timeout')
+            print(f"Widget {nombre}: sin respuesta en {timeout}s")
+            continue
+        if error is not None:
+            datos[nombre] = vacio
+            tiempos[nombre] = (duracion * 1000, 'error')
+            print(f"Error en widget {nombre}: {str(error)}")
+        else:
+            datos[nombre] = resultado
+            tiempos[nombre] = (duracion * 1000, 'ok')
+    return datos, tiempos
+
+
+def server_timing(tiempos):
+    """Cabecera Server-Timing (visible en las herramientas del navegador)."""
+    return ", ".join(f'{nombre};desc="{estado}";dur={ms:.1f}'
+                     for nombre, (ms, estado) in tiempos.items())
+
+
+# ======================
+# WIDGETS COMO JSON (/api/dashboard/<widget>)
+# ======================
+
+# nombre -> (método de DashboardAvanzado, valor vacío si falla)
+WIDGETS = {
+    'summary': ('get_executive_summary', {}),
+    'saldos': ('get_saldos_por_cuenta', []),
+    'facturas': ('get_facturas_recientes', []),
+    'conciliaciones': ('get_conciliaciones_pendientes', []),
+    'top_clientes': ('get_top_clientes', []),
+    'movimientos': ('get_movimientos_bancarios_recientes', []),
+    'alertas': ('get_alertas_sistema', {'total': 0, 'por_tipo': [], 'alertas': []}),
+    'estado_resultados': ('get_estado_resultados_mensual', []),
+    # Gráficos
+    'ventas_chart': ('get_ventas_mensuales', None),
+    'saldos_chart': ('get_saldos_por_tipo_cuenta', None),
+}
+
+
+# Parámetros que acepta cada widget en /api/batch: enteros entre 1 y
+# PARAMETRO_MAXIMO (cantidad de filas o de meses)
+PARAMETROS_WIDGET = {
+    'saldos': ('top_n',),
+    'facturas': ('limit',),
+    'top_clientes': ('limit',),
+    'movimientos': ('limit',),
+    'alertas': ('limit',),
+    'ventas_chart': ('meses',),
+}
+PARAMETRO_MAXIMO = 100
+
+
+def parametros_widget(nombre, valores):
+    """Valida los parámetros pedidos para un widget. ValueError si no son válidos."""
+    if nombre not in WIDGETS:
+        raise ValueError(f"Widget desconocido: {nombre}")
+    permitidos = PARAMETROS_WIDGET.get(nombre, ())
+    resultado = {}
+    for clave, valor in (valores or {}).items():
+        if clave not in permitidos:
+            raise ValueError(f"Parámetro no válido para {nombre}: {clave}")
+        try:
+            valor = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"{nombre}.{clave} debe ser un entero")
+        resultado[clave] = min(max(valor, 1), PARAMETRO_MAXIMO)
+    return resultado
+
+
+def _a_json(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+
+def widget_json(valor):
+    """
+    JSON canónico del widget (claves ordenadas, sin espacios): el mismo
+    contenido produce siempre el mismo texto y por lo tanto el mismo ETag.
+    """
+    return json.dumps(valor, default=_a_json, sort_keys=True,
+                      separators=(',', ':'), ensure_ascii=False)
+
+
+def etag_widget(cuerpo):
+    """ETag (sin comillas) a partir del hash del contenido."""
+    return hashlib.sha256(cuerpo.encode('utf-8')).hexdigest()[:32]
+
+
+# Los widgets son de toda la empresa: se cachean por método y argumentos
+# (TTL en segundos por widget) y se comparten entre usuarios. Los métodos
+# cacheados dejan pasar las excepciones, para que un error de la base no
+# quede guardado como dato: el valor vacío lo pone quien llama
+# (cargar_widgets).
+cache_dashboard = CacheTTL('dashboard')
+
+# ======================
+# ACTUALIZACIONES EN VIVO (SSE)
+# ======================
+
+# Cuando una escritura termina, los widgets afectados se recalculan una
+# sola vez (del primario, sin esperar a la réplica) y solo los que
+# cambiaron se envían a todos los navegadores conectados.
+canal_dashboard = CanalSSE('dashboard')
+
+# evento emitido por los modelos -> widgets que hay que recalcular
+WIDGETS_POR_EVENTO = {
+    'factura': ['summary', 'facturas', 'top_clientes', 'alertas', 'ventas_chart', 'estado_resultados'],
+    'comprobante': ['saldos', 'saldos_chart', 'alertas'],
+    'asiento': ['saldos', 'saldos_chart', 'alertas'],
+    'conciliacion': ['summary', 'conciliaciones', 'movimientos'],
+}
+
+SSE_AGRUPAR = float(os.environ.get("DASHBOARD_SSE_AGRUPAR", 0.5))  # segundos para juntar escrituras seguidas
+
+_pendientes = set()
+_pendientes_lock = threading.Lock()
+_ultimos_etags = {}
+_difusor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dashboard-sse')
+
+
+def _del_primario(funcion):
+    def envoltura(*args):
+        with leer_del_primario():
+            return funcion(*args)
+    return envoltura
+
+
+def _difundir_cambios():
+    try:
+        _recalcular_y_publicar()
+    except Exception as e:
+        print(f"Error al difundir cambios del dashboard: {str(e)}")
+
+
+def _recalcular_y_publicar():
+    time.sleep(SSE_AGRUPAR)
+    with _pendientes_lock:
+        nombres = sorted(_pendientes)
+        _pendientes.clear()
+
+    cargadores = {nombre: (_del_primario(funcion), args, vacio)
+                  for nombre, (funcion, args, vacio) in DashboardAvanzado().cargadores(nombres).items()}
+    datos, tiempos = cargar_widgets(cargadores)
+    for nombre in nombres:
+        if tiempos[nombre][1] != 'ok':
+            continue
+        cuerpo = widget_json(datos[nombre])
+        etag = etag_widget(cuerpo)
+        if _ultimos_etags.get(nombre) == etag:
+            continue
+        _ultimos_etags[nombre] = etag
+        canal_dashboard.publicar('widget', '{"widget":%s,"etag":%s,"datos":%s}' % (
+            json.dumps(nombre), json.dumps(f'"{etag}"'), cuerpo))
+
+
+def _al_cambiar(evento):
+    def oyente(**datos):
+        widgets = WIDGETS_POR_EVENTO[evento]
+        for nombre in widgets:
+            cache_dashboard.invalidar(WIDGETS[nombre][0])
+        if not canal_dashboard.estadisticas()['clientes']:
+            return  # nadie conectado: se recalcula en la próxima consulta
+        with _pendientes_lock:
+            programar = not _pendientes
+            _pendientes.update(widgets)
+        if programar:
+            _difusor.submit(_difundir_cambios)
+    return oyente
+
+
+for _evento in WIDGETS_POR_EVENTO:
+    al_ocurrir(_evento, _al_cambiar(_evento))
+
+
+# resumen_mensual_facturas guarda el mes como AAAAMM
+_MES_DESDE_PERIODO = "CAST(periodo / 100 AS char(4)) + '-' + RIGHT('0' + CAST(periodo % 100 AS varchar(2)), 2)"
+_PERIODO_HACE_MESES = "YEAR(DATEADD(month, -?, GETDATE())) * 100 + MONTH(DATEADD(month, -?, GETDATE()))"
 
 
 class DashboardAvanzado:
     def __init__(self):
         pass
     
+    def cargadores(self, nombres, user_id=None, parametros=None):
+        """
+        {nombre: (funcion, args, vacio)} de los widgets pedidos, para
+        cargar_widgets(). `parametros` es {nombre: kwargs} ya validados con
+        parametros_widget().
+        """
+        parametros = parametros or {}
+        resultado = {}
+        for nombre in nombres:
+            metodo, vacio = WIDGETS[nombre]
+            args = (user_id,) if nombre == 'summary' else ()
+            funcion = getattr(self, metodo)
+            if parametros.get(nombre):
+                funcion = partial(funcion, **parametros[nombre])
+            resultado[nombre] = (funcion, args, vacio)
+        return resultado
+    
     def execute_query(self, query, params=None):
         """Ejecutar consulta y devolver resultados como diccionarios"""
-        conn = get_connection()
+        es_lectura = query.strip().upper().startswith('SELECT')
+        conn = get_connection(readonly=es_lectura)
         cursor = conn.cursor()
         try:
             if params:
@@ -23,7 +271,7 @@ class DashboardAvanzado:
             else:
                 cursor.execute(query)
             
-            if query.strip().upper().startswith('SELECT'):
+            if es_lectura:
                 columns = [column[0] for column in cursor.description]
                 rows = cursor.fetchall()
                 return [dict(zip(columns, row)) for row in rows]
@@ -34,23 +282,7 @@ class DashboardAvanzado:
             cursor.close()
             conn.close()
     
-    def execute_query_df(self, query, params=None):
-        """Ejecutar consulta y devolver resultados como DataFrame"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            columns = [column[0] for column in cursor.description]
-            rows = cursor.fetchall()
-            return pd.DataFrame.from_records(rows, columns=columns)
-        finally:
-            cursor.close()
-            conn.close()
-    
+    @cacheado(cache_dashboard, ttl=60, ignorar=('user_id',))
     def get_executive_summary(self, user_id=None):
         """Resumen ejecutivo del sistema"""
         summary = {
@@ -64,384 +296,215 @@ class DashboardAvanzado:
             'margen_utilidad': 0
         }
         
-        try:
-            # Total ventas del mes actual
-            query = """
-            SELECT ISNULL(SUM(total), 0) as total_ventas
-            FROM facturas 
-            WHERE tipo = 'ingreso' 
+        # Todo el resumen en una sola consulta:
+        # - ventas/gastos del mes salen de resumen_mensual_facturas
+        # - clientes activos es un rango de fecha sobre idx_facturas_fecha
+        # - facturas vencidas usa idx_facturas_estatus_vencimiento
+        query = """
+        SELECT
+            m.total_ventas, m.total_gastos, f.clientes_activos,
+            v.facturas_pendientes, b.saldo_bancos, c.conciliaciones_pendientes
+        FROM (
+            SELECT
+                ISNULL(SUM(CASE WHEN tipo = 'ingreso' THEN total END), 0) AS total_ventas,
+                ISNULL(SUM(CASE WHEN tipo = 'egreso' THEN total END), 0) AS total_gastos
+            FROM resumen_mensual_facturas
+            WHERE periodo = YEAR(GETDATE()) * 100 + MONTH(GETDATE())
             AND estatus = 'activa'
-            AND MONTH(fecha) = MONTH(GETDATE())
-            AND YEAR(fecha) = YEAR(GETDATE())
-            """
-            result = self.execute_query(query)
-            if result:
-                summary['total_ventas'] = float(result[0]['total_ventas'])
-            
-            # Total gastos del mes
-            query = """
-            SELECT ISNULL(SUM(total), 0) as total_gastos
-            FROM facturas 
-            WHERE tipo = 'egreso' 
-            AND estatus = 'activa'
-            AND MONTH(fecha) = MONTH(GETDATE())
-            AND YEAR(fecha) = YEAR(GETDATE())
-            """
-            result = self.execute_query(query)
-            if result:
-                summary['total_gastos'] = float(result[0]['total_gastos'])
-            
-            # Saldo total en bancos
-            query = """
-            SELECT 
-                ISNULL(SUM(CASE 
-                    WHEN mb.monto >= 0 THEN mb.monto 
-                    ELSE 0 
-                END), 0) as saldo_positivo,
-                ISNULL(SUM(CASE 
-                    WHEN mb.monto < 0 THEN ABS(mb.monto) 
-                    ELSE 0 
-                END), 0) as saldo_negativo
+        ) m
+        CROSS JOIN (
+            SELECT COUNT(DISTINCT id_cliente) AS clientes_activos
+            FROM facturas
+            WHERE fecha >= DATEADD(day, -90, GETDATE())
+        ) f
+        CROSS JOIN (
+            SELECT COUNT(*) AS facturas_pendientes
+            FROM facturas
+            WHERE estatus = 'activa'
+            AND fecha_vencimiento < GETDATE()
+        ) v
+        CROSS JOIN (
+            SELECT ISNULL(SUM(mb.monto), 0) AS saldo_bancos
             FROM movimientos_bancarios mb
             INNER JOIN cuentas_bancarias cb ON mb.id_cuenta_bancaria = cb.id_cuenta_bancaria
             WHERE mb.conciliado = 1
-            """
-            result = self.execute_query(query)
-            if result:
-                saldo_positivo = float(result[0]['saldo_positivo'])
-                saldo_negativo = float(result[0]['saldo_negativo'])
-                summary['saldo_bancos'] = saldo_positivo - saldo_negativo
-            
-            # Clientes activos (con facturas en los últimos 90 días)
-            query = """
-            SELECT ISNULL(COUNT(DISTINCT id_cliente), 0) as clientes_activos
-            FROM facturas 
-            WHERE id_cliente IS NOT NULL 
-            AND fecha >= DATEADD(day, -90, GETDATE())
-            """
-            result = self.execute_query(query)
-            if result:
-                summary['clientes_activos'] = int(result[0]['clientes_activos'])
-            
-            # Facturas pendientes de pago
-            query = """
-            SELECT ISNULL(COUNT(*), 0) as facturas_pendientes
-            FROM facturas 
-            WHERE estatus = 'activa' 
-            AND fecha_vencimiento IS NOT NULL 
-            AND fecha_vencimiento < GETDATE()
-            """
-            result = self.execute_query(query)
-            if result:
-                summary['facturas_pendientes'] = int(result[0]['facturas_pendientes'])
-            
-            # Conciliaciones pendientes
-            query = """
-            SELECT ISNULL(COUNT(*), 0) as conciliaciones_pendientes
-            FROM conciliaciones 
+        ) b
+        CROSS JOIN (
+            SELECT COUNT(*) AS conciliaciones_pendientes
+            FROM conciliaciones
             WHERE estatus = 'pendiente'
-            """
-            result = self.execute_query(query)
-            if result:
-                summary['conciliaciones_pendientes'] = int(result[0]['conciliaciones_pendientes'])
+        ) c
+        """
+        result = self.execute_query(query)
+        if result:
+            fila = result[0]
+            summary['total_ventas'] = float(fila['total_ventas'])
+            summary['total_gastos'] = float(fila['total_gastos'])
+            summary['saldo_bancos'] = float(fila['saldo_bancos'])
+            summary['clientes_activos'] = int(fila['clientes_activos'])
+            summary['facturas_pendientes'] = int(fila['facturas_pendientes'])
+            summary['conciliaciones_pendientes'] = int(fila['conciliaciones_pendientes'])
             
-            # Cálculo de utilidad
-            summary['utilidad_neta'] = summary['total_ventas'] - summary['total_gastos']
-            if summary['total_ventas'] > 0:
-                summary['margen_utilidad'] = (summary['utilidad_neta'] / summary['total_ventas']) * 100
+        # Cálculo de utilidad
+        summary['utilidad_neta'] = summary['total_ventas'] - summary['total_gastos']
+        if summary['total_ventas'] > 0:
+            summary['margen_utilidad'] = (summary['utilidad_neta'] / summary['total_ventas']) * 100
                 
-        except Exception as e:
-            print(f"Error en get_executive_summary: {str(e)}")
-        
         return summary
     
+    @cacheado(cache_dashboard, ttl=300)
     def get_saldos_por_cuenta(self, top_n=10):
-        """Saldos por cuenta contable - Versión simplificada"""
-        try:
-            query = """
-            SELECT 
-                cc.codigo,
-                cc.nombre,
-                cc.tipo,
-                ISNULL(SUM(ac.debe), 0) as total_debe,
-                ISNULL(SUM(ac.haber), 0) as total_haber,
-                CASE 
-                    WHEN cc.tipo IN ('Activo', 'Gastos') THEN ISNULL(SUM(ac.debe - ac.haber), 0)
-                    WHEN cc.tipo IN ('Pasivo', 'Capital', 'Ingresos') THEN ISNULL(SUM(ac.haber - ac.debe), 0)
-                    ELSE 0 
-                END as saldo
-            FROM cuentas_contables cc
-            LEFT JOIN asientos_contables ac ON cc.codigo = ac.id_cuenta
-            WHERE cc.nivel = 3  -- Cuentas de detalle
-            GROUP BY cc.codigo, cc.nombre, cc.tipo
-            HAVING CASE 
-                WHEN cc.tipo IN ('Activo', 'Gastos') THEN ABS(ISNULL(SUM(ac.debe - ac.haber), 0))
-                WHEN cc.tipo IN ('Pasivo', 'Capital', 'Ingresos') THEN ABS(ISNULL(SUM(ac.haber - ac.debe), 0))
-                ELSE 0 
-            END > 0.01
-            ORDER BY ABS(saldo) DESC
-            """
-            result = self.execute_query(query)
-            return result[:top_n] if result else []
-        except Exception as e:
-            print(f"Error en get_saldos_por_cuenta: {str(e)}")
-            return []
+        """Cuentas de detalle con mayor saldo (según su naturaleza), del libro mayor en memoria"""
+        libro = libro_mayor()
+        debe, haber = (libro.acumular(v) for v in libro.movimientos())
+        saldo = libro.saldo_por_naturaleza(debe, haber)
+        candidatas = np.flatnonzero((libro.niveles == 3) & (np.abs(saldo) > 1))
+        mayores = candidatas[np.argsort(-np.abs(saldo[candidatas]), kind='stable')][:top_n]
+        return [{
+            'codigo': libro.codigos[i],
+            'nombre': libro.nombres[i],
+            'tipo': libro.tipos[i],
+            'total_debe': a_decimal(debe[i]),
+            'total_haber': a_decimal(haber[i]),
+            'saldo': a_decimal(saldo[i]),
+        } for i in mayores]
     
+    @cacheado(cache_dashboard, ttl=30)
     def get_facturas_recientes(self, limit=10):
         """Facturas recientes"""
-        try:
-            query = """
-            SELECT TOP(?) 
-                f.id_factura,
-                f.tipo,
-                f.folio,
-                f.fecha,
-                COALESCE(c.nombre, p.nombre, 'Sin nombre') as nombre_cliente_proveedor,
-                f.total,
-                f.estatus,
-                f.fecha_vencimiento
-            FROM facturas f
-            LEFT JOIN clientes c ON f.id_cliente = c.id_cliente
-            LEFT JOIN proveedores p ON f.id_proveedor = p.id_proveedor
-            WHERE f.estatus = 'activa'
-            ORDER BY f.fecha DESC
-            """
-            return self.execute_query(query, (limit,))
-        except Exception as e:
-            print(f"Error en get_facturas_recientes: {str(e)}")
-            return []
+        query = """
+        SELECT TOP(?) 
+            f.id_factura,
+            f.tipo,
+            f.folio,
+            f.fecha,
+            COALESCE(c.nombre, p.nombre, 'Sin nombre') as nombre_cliente_proveedor,
+            f.total,
+            f.estatus,
+            f.fecha_vencimiento
+        FROM facturas f
+        LEFT JOIN clientes c ON f.id_cliente = c.id_cliente
+        LEFT JOIN proveedores p ON f.id_proveedor = p.id_proveedor
+        WHERE f.estatus = 'activa'
+        ORDER BY f.fecha DESC
+        """
+        return self.execute_query(query, (limit,))
     
+    @cacheado(cache_dashboard, ttl=60)
     def get_conciliaciones_pendientes(self):
         """Conciliaciones bancarias pendientes"""
-        try:
-            query = """
-            SELECT 
-                c.id_conciliacion,
-                cb.nombre_banco,
-                c.fecha_inicio,
-                c.fecha_fin,
-                c.saldo_banco,
-                c.saldo_sistema,
-                c.diferencia,
-                c.estatus
-            FROM conciliaciones c
-            INNER JOIN cuentas_bancarias cb ON c.id_cuenta_bancaria = cb.id_cuenta_bancaria
-            WHERE c.estatus = 'pendiente'
-            ORDER BY c.fecha_inicio DESC
-            """
-            return self.execute_query(query)
-        except Exception as e:
-            print(f"Error en get_conciliaciones_pendientes: {str(e)}")
-            return []
+        query = """
+        SELECT 
+            c.id_conciliacion,
+            cb.nombre_banco,
+            c.fecha_inicio,
+            c.fecha_fin,
+            c.saldo_banco,
+            c.saldo_sistema,
+            c.diferencia,
+            c.estatus
+        FROM conciliaciones c
+        INNER JOIN cuentas_bancarias cb ON c.id_cuenta_bancaria = cb.id_cuenta_bancaria
+        WHERE c.estatus = 'pendiente'
+        ORDER BY c.fecha_inicio DESC
+        """
+        return self.execute_query(query)
     
+    @cacheado(cache_dashboard, ttl=600)
     def get_ventas_mensuales(self, meses=6):
         """Ventas mensuales para gráfico"""
-        try:
-            query = f"""
-            SELECT 
-                FORMAT(f.fecha, 'yyyy-MM') as mes,
-                ISNULL(SUM(CASE WHEN f.tipo = 'ingreso' THEN f.total ELSE 0 END), 0) as ventas,
-                ISNULL(SUM(CASE WHEN f.tipo = 'egreso' THEN f.total ELSE 0 END), 0) as gastos
-            FROM facturas f
-            WHERE f.fecha >= DATEADD(month, -{meses}, GETDATE())
-            AND f.estatus = 'activa'
-            GROUP BY FORMAT(f.fecha, 'yyyy-MM')
-            ORDER BY mes
-            """
-            df = self.execute_query_df(query)
+        # Lee resumen_mensual_facturas (unas pocas filas por mes)
+        query = f"""
+        SELECT 
+            {_MES_DESDE_PERIODO} as mes,
+            ISNULL(SUM(CASE WHEN tipo = 'ingreso' THEN total ELSE 0 END), 0) as ventas,
+            ISNULL(SUM(CASE WHEN tipo = 'egreso' THEN total ELSE 0 END), 0) as gastos
+        FROM resumen_mensual_facturas
+        WHERE periodo >= {_PERIODO_HACE_MESES}
+        AND estatus = 'activa'
+        GROUP BY periodo
+        ORDER BY periodo
+        """
+        filas = self.execute_query(query, (meses, meses))
             
-            if not df.empty:
-                fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=df['mes'],
-                    y=df['ventas'],
-                    name='Ventas',
-                    marker_color='rgb(55, 83, 109)'
-                ))
-                fig.add_trace(go.Bar(
-                    x=df['mes'],
-                    y=df['gastos'],
-                    name='Gastos',
-                    marker_color='rgb(26, 118, 255)'
-                ))
-                
-                fig.update_layout(
-                    title='Ventas vs Gastos (Últimos meses)',
-                    xaxis_tickfont_size=14,
-                    yaxis=dict(
-                        title='Monto ($)',
-                        titlefont_size=16,
-                        tickfont_size=14,
-                    ),
-                    legend=dict(
-                        x=0,
-                        y=1.0,
-                        bgcolor='rgba(255, 255, 255, 0)',
-                        bordercolor='rgba(255, 255, 255, 0)'
-                    ),
-                    barmode='group',
-                    bargap=0.15,
-                    bargroupgap=0.1,
-                    height=400,
-                    plot_bgcolor='white'
-                )
-                return fig.to_json()
-        except Exception as e:
-            print(f"Error en get_ventas_mensuales: {str(e)}")
+        # Solo las series; el gráfico lo arma el navegador (static/js/dashboard.js)
+        if filas:
+            return {
+                'labels': [f['mes'] for f in filas],
+                'ventas': [float(f['ventas']) for f in filas],
+                'gastos': [float(f['gastos']) for f in filas],
+            }
         return None
     
+    @cacheado(cache_dashboard, ttl=300)
     def get_saldos_por_tipo_cuenta(self):
         """Saldos por tipo de cuenta (Activo, Pasivo, Capital, etc.)"""
-        try:
-            query = """
-            SELECT 
-                cc.tipo,
-                CASE 
-                    WHEN cc.tipo IN ('Activo', 'Gastos') THEN ISNULL(SUM(ac.debe - ac.haber), 0)
-                    WHEN cc.tipo IN ('Pasivo', 'Capital', 'Ingresos') THEN ISNULL(SUM(ac.haber - ac.debe), 0)
-                    ELSE 0 
-                END as saldo_total
-            FROM cuentas_contables cc
-            LEFT JOIN asientos_contables ac ON cc.codigo = ac.id_cuenta
-            WHERE cc.nivel = 2  -- Cuentas de mayor
-            GROUP BY cc.tipo
-            HAVING ABS(CASE 
-                WHEN cc.tipo IN ('Activo', 'Gastos') THEN ISNULL(SUM(ac.debe - ac.haber), 0)
-                WHEN cc.tipo IN ('Pasivo', 'Capital', 'Ingresos') THEN ISNULL(SUM(ac.haber - ac.debe), 0)
-                ELSE 0 
-            END) > 0.01
-            """
-            df = self.execute_query_df(query)
-            
-            if not df.empty:
-                fig = px.pie(df, values='saldo_total', names='tipo', 
-                            title='Distribución por Tipo de Cuenta')
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                fig.update_layout(height=400, plot_bgcolor='white')
-                return fig.to_json()
-        except Exception as e:
-            print(f"Error en get_saldos_por_tipo_cuenta: {str(e)}")
+        libro = libro_mayor()
+        totales = [(tipo, total) for tipo, total in libro.saldos_por_tipo(libro.saldos()).items()
+                   if tipo and abs(total) > 1]
+        if totales:
+            return {
+                'labels': [tipo for tipo, _ in totales],
+                'valores': [float(a_decimal(total)) for _, total in totales],
+            }
         return None
     
+    @cacheado(cache_dashboard, ttl=300)
     def get_top_clientes(self, limit=5):
         """Top clientes por volumen de compras"""
-        try:
-            query = """
-            SELECT TOP(?) 
-                ISNULL(c.nombre, 'Cliente no especificado') as nombre,
-                ISNULL(SUM(f.total), 0) as total_compras,
-                ISNULL(COUNT(f.id_factura), 0) as cantidad_facturas
-            FROM facturas f
-            LEFT JOIN clientes c ON f.id_cliente = c.id_cliente
-            WHERE f.tipo = 'ingreso' 
-            AND f.estatus = 'activa'
-            AND f.fecha >= DATEADD(month, -12, GETDATE())
-            GROUP BY c.nombre
-            ORDER BY total_compras DESC
-            """
-            return self.execute_query(query, (limit,))
-        except Exception as e:
-            print(f"Error en get_top_clientes: {str(e)}")
-            return []
+        query = """
+        SELECT TOP(?) 
+            ISNULL(c.nombre, 'Cliente no especificado') as nombre,
+            ISNULL(SUM(f.total), 0) as total_compras,
+            ISNULL(COUNT(f.id_factura), 0) as cantidad_facturas
+        FROM facturas f
+        LEFT JOIN clientes c ON f.id_cliente = c.id_cliente
+        WHERE f.tipo = 'ingreso' 
+        AND f.estatus = 'activa'
+        AND f.fecha >= DATEADD(month, -12, GETDATE())
+        GROUP BY c.nombre
+        ORDER BY total_compras DESC
+        """
+        return self.execute_query(query, (limit,))
     
+    @cacheado(cache_dashboard, ttl=60)
     def get_movimientos_bancarios_recientes(self, limit=10):
         """Movimientos bancarios recientes"""
-        try:
-            query = """
-            SELECT TOP(?) 
-                mb.id_movimiento,
-                cb.nombre_banco,
-                mb.fecha,
-                mb.concepto,
-                mb.monto,
-                mb.referencia,
-                CASE WHEN mb.conciliado = 1 THEN 'Conciliado' ELSE 'Pendiente' END as estado
-            FROM movimientos_bancarios mb
-            INNER JOIN cuentas_bancarias cb ON mb.id_cuenta_bancaria = cb.id_cuenta_bancaria
-            ORDER BY mb.fecha DESC, mb.id_movimiento DESC
-            """
-            return self.execute_query(query, (limit,))
-        except Exception as e:
-            print(f"Error en get_movimientos_bancarios_recientes: {str(e)}")
-            return []
+        query = """
+        SELECT TOP(?) 
+            mb.id_movimiento,
+            cb.nombre_banco,
+            mb.fecha,
+            mb.concepto,
+            mb.monto,
+            mb.referencia,
+            CASE WHEN mb.conciliado = 1 THEN 'Conciliado' ELSE 'Pendiente' END as estado
+        FROM movimientos_bancarios mb
+        INNER JOIN cuentas_bancarias cb ON mb.id_cuenta_bancaria = cb.id_cuenta_bancaria
+        ORDER BY mb.fecha DESC, mb.id_movimiento DESC
+        """
+        return self.execute_query(query, (limit,))
     
-    def get_alertas_sistema(self):
-        """Alertas del sistema"""
-        alertas = []
-        
-        try:
-            # Facturas vencidas
-            query = """
-            SELECT 'Factura Vencida' as tipo, 
-                   'Factura ' + ISNULL(f.folio, 'Sin folio') + ' vencida' as descripcion,
-                   'high' as prioridad
-            FROM facturas f
-            WHERE f.estatus = 'activa' 
-            AND f.fecha_vencimiento IS NOT NULL
-            AND f.fecha_vencimiento < GETDATE()
-            """
-            result = self.execute_query(query)
-            if result:
-                alertas.extend(result)
-            
-            # Asientos desbalanceados
-            query = """
-            SELECT 'Asiento Desbalanceado' as tipo,
-                   'Comprobante ' + ISNULL(ac.id_comprobante_tipo, 'Sin tipo') + 
-                   '-' + ISNULL(ac.id_comprobante_folio, 'Sin folio') as descripcion,
-                   'medium' as prioridad
-            FROM asientos_contables ac
-            GROUP BY ac.id_comprobante_tipo, ac.id_comprobante_folio
-            HAVING ABS(ISNULL(SUM(ac.debe), 0) - ISNULL(SUM(ac.haber), 0)) > 0.01
-            """
-            result = self.execute_query(query)
-            if result:
-                alertas.extend(result)
-            
-            # Cuentas sin movimiento en 30 días (solo si tienen registros antiguos)
-            query = """
-            SELECT 'Cuenta Inactiva' as tipo,
-                   'Cuenta ' + cc.codigo + ' - ' + cc.nombre + ' sin movimiento reciente' as descripcion,
-                   'low' as prioridad
-            FROM cuentas_contables cc
-            WHERE cc.nivel = 3  -- Solo cuentas de detalle
-            AND cc.codigo IN (
-                SELECT DISTINCT ac.id_cuenta 
-                FROM asientos_contables ac 
-                WHERE ac.fecha < DATEADD(day, -30, GETDATE())
-            )
-            AND cc.codigo NOT IN (
-                SELECT DISTINCT ac.id_cuenta 
-                FROM asientos_contables ac 
-                WHERE ac.fecha >= DATEADD(day, -30, GETDATE())
-            )
-            """
-            result = self.execute_query(query)
-            if result:
-                alertas.extend(result)
-                
-        except Exception as e:
-            print(f"Error en get_alertas_sistema: {str(e)}")
-        
-        return alertas
+    @cacheado(cache_dashboard, ttl=120)
+    def get_alertas_sistema(self, limit=5):
+        """Alertas del sistema: total, cantidad por tipo y las más severas"""
+        # La tabla alertas la mantiene models/alertas.py; aquí solo se lee
+        return resumen_alertas(limit)
     
+    @cacheado(cache_dashboard, ttl=600)
     def get_estado_resultados_mensual(self):
         """Estado de resultados mensual"""
-        try:
-            query = """
-            SELECT 
-                FORMAT(f.fecha, 'yyyy-MM') as mes,
-                ISNULL(SUM(CASE WHEN f.tipo = 'ingreso' THEN f.total ELSE 0 END), 0) as ingresos,
-                ISNULL(SUM(CASE WHEN f.tipo = 'egreso' THEN f.total ELSE 0 END), 0) as gastos,
-                ISNULL(SUM(CASE WHEN f.tipo = 'ingreso' THEN f.total ELSE 0 END), 0) - 
-                ISNULL(SUM(CASE WHEN f.tipo = 'egreso' THEN f.total ELSE 0 END), 0) as utilidad
-            FROM facturas f
-            WHERE f.fecha >= DATEADD(month, -5, GETDATE())
-            AND f.estatus = 'activa'
-            GROUP BY FORMAT(f.fecha, 'yyyy-MM')
-            ORDER BY mes
-            """
-            return self.execute_query_df(query)
-        except Exception as e:
-            print(f"Error en get_estado_resultados_mensual: {str(e)}")
-            return pd.DataFrame()
\ No newline at end of file
+        query = f"""
+        SELECT 
+            {_MES_DESDE_PERIODO} as mes,
+            ISNULL(SUM(CASE WHEN tipo = 'ingreso' THEN total ELSE 0 END), 0) as ingresos,
+            ISNULL(SUM(CASE WHEN tipo = 'egreso' THEN total ELSE 0 END), 0) as gastos,
+            ISNULL(SUM(CASE WHEN tipo = 'ingreso' THEN total ELSE 0 END), 0) - 
+            ISNULL(SUM(CASE WHEN tipo = 'egreso' THEN total ELSE 0 END), 0) as utilidad
+        FROM resumen_mensual_facturas
+        WHERE periodo >= {_PERIODO_HACE_MESES}
+        AND estatus = 'activa'
+        GROUP BY periodo
+        ORDER BY periodo
+        """
+        return self.execute_query(query, (5, 5))
\ No newline at end of file
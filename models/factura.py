@@ -1,44 +1,40 @@
 # models/factura.py
+import pyodbc
+
 from config.db import get_connection
+from utils.listados import Listado, Filtro
+from utils.escritura_masiva import insertar_filas
+from models.resumen_facturas import aplicar_factura
+from utils.eventos import emitir_al_confirmar
 from decimal import Decimal
 
 # ========================
 # FUNCIONES DE CONSULTA
 # ========================
 
-def listar_facturas(fecha_inicio=None, fecha_fin=None, tipo=None):
-    query = """
-        SELECT 
-            f.id_factura, f.tipo, f.folio, f.fecha, f.fecha_vencimiento, f.total,
-            ISNULL(c.nombre, p.nombre) AS nombre_tercero,
-            f.estatus, f.id_asiento
-        FROM facturas f
+LISTADO_FACTURAS = Listado(
+    columnas="""
+        f.id_factura, f.tipo, f.folio, f.fecha, f.fecha_vencimiento, f.total,
+        ISNULL(c.nombre, p.nombre) AS nombre_tercero,
+        f.estatus, f.id_asiento
+    """,
+    origen="""facturas f
         LEFT JOIN clientes c ON f.id_cliente = c.id_cliente
-        LEFT JOIN proveedores p ON f.id_proveedor = p.id_proveedor
-        WHERE 1=1
-    """
-    params = []
-
-    if fecha_inicio:
-        query += " AND f.fecha >= ?"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND f.fecha <= ?"
-        params.append(fecha_fin)
-    if tipo:
-        query += " AND f.tipo = ?"
-        params.append(tipo)
+        LEFT JOIN proveedores p ON f.id_proveedor = p.id_proveedor""",
+    filtros=[
+        Filtro('fecha_inicio', 'f.fecha', '>=', 'fecha'),
+        Filtro('fecha_fin', 'f.fecha', '<=', 'fecha'),
+        Filtro('tipo', 'f.tipo'),
+    ],
+    ordenes={'fecha': "f.fecha DESC, f.id_factura DESC"},
+)
 
-    query += " ORDER BY f.fecha DESC, f.id_factura DESC"
+def listar_facturas(fecha_inicio=None, fecha_fin=None, tipo=None):
+    return LISTADO_FACTURAS.todas({'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, 'tipo': tipo})
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(query, params)
-        facturas = cursor.fetchall()
-        return facturas
-    finally:
-        conn.close()
+def iter_facturas(fecha_inicio=None, fecha_fin=None, tipo=None):
+    """Igual que listar_facturas(), pero en streaming para exportaciones grandes."""
+    return LISTADO_FACTURAS.iterar({'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, 'tipo': tipo})
 
 def obtener_factura_por_id(id_factura):
     """
@@ -131,7 +127,9 @@ def crear_factura_db(tipo, folio, fecha, fecha_vencimiento, total, id_cliente=No
             VALUES (?, ?, ?, ?, ?, ?, ?, 'activa')
         """, (tipo, folio, fecha, fecha_vencimiento, total, id_cliente, id_proveedor))
         id_factura = cursor.fetchone()[0]
+        aplicar_factura(cursor, id_factura, +1)
         conn.commit()
+        emitir_al_confirmar('factura', id_factura=id_factura)
         return id_factura
     except Exception as e:
         conn.rollback()
@@ -144,12 +142,15 @@ def actualizar_factura_db(id_factura, tipo, folio, fecha, fecha_vencimiento, tot
     conn = get_connection()
     cursor = conn.cursor()
     try:
+        aplicar_factura(cursor, id_factura, -1)
         cursor.execute("""
             UPDATE facturas
             SET tipo = ?, folio = ?, fecha = ?, fecha_vencimiento = ?, total = ?, estatus = ?
             WHERE id_factura = ?
         """, (tipo, folio, fecha, fecha_vencimiento, total, estatus, id_factura))
+        aplicar_factura(cursor, id_factura, +1)
         conn.commit()
+        emitir_al_confirmar('factura', id_factura=id_factura)
     except Exception as e:
         conn.rollback()
         raise e
@@ -161,10 +162,12 @@ def eliminar_factura_db(id_factura):
     conn = get_connection()
     cursor = conn.cursor()
     try:
+        aplicar_factura(cursor, id_factura, -1)
         cursor.execute("DELETE FROM facturas WHERE id_factura = ?", (id_factura,))
         if cursor.rowcount == 0:
             raise ValueError("Factura no encontrada.")
         conn.commit()
+        emitir_al_confirmar('factura', id_factura=id_factura)
     except Exception as e:
         conn.rollback()
         raise e
@@ -193,6 +196,19 @@ def obtener_datos_factura_para_anulacion(id_factura):
         conn.close()
 
 
+# Tipos de las columnas de partidas para insertar_filas: id_cliente e
+# id_proveedor suelen venir NULL en la primera partida
+TIPOS_PARTIDA = [
+    (pyodbc.SQL_INTEGER, 0, 0),      # id_asiento
+    (pyodbc.SQL_INTEGER, 0, 0),      # id_cuenta
+    (pyodbc.SQL_INTEGER, 0, 0),      # id_cliente
+    (pyodbc.SQL_INTEGER, 0, 0),      # id_proveedor
+    (pyodbc.SQL_DECIMAL, 18, 2),     # debe
+    (pyodbc.SQL_DECIMAL, 18, 2),     # haber
+    (pyodbc.SQL_WVARCHAR, 255, 0),   # concepto_detallado
+]
+
+
 def cancelar_factura_con_anulacion(id_factura, id_usuario):
     conn = get_connection()
     cursor = conn.cursor()
@@ -233,30 +249,32 @@ def cancelar_factura_con_anulacion(id_factura, id_usuario):
         """, (id_diario, fecha_anul, concepto_anul, id_usuario))
         id_asiento_anul = cursor.fetchone()[0]
 
-        for p in partidas_orig:
-            debe_inv = p[6]  # lo que era haber
-            haber_inv = p[5]  # lo que era debe
-
-            cursor.execute("""
-                INSERT INTO partidas (id_asiento, id_cuenta, id_cliente, id_proveedor, debe, haber, concepto_detallado)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+        # Partidas invertidas (debe <-> haber), enviadas en lote
+        insertar_filas(
+            cursor, "partidas",
+            ("id_asiento", "id_cuenta", "id_cliente", "id_proveedor", "debe", "haber", "concepto_detallado"),
+            [(
                 id_asiento_anul,
                 p[4],  # id_cuenta
                 p[7],  # id_cliente de la partida
                 p[8],  # id_proveedor de la partida
-                debe_inv,
-                haber_inv,
-                f"Anulación de partida original"
-            ))
+                p[6],  # lo que era haber
+                p[5],  # lo que era debe
+                "Anulación de partida original"
+            ) for p in partidas_orig],
+            tipos=TIPOS_PARTIDA,
+        )
 
+        aplicar_factura(cursor, id_factura, -1)
         cursor.execute("UPDATE facturas SET estatus = 'cancelada' WHERE id_factura = ?", (id_factura,))
+        aplicar_factura(cursor, id_factura, +1)
         cursor.execute("""
             INSERT INTO bitacora_actividad (id_usuario, accion, tabla_afectada, id_registro_afectado, ip)
             VALUES (?, 'canceló factura con asiento de anulación', 'facturas', ?, ?)
         """, (id_usuario, id_factura, '127.0.0.1'))
 
         conn.commit()
+        emitir_al_confirmar('factura', id_factura=id_factura)
 
         enviar_correo(
             asunto=f"Factura {id_factura} cancelada",
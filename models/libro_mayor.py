@@ -0,0 +1,614 @@
+# models/libro_mayor.py
+"""
+Libro mayor en memoria con NumPy.
+
+Una instantánea (LibroMayor) guarda el plan de cuentas y todos los
+asientos como arreglos por columna:
+
+- cuenta: índice de la cuenta en el plan (int32)
+- fecha:  AAAAMMDD (int32), los asientos van ordenados por fecha
+- debe / haber: centavos (int64), sin errores de redondeo
+
+Las balanzas, los movimientos de un periodo y los saldos según la
+naturaleza de la cuenta se calculan agrupando por índice de cuenta sobre
+el tramo de fechas (búsqueda binaria), sin recorrer filas en Python.
+
+Los asientos se leen de a bloques (ColumnasAsientos) y cada bloque pasa
+directo a columnas de NumPy: nunca están todas las filas como objetos de
+Python a la vez.
+
+libro_mayor() devuelve la instantánea vigente, compartida por los
+informes y el dashboard. Cuando este proceso confirma un comprobante, un
+asiento o un saldo de cierre (eventos 'comprobante', 'asiento' y 'saldo')
+no se recarga todo: se releen del primario solo los asientos de los
+comprobantes tocados, o los cierres, y se arma una instantánea nueva con
+esos cambios. Las escrituras de otros procesos no generan eventos aquí:
+se ven con la recarga completa, cada LIBRO_MAYOR_TTL segundos (no se
+sirve una instantánea más vieja mientras se recarga). version_libro()
+cambia con cada cambio de este proceso y con cada recarga completa, para
+las cachés de informes; es propia de cada proceso.
+
+También guarda los cierres de saldos_cuentas (saldo final por cuenta y
+periodo AAAAMM): balanza_desde_cierre() parte del último cierre anterior
+al periodo pedido y suma solo los asientos posteriores, en lugar de
+acumular toda la historia. Solo se usan los cierres que coinciden con
+los asientos en todas las cuentas (_cierres_consistentes): saldos_cuentas
+no siempre es un reflejo del libro. verificar_cierre() compara un cierre
+con el cálculo completo.
+
+Los asientos van a las cuentas de detalle; acumular() suma los importes
+de cada cuenta a todos sus ancestros (id_cuenta_padre) para obtener los
+subtotales de cada nivel.
+"""
+import copy
+import hashlib
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+from config.db import REPLICA_MAX_LAG, iter_rows, leer_del_primario
+from utils.eventos import al_ocurrir
+
+LIBRO_MAYOR_TTL = float(os.environ.get("LIBRO_MAYOR_TTL", 300))  # segundos
+LIBRO_MAYOR_BLOQUE = int(os.environ.get("LIBRO_MAYOR_BLOQUE", 50000))  # filas por bloque al cargar
+
+# Los importes se leen ya en centavos y la fecha como entero AAAAMMDD.
+# Se leen antes que el plan de cuentas: una cuenta con asientos o saldos
+# no se puede borrar (FK), así que todas las cuentas leídas después existen.
+_SQL_ASIENTOS = """
+    SELECT id_cuenta,
+           YEAR(fecha) * 10000 + MONTH(fecha) * 100 + DAY(fecha) AS fecha,
+           CAST(ISNULL(debe, 0) * 100 AS bigint) AS debe,
+           CAST(ISNULL(haber, 0) * 100 AS bigint) AS haber,
+           id_comprobante_tipo, id_comprobante_folio
+    FROM asientos_contables
+"""
+
+# registrar_comprobante guarda saldo_final como debe - haber acumulado, pero
+# en el periodo en que se registra y no en el de la fecha de los asientos;
+# las pantallas de saldos lo guardan según la naturaleza de la cuenta. Por
+# eso cada cierre se compara con los asientos antes de usarlo.
+_SQL_CIERRES = """
+    SELECT id_cuenta, periodo, CAST(saldo_final * 100 AS bigint) AS saldo_final
+    FROM saldos_cuentas
+"""
+
+_SQL_CUENTAS = """
+    SELECT codigo, nombre, tipo, nivel, naturaleza, id_cuenta_padre
+    FROM cuentas_contables
+    ORDER BY codigo
+"""
+
+# El formulario de cuentas guarda Patrimonio, Ingreso y Gasto; los planes
+# cargados antes pueden traer los nombres viejos. Se usa uno solo por tipo.
+TIPOS_EQUIVALENTES = {'Capital': 'Patrimonio', 'Ingresos': 'Ingreso', 'Gastos': 'Gasto'}
+
+# Comprobantes por consulta al releer sus asientos (dos parámetros cada uno)
+_COMPROBANTES_POR_CONSULTA = 500
+
+
+def fecha_a_entero(valor):
+    """date, datetime o 'AAAA-MM-DD' -> AAAAMMDD. None y los enteros se dejan igual."""
+    if valor is None or isinstance(valor, (int, np.integer)):
+        return valor
+    if isinstance(valor, str):
+        valor = datetime.strptime(valor[:10], '%Y-%m-%d').date()
+    return valor.year * 10000 + valor.month * 100 + valor.day
+
+
+def _inicio_periodo_siguiente(periodo):
+    """AAAAMM -> AAAAMMDD del primer día del mes siguiente."""
+    anio, mes = divmod(periodo, 100)
+    anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return anio * 10000 + mes * 100 + 1
+
+
+def a_decimal(centavos):
+    """Centavos (int o entero de NumPy) -> Decimal con dos decimales."""
+    return Decimal(int(centavos)).scaleb(-2)
+
+
+@lru_cache(maxsize=4096)
+def clave_comprobante(tipo, folio):
+    """(tipo, folio) -> int64 estable, para guardar el comprobante de cada asiento en un arreglo."""
+    resumen = hashlib.blake2b(f'{tipo}\x00{folio}'.encode(), digest_size=8).digest()
+    return int.from_bytes(resumen, 'little', signed=True)
+
+
+class ColumnasAsientos:
+    """
+    Asientos (id_cuenta, fecha, debe, haber, tipo, folio) pasados a columnas
+    de NumPy de a `bloque` filas, sin guardar las filas. La cuenta queda
+    como un id provisional por código (ids_codigo): el plan de cuentas se
+    lee después y LibroMayor la traduce a su índice.
+    """
+
+    def __init__(self, filas=(), bloque=LIBRO_MAYOR_BLOQUE):
+        self.ids_codigo = {}
+        columnas = ([], [], [], [], [])
+        filas = iter(filas)
+        while True:
+            lote = list(islice(filas, bloque))
+            if not lote:
+                break
+            for columna, valores in zip(columnas, self._columnas_del_lote(lote)):
+                columna.append(valores)
+        tipos = (np.int32, np.int32, np.int64, np.int64, np.int64)
+        self.cuenta, self.fecha, self.debe, self.haber, self.comprobante = (
+            np.concatenate(columna) if columna else np.empty(0, dtype=tipo)
+            for columna, tipo in zip(columnas, tipos))
+
+    def _columnas_del_lote(self, lote):
+        n = len(lote)
+        ids = self.ids_codigo
+        return (
+            np.fromiter((ids.setdefault(f[0], len(ids)) for f in lote), np.int32, n),
+            np.fromiter((f[1] for f in lote), np.int32, n),
+            np.fromiter((f[2] for f in lote), np.int64, n),
+            np.fromiter((f[3] for f in lote), np.int64, n),
+            np.fromiter((clave_comprobante(f[4], f[5]) for f in lote), np.int64, n),
+        )
+
+    def __len__(self):
+        return len(self.fecha)
+
+
+class LibroMayor:
+    """Instantánea inmutable del plan de cuentas y de los asientos."""
+
+    def __init__(self, cuentas, asientos, cierres=()):
+        # --- Plan de cuentas: un elemento por cuenta, ordenado por código
+        self.codigos = np.array([c.codigo for c in cuentas], dtype=object)
+        self.nombres = np.array([c.nombre for c in cuentas], dtype=object)
+        self.tipos = np.array([TIPOS_EQUIVALENTES.get(c.tipo, c.tipo or '') for c in cuentas], dtype=object)
+        self.naturalezas = np.array([c.naturaleza or '' for c in cuentas], dtype=object)
+        self.niveles = np.array([c.nivel or 0 for c in cuentas], dtype=np.int16)
+        self.indice = {codigo: i for i, codigo in enumerate(self.codigos)}
+        self.padres = np.array([self.indice.get(c.id_cuenta_padre, -1) for c in cuentas], dtype=np.int32)
+        self._capas = self._capas_del_arbol()
+        # Saldo según naturaleza: deudoras debe - haber, acreedoras haber - debe
+        self.signos = np.where(self.naturalezas == 'Crédito', -1, 1).astype(np.int64)
+        # Tipos distintos (Activo, Pasivo...) y el de cada cuenta como índice
+        self.nombres_tipo, self.indice_tipo = np.unique(self.tipos.astype(str), return_inverse=True)
+        self.signos_tipo = self._signos_por_tipo()
+
+        # --- Asientos, ordenados por fecha
+        if not isinstance(asientos, ColumnasAsientos):
+            asientos = ColumnasAsientos(asientos)
+        cuenta = self._indices_de_cuenta(asientos)
+        # Un asiento de una cuenta que no está en el plan quedaría con -1
+        orden = np.argsort(asientos.fecha, kind='stable')
+        orden = orden[cuenta[orden] >= 0]
+        self.cuenta = cuenta[orden]
+        self.fecha = asientos.fecha[orden]
+        self.debe = asientos.debe[orden]
+        self.haber = asientos.haber[orden]
+        self.comprobante = asientos.comprobante[orden]
+
+        self._poner_cierres(cierres)
+        self.cargado_en = datetime.now()
+
+    def _indices_de_cuenta(self, asientos):
+        """Índice en el plan de la cuenta de cada asiento de ColumnasAsientos (-1 si no está)."""
+        mapa = np.full(len(asientos.ids_codigo), -1, dtype=np.int32)
+        for codigo, id_provisional in asientos.ids_codigo.items():
+            mapa[id_provisional] = self.indice.get(codigo, -1)
+        return mapa[asientos.cuenta]
+
+    def _poner_cierres(self, cierres):
+        """Cierres de saldos_cuentas, ordenados por cuenta y periodo."""
+        cuenta, periodo, saldo = self._columnas_cierres(cierres)
+        orden = np.lexsort((periodo, cuenta))
+        orden = orden[cuenta[orden] >= 0]
+        self.cierre_cuenta = cuenta[orden]
+        self.cierre_periodo = periodo[orden]
+        self.cierre_saldo = saldo[orden]
+        self.periodos_cierre = self._cierres_consistentes()
+
+    def _cierres_consistentes(self):
+        """
+        Periodos de cierre cuyo saldo (debe - haber) coincide con el de los
+        asientos hasta fin de mes en todas las cuentas, de menor a mayor.
+        Una cuenta sin fila en un periodo conserva su último cierre anterior.
+        Los periodos que no coinciden se informan y no se usan.
+        """
+        por_periodo = np.argsort(self.cierre_periodo, kind='stable')
+        periodos, inicios = np.unique(self.cierre_periodo[por_periodo], return_index=True)
+        acumulado = np.zeros(self.n_cuentas, dtype=np.int64)
+        cierre = np.zeros(self.n_cuentas, dtype=np.int64)
+        desde = 0
+        validos, descartados = [], []
+        for periodo, filas in zip(periodos, np.split(por_periodo, inicios[1:])):
+            fin = int(np.searchsorted(self.fecha, _inicio_periodo_siguiente(int(periodo)), side='left'))
+            tramo = slice(desde, max(desde, fin))
+            acumulado += self._por_cuenta(self.debe, tramo) - self._por_cuenta(self.haber, tramo)
+            desde = max(desde, fin)
+            cierre[self.cierre_cuenta[filas]] = self.cierre_saldo[filas]
+            (validos if np.array_equal(acumulado, cierre) else descartados).append(int(periodo))
+        if descartados:
+            print(f"Cierres de saldos_cuentas que no coinciden con los asientos (no se usan): {descartados}")
+        return np.array(validos, dtype=np.int32)
+
+    def con_comprobantes(self, comprobantes, asientos):
+        """
+        Instantánea nueva con los asientos de `comprobantes` ((tipo, folio),
+        ...) reemplazados por `asientos`, sus filas actuales en la base (sin
+        filas si el comprobante se borró). Comparte el plan de cuentas y los
+        cierres con esta. None si algún asiento es de una cuenta que no está
+        en el plan: hay que recargar todo.
+        """
+        if not isinstance(asientos, ColumnasAsientos):
+            asientos = ColumnasAsientos(asientos)
+        cuenta = self._indices_de_cuenta(asientos)
+        if (cuenta < 0).any():
+            return None
+        claves = np.array([clave_comprobante(tipo, folio) for tipo, folio in comprobantes], dtype=np.int64)
+        quedan = ~np.isin(self.comprobante, claves)
+        orden = np.argsort(asientos.fecha, kind='stable')
+        fecha = self.fecha[quedan]
+        # Los nuevos van después de los de su misma fecha: sigue ordenado por fecha
+        posicion = np.searchsorted(fecha, asientos.fecha[orden], side='right')
+        libro = copy.copy(self)
+        libro.fecha = np.insert(fecha, posicion, asientos.fecha[orden])
+        libro.cuenta = np.insert(self.cuenta[quedan], posicion, cuenta[orden])
+        libro.debe = np.insert(self.debe[quedan], posicion, asientos.debe[orden])
+        libro.haber = np.insert(self.haber[quedan], posicion, asientos.haber[orden])
+        libro.comprobante = np.insert(self.comprobante[quedan], posicion, asientos.comprobante[orden])
+        # Un cambio anterior al fin del último cierre puede cambiar cuáles coinciden
+        cambios = np.concatenate((self.fecha[~quedan], asientos.fecha))
+        if len(cambios) and len(self.cierre_periodo) and \
+                cambios.min() < _inicio_periodo_siguiente(int(self.cierre_periodo.max())):
+            libro.periodos_cierre = libro._cierres_consistentes()
+        return libro
+
+    def con_cierres(self, cierres):
+        """Instantánea nueva con otros cierres; comparte el plan y los asientos con esta."""
+        libro = copy.copy(self)
+        libro._poner_cierres(cierres)
+        return libro
+
+    def _columnas_cierres(self, cierres):
+        codigos = [c[0] for c in cierres]
+        cuenta = np.array([self.indice.get(c, -1) for c in codigos], dtype=np.int32)
+        periodo = np.array([c[1] for c in cierres], dtype=np.int32)
+        saldo = np.array([c[2] for c in cierres], dtype=np.int64)
+        return cuenta, periodo, saldo
+
+    def _capas_del_arbol(self):
+        """
+        Cuentas agrupadas por profundidad en el árbol, de la más profunda a
+        la primera debajo de la raíz: recorrerlas en ese orden garantiza que
+        una cuenta ya tiene sumados sus hijos cuando se suma a su padre.
+        """
+        profundidad = np.zeros(self.n_cuentas, dtype=np.int32)
+        ancestro = self.padres.copy()
+        for _ in range(self.n_cuentas):
+            con_ancestro = ancestro >= 0
+            if not con_ancestro.any():
+                break
+            profundidad[con_ancestro] += 1
+            ancestro[con_ancestro] = self.padres[ancestro[con_ancestro]]
+        else:
+            if (ancestro >= 0).any():
+                # Un ciclo en id_cuenta_padre: esas cuentas no se acumulan
+                print(f"Ciclo en id_cuenta_padre: {list(self.codigos[ancestro >= 0])}")
+                self.padres = np.where(ancestro >= 0, -1, self.padres).astype(np.int32)
+                profundidad[ancestro >= 0] = 0
+        return [np.flatnonzero(profundidad == p) for p in range(profundidad.max(initial=0), 0, -1)]
+
+    def _signos_por_tipo(self):
+        """
+        Signo de cada tipo: el de la naturaleza de sus cuentas raíz (sin
+        padre) o, si no tiene, el de la mayoría de sus cuentas.
+        """
+        n_tipos = len(self.nombres_tipo)
+        raices = self.padres < 0
+        votos_raiz = np.zeros(n_tipos, dtype=np.int64)
+        np.add.at(votos_raiz, self.indice_tipo[raices], self.signos[raices])
+        votos = np.zeros(n_tipos, dtype=np.int64)
+        np.add.at(votos, self.indice_tipo, self.signos)
+        votos = np.where(votos_raiz != 0, votos_raiz, votos)
+        return np.where(votos < 0, -1, 1).astype(np.int64)
+
+    @property
+    def n_cuentas(self):
+        return len(self.codigos)
+
+    def _tramo(self, desde=None, hasta=None):
+        """slice de los asientos con desde <= fecha <= hasta (AAAAMMDD o date)."""
+        inicio = 0 if desde is None else np.searchsorted(self.fecha, fecha_a_entero(desde), side='left')
+        fin = len(self.fecha) if hasta is None else np.searchsorted(self.fecha, fecha_a_entero(hasta), side='right')
+        return slice(inicio, max(inicio, fin))
+
+    def _por_cuenta(self, valores, tramo):
+        total = np.zeros(self.n_cuentas, dtype=np.int64)
+        np.add.at(total, self.cuenta[tramo], valores[tramo])
+        return total
+
+    def movimientos(self, desde=None, hasta=None):
+        """(debe, haber) por cuenta en el periodo, en centavos."""
+        tramo = self._tramo(desde, hasta)
+        return self._por_cuenta(self.debe, tramo), self._por_cuenta(self.haber, tramo)
+
+    def movimientos_por_periodo(self, periodos):
+        """
+        (debe, haber) por periodo y cuenta, como matrices de
+        len(periodos) x n_cuentas en centavos. `periodos` es una lista de
+        (desde, hasta) en cualquier orden, que pueden solaparse: cada uno
+        suma su propio tramo de asientos (búsqueda binaria por fecha).
+        """
+        debe = np.zeros((len(periodos), self.n_cuentas), dtype=np.int64)
+        haber = np.zeros_like(debe)
+        for fila, (desde, hasta) in enumerate(periodos):
+            tramo = self._tramo(desde, hasta)
+            np.add.at(debe[fila], self.cuenta[tramo], self.debe[tramo])
+            np.add.at(haber[fila], self.cuenta[tramo], self.haber[tramo])
+        return debe, haber
+
+    def saldo_por_naturaleza(self, debe, haber):
+        return self.signos * (debe - haber)
+
+    def saldos(self, hasta=None):
+        """Saldo de cada cuenta al cierre de `hasta`, según su naturaleza."""
+        return self.saldo_por_naturaleza(*self.movimientos(hasta=hasta))
+
+    def balanza(self, desde=None, hasta=None):
+        """
+        Balanza de comprobación: {'inicial', 'debe', 'haber', 'final'} con
+        un arreglo de centavos por cuenta. El saldo inicial es el
+        acumulado hasta el día anterior a `desde`.
+        """
+        if desde is None:
+            inicial = np.zeros(self.n_cuentas, dtype=np.int64)
+        else:
+            previo = slice(0, self._tramo(desde=desde).start)
+            inicial = self.saldo_por_naturaleza(self._por_cuenta(self.debe, previo),
+                                                self._por_cuenta(self.haber, previo))
+        debe, haber = self.movimientos(desde, hasta)
+        return {
+            'inicial': inicial,
+            'debe': debe,
+            'haber': haber,
+            'final': inicial + self.saldo_por_naturaleza(debe, haber),
+        }
+
+    def cuentas_de_detalle(self):
+        """Índices de las cuentas sin subcuentas (las que reciben asientos)."""
+        es_padre = np.zeros(self.n_cuentas, dtype=bool)
+        es_padre[self.padres[self.padres >= 0]] = True
+        return np.flatnonzero(~es_padre)
+
+    def ultimo_cierre_antes_de(self, fecha):
+        """Último periodo AAAAMM de saldos_cuentas terminado antes de `fecha` y consistente, o None."""
+        mes = fecha_a_entero(fecha) // 100
+        posicion = np.searchsorted(self.periodos_cierre, mes, side='left')
+        return int(self.periodos_cierre[posicion - 1]) if posicion else None
+
+    def saldos_al_cierre(self, periodo):
+        """
+        Saldo de cada cuenta al cierre de `periodo`, según su naturaleza: el
+        de su último registro en saldos_cuentas hasta ese periodo (las
+        cuentas sin movimiento en un mes no tienen fila para ese mes).
+        """
+        saldo = np.zeros(self.n_cuentas, dtype=np.int64)
+        hasta = np.flatnonzero(self.cierre_periodo <= periodo)
+        if len(hasta):
+            cuentas = self.cierre_cuenta[hasta]
+            ultimos = hasta[np.append(cuentas[1:] != cuentas[:-1], True)]
+            saldo[self.cierre_cuenta[ultimos]] = self.cierre_saldo[ultimos]
+        return self.signos * saldo
+
+    def balanza_desde_cierre(self, desde, hasta):
+        """
+        Igual que balanza(desde, hasta), pero el saldo inicial parte del
+        último cierre anterior a `desde` y solo suma los asientos
+        posteriores. Agrega 'cierre': el periodo usado (None si no hay).
+        """
+        cierre = self.ultimo_cierre_antes_de(desde)
+        if cierre is None:
+            resultado = self.balanza(desde, hasta)
+        else:
+            puente = self._tramo(_inicio_periodo_siguiente(cierre), fecha_a_entero(desde) - 1)
+            inicial = self.saldos_al_cierre(cierre) + self.saldo_por_naturaleza(
+                self._por_cuenta(self.debe, puente), self._por_cuenta(self.haber, puente))
+            debe, haber = self.movimientos(desde, hasta)
+            resultado = {
+                'inicial': inicial,
+                'debe': debe,
+                'haber': haber,
+                'final': inicial + self.saldo_por_naturaleza(debe, haber),
+            }
+        resultado['cierre'] = cierre
+        return resultado
+
+    def verificar_cierre(self, desde, hasta):
+        """
+        Compara balanza_desde_cierre() con la balanza calculada con todos
+        los asientos. Devuelve (cierre, índices de las cuentas cuyo saldo
+        final difiere, diferencias en centavos).
+        """
+        desde_cierre = self.balanza_desde_cierre(desde, hasta)
+        diferencia = desde_cierre['final'] - self.balanza(desde, hasta)['final']
+        cuentas = np.flatnonzero(diferencia)
+        return desde_cierre['cierre'], cuentas, diferencia[cuentas]
+
+    def acumular(self, valores):
+        """
+        Suma a cada cuenta los valores de todas sus subcuentas, una pasada
+        por nivel del árbol. `valores` es un arreglo por cuenta que se puede
+        sumar entre cuentas (centavos de debe, de haber o debe - haber).
+        """
+        total = np.array(valores, dtype=np.int64)
+        for capa in self._capas:
+            np.add.at(total, self.padres[capa], total[capa])
+        return total
+
+    def acumular_saldos(self, saldos):
+        """
+        acumular() para saldos según naturaleza: se suman como debe - haber
+        (una subcuenta puede tener naturaleza distinta a la de su padre, p.
+        ej. una depreciación acumulada) y se devuelven con el signo de cada
+        cuenta.
+        """
+        return self.signos * self.acumular(self.signos * saldos)
+
+    def balanza_acumulada(self, balanza):
+        """La balanza con los subtotales de cada cuenta padre."""
+        acumulada = dict(balanza)
+        acumulada['debe'] = self.acumular(balanza['debe'])
+        acumulada['haber'] = self.acumular(balanza['haber'])
+        acumulada['inicial'] = self.acumular_saldos(balanza['inicial'])
+        acumulada['final'] = self.acumular_saldos(balanza['final'])
+        return acumulada
+
+    def por_tipo(self, valores):
+        """Suma un arreglo por cuenta según el tipo: {tipo: centavos}."""
+        totales = np.zeros(len(self.nombres_tipo), dtype=np.int64)
+        np.add.at(totales, self.indice_tipo, valores)
+        return {str(tipo): int(total) for tipo, total in zip(self.nombres_tipo, totales)}
+
+    def saldos_por_tipo(self, saldos):
+        """
+        Total por tipo de saldos según naturaleza: {tipo: centavos}. Se
+        suman como debe - haber y el total lleva el signo del tipo, así una
+        cuenta de naturaleza contraria a la de su tipo (una depreciación
+        acumulada dentro del Activo) resta en lugar de sumar.
+        """
+        netos = self.por_tipo(self.signos * saldos)
+        return {tipo: int(signo) * neto for (tipo, neto), signo in zip(netos.items(), self.signos_tipo)}
+
+    def estadisticas(self):
+        return {
+            'cuentas': self.n_cuentas,
+            'asientos': len(self.fecha),
+            'cierres': len(self.cierre_periodo),
+            'bytes': int(self.cuenta.nbytes + self.fecha.nbytes + self.debe.nbytes + self.haber.nbytes
+                         + self.comprobante.nbytes),
+            'cargado_en': self.cargado_en.isoformat(timespec='seconds'),
+        }
+
+
+def cargar_libro_mayor():
+    """Lee cuentas, asientos y cierres (de la réplica si hay) y arma la instantánea."""
+    asientos = ColumnasAsientos(iter_rows(_SQL_ASIENTOS, readonly=True))
+    cierres = [tuple(fila) for fila in iter_rows(_SQL_CIERRES, readonly=True)]
+    cuentas = list(iter_rows(_SQL_CUENTAS, readonly=True))
+    return LibroMayor(cuentas, asientos, cierres)
+
+
+def _asientos_de_comprobantes(comprobantes):
+    """Filas actuales de los asientos de `comprobantes` ((tipo, folio), ...)."""
+    for inicio in range(0, len(comprobantes), _COMPROBANTES_POR_CONSULTA):
+        grupo = comprobantes[inicio:inicio + _COMPROBANTES_POR_CONSULTA]
+        condicion = " OR ".join(["(id_comprobante_tipo = ? AND id_comprobante_folio = ?)"] * len(grupo))
+        parametros = [valor for comprobante in grupo for valor in comprobante]
+        yield from iter_rows(_SQL_ASIENTOS + " WHERE " + condicion, parametros, readonly=True)
+
+
+def _aplicar_cambios(libro, pendientes):
+    """
+    La instantánea con los cambios pendientes de este proceso, releídos del
+    primario (la réplica puede no tenerlos todavía). None si hay que
+    recargar todo.
+    """
+    comprobantes = [clave for clave in pendientes if clave is not None]
+    with leer_del_primario():
+        if comprobantes:
+            libro = libro.con_comprobantes(comprobantes, ColumnasAsientos(_asientos_de_comprobantes(comprobantes)))
+        if libro is not None and None in pendientes:
+            libro = libro.con_cierres([tuple(fila) for fila in iter_rows(_SQL_CIERRES, readonly=True)])
+    return libro
+
+
+_libro = None
+_cargado_en = 0.0           # time.monotonic() de la última carga completa
+_carga_lock = threading.Lock()
+
+_version = 0
+_pendientes = {}            # (tipo, folio) -> versión del último cambio; None = cierres
+_ultima_escritura = None    # time.monotonic() del último cambio de este proceso
+_version_lock = threading.Lock()
+
+
+def libro_mayor():
+    """
+    Instantánea vigente. La primera llamada, o pasados LIBRO_MAYOR_TTL
+    segundos desde la última carga completa, lee todo; si no, aplica los
+    cambios pendientes de este proceso (ver el docstring del módulo).
+    """
+    global _libro, _cargado_en
+    if _libro is not None and not _pendientes and time.monotonic() - _cargado_en < LIBRO_MAYOR_TTL:
+        return _libro
+    with _carga_lock:
+        with _version_lock:
+            pendientes = dict(_pendientes)
+        vencido = _libro is None or time.monotonic() - _cargado_en >= LIBRO_MAYOR_TTL
+        libro = None if vencido else _aplicar_cambios(_libro, pendientes)
+        recargado = libro is None
+        if recargado:
+            with leer_del_primario() if escritura_reciente() else nullcontext():
+                inicio = time.monotonic()
+                libro = cargar_libro_mayor()
+            _cargado_en = inicio
+        _libro = libro
+        _quitar_aplicados(pendientes, recargado)
+        return libro
+
+
+def escritura_reciente():
+    """
+    True si este proceso escribió en el libro hace menos de REPLICA_MAX_LAG:
+    la réplica puede no tener esa escritura todavía y hay que leer del primario.
+    """
+    return _ultima_escritura is not None and time.monotonic() - _ultima_escritura < REPLICA_MAX_LAG
+
+
+def _quitar_aplicados(pendientes, recargado=False):
+    """
+    Borra los cambios ya aplicados, salvo los que volvieron a cambiar
+    mientras tanto. Una recarga completa también cambia la versión: puede
+    traer escrituras de otros procesos.
+    """
+    global _version
+    with _version_lock:
+        if recargado:
+            _version += 1
+        for clave, version in pendientes.items():
+            if _pendientes.get(clave) == version:
+                del _pendientes[clave]
+
+
+def version_libro():
+    """
+    Número que cambia con cada escritura confirmada en este proceso en
+    asientos, comprobantes o saldos y con cada recarga completa.
+    """
+    return _version
+
+
+def _registrar_cambio(clave):
+    global _version, _ultima_escritura
+    with _version_lock:
+        _version += 1
+        _pendientes[clave] = _version
+        _ultima_escritura = time.monotonic()
+
+
+def _al_cambiar_comprobante(tipo, folio, **_):
+    _registrar_cambio((tipo, folio))
+
+
+def _al_cambiar_cierres(**_):
+    _registrar_cambio(None)
+
+
+al_ocurrir('comprobante', _al_cambiar_comprobante)
+al_ocurrir('asiento', _al_cambiar_comprobante)
+al_ocurrir('saldo', _al_cambiar_cierres)
@@ -0,0 +1,68 @@
+# models/resumen_facturas.py
+"""
+Tabla resumen_mensual_facturas: total y cantidad de facturas por mes
+(periodo AAAAMM), tipo y estatus. Las funciones de escritura de
+models/factura.py la actualizan en la misma transacción con
+aplicar_factura(); el dashboard lee de aquí en vez de agrupar facturas.
+"""
+from config.db import get_connection
+
+# Resta (signo -1) o suma (signo +1) la factura a su fila del resumen
+_SQL_APLICAR = """
+    MERGE resumen_mensual_facturas WITH (HOLDLOCK) AS r
+    USING (
+        SELECT YEAR(fecha) * 100 + MONTH(fecha) AS periodo, tipo,
+               ISNULL(estatus, '') AS estatus, total
+        FROM facturas
+        WHERE id_factura = ?
+    ) AS f
+    ON r.periodo = f.periodo AND r.tipo = f.tipo AND r.estatus = f.estatus
+    WHEN MATCHED THEN
+        UPDATE SET total = r.total + ? * f.total,
+                   cantidad = r.cantidad + ?,
+                   actualizado_en = SYSDATETIME()
+    WHEN NOT MATCHED THEN
+        INSERT (periodo, tipo, estatus, total, cantidad)
+        VALUES (f.periodo, f.tipo, f.estatus, ? * f.total, ?);
+"""
+
+
+def aplicar_factura(cursor, id_factura, signo):
+    """
+    Suma (+1) o resta (-1) la factura al resumen usando el cursor de la
+    escritura en curso. Para una modificación: -1 antes y +1 después.
+    """
+    cursor.execute(_SQL_APLICAR, (id_factura, signo, signo, signo, signo))
+
+
+def reconstruir_resumen_facturas():
+    """Recalcula todo el resumen desde facturas. Devuelve la cantidad de filas."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM resumen_mensual_facturas")
+        cursor.execute("""
+            INSERT INTO resumen_mensual_facturas (periodo, tipo, estatus, total, cantidad)
+            SELECT YEAR(fecha) * 100 + MONTH(fecha), tipo, ISNULL(estatus, ''), SUM(total), COUNT(*)
+            FROM facturas
+            GROUP BY YEAR(fecha) * 100 + MONTH(fecha), tipo, ISNULL(estatus, '')
+        """)
+        filas = cursor.rowcount
+        conn.commit()
+        return filas
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Registra el comando `flask resumen-facturas`."""
+    import click
+
+    @app.cli.command('resumen-facturas')
+    def resumen_facturas():
+        """Reconstruye resumen_mensual_facturas desde facturas."""
+        filas = reconstruir_resumen_facturas()
+        click.echo(f"Resumen mensual de facturas reconstruido ({filas} filas)")
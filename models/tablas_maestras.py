@@ -2,7 +2,31 @@
 # models/tablas_maestra.py
 # =======================
 
-from config.db import get_connection
+from config.db import get_connection, iter_rows
+
+# Consultas de exportación: columnas en el orden de los encabezados de
+# utils/export_maestras.py, sin paginar (se leen en streaming).
+CONSULTAS_EXPORTACION = {
+    'clientes': "SELECT id_cliente, nombre, email, rfc, direccion FROM clientes ORDER BY nombre",
+    'proveedores': "SELECT id_proveedor, nombre, email, rfc, direccion FROM proveedores ORDER BY nombre",
+    'plan_cuentas': "SELECT id_cuenta, codigo, nombre, tipo_cuenta FROM plan_cuentas ORDER BY codigo",
+    'cuentas_bancarias': """
+        SELECT id_cuenta_bancaria, nombre_banco, numero_cuenta, id_cuenta_contable, moneda
+        FROM cuentas_bancarias ORDER BY numero_cuenta
+    """,
+    'Usuarios': """
+        SELECT u.id_usuario, u.nombre, u.email, r.nombre
+        FROM usuarios u
+        LEFT JOIN roles r ON u.id_rol = r.id_rol
+        ORDER BY u.nombre
+    """,
+    'Tasa_iva': "SELECT id_tasa, nombre, porcentaje FROM tasas_iva ORDER BY porcentaje",
+}
+
+
+def iter_tabla_maestra(tabla):
+    """Recorre una tabla maestra completa para exportarla, sin cargarla entera en memoria."""
+    return (tuple(fila) for fila in iter_rows(CONSULTAS_EXPORTACION[tabla], readonly=True))
 
 # =======================
 # CLIENTES
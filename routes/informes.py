@@ -1,6 +1,6 @@
 # routes/informes.py
-from flask import Blueprint, render_template, request, jsonify, send_file
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify, send_file, redirect, url_for, Response, stream_template, stream_with_context, abort
+from datetime import date, datetime, timedelta
 import pandas as pd
 from io import BytesIO
 import xlsxwriter
@@ -9,114 +9,135 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 #from database import get_db_connection
-from config.db import get_connection
+from config.db import get_connection, iter_rows, leer_del_primario
+from models.libro_mayor import libro_mayor, a_decimal, version_libro, escritura_reciente, LIBRO_MAYOR_TTL
+from utils.cache import CacheLRU
+from utils.periodos import periodos_comparativos
+from contextlib import nullcontext
 from decimal import Decimal
+import numpy as np
+import base64
+import json
 import logging
+import os
 
 informes_bp = Blueprint('informes', __name__, url_prefix='/informes')
 logger = logging.getLogger(__name__)
 
+INFORMES_CACHE_MAX = int(os.environ.get("INFORMES_CACHE_MAX", 64))  # resultados guardados
+
+# Datos de informes por (informe, parámetros normalizados, versión del
+# libro). La versión es de este proceso: cambia con cada escritura
+# confirmada aquí de asientos, saldos o comprobantes (también altas y
+# cambios de encabezado: el mayor general muestra el concepto) y con cada
+# recarga completa del libro, así que no hace falta invalidar: lo viejo deja de
+# pedirse y sale por LRU. Las escrituras de otros procesos no avisan: se
+# ven cuando el libro se recarga, a más tardar LIBRO_MAYOR_TTL segundos
+# después. La vista HTML y las exportaciones comparten las mismas claves.
+cache_informes = CacheLRU('informes', INFORMES_CACHE_MAX, ttl=LIBRO_MAYOR_TTL)
+
+
+def _informe_cacheado(informe, funcion, *params):
+    """
+    funcion(*params), guardado por informe, parámetros y versión del libro.
+    Tras una escritura propia se calcula con el primario: la réplica puede
+    no tenerla todavía.
+    """
+    libro_mayor()  # aplica los cambios pendientes o recarga; puede cambiar la versión
+    clave = (informe, params, version_libro())
+
+    def calcular():
+        with _lectura_fresca():
+            return funcion(*params)
+    return cache_informes.obtener(clave, calcular)
+
+
+def _lectura_fresca():
+    """Lee del primario si este proceso acaba de escribir en el libro; si no, de la réplica."""
+    return leer_del_primario() if escritura_reciente() else nullcontext()
+
+
+def _fecha_normalizada(valor):
+    """'AAAA-MM-DD' canónica ('2024-3-5' y '2024-03-05' dan la misma clave)."""
+    return datetime.strptime(valor, '%Y-%m-%d').date().isoformat()
+
 @informes_bp.route('/')
 def menu_informes():
     """Menú principal de informes"""
     return render_template('informes/menu.html')
 
+# Tipos de cuenta que forman el balance general ('Capital' llega como
+# 'Patrimonio', ver TIPOS_EQUIVALENTES)
+TIPOS_BALANCE = ('Activo', 'Pasivo', 'Patrimonio')
+
+
+def _datos_balance_general(fecha, nivel_detalle, verificar=False):
+    """
+    Cuentas de balance a `fecha` desde el libro mayor en memoria: saldo al
+    inicio del mes, movimiento del mes y saldo final, según su naturaleza.
+    El saldo inicial parte del último cierre de saldos_cuentas anterior al
+    mes (se informa en 'cierre') más los asientos posteriores.
+    Con `verificar`, 'diferencias' lista las cuentas cuyo saldo no coincide
+    con el recalculado desde todos los asientos.
+
+    Las filas conservan el orden de columnas que usan la plantilla y las
+    exportaciones: (codigo, nombre, tipo, nivel, naturaleza, saldo_inicial,
+    movimiento, saldo_final).
+    """
+    libro = libro_mayor()
+    hasta = datetime.strptime(fecha, '%Y-%m-%d').date()
+    desde = hasta.replace(day=1)
+    balanza = libro.balanza_desde_cierre(desde, hasta)
+    # Cada cuenta con los subtotales de sus subcuentas
+    acumulada = libro.balanza_acumulada(balanza)
+    movimiento = acumulada['final'] - acumulada['inicial']
+
+    de_balance = np.isin(libro.tipos.astype(str), TIPOS_BALANCE)
+    visibles = np.flatnonzero(de_balance & (libro.niveles <= int(nivel_detalle)))
+    cuentas = [(libro.codigos[i], libro.nombres[i], libro.tipos[i], int(libro.niveles[i]),
+                libro.naturalezas[i], a_decimal(acumulada['inicial'][i]),
+                a_decimal(movimiento[i]), a_decimal(acumulada['final'][i]))
+               for i in visibles]
+
+    # Los totales suman el saldo propio de cada cuenta (sin subtotales, que
+    # lo contarían dos veces), no solo las del nivel mostrado, y con el
+    # signo del tipo: una cuenta regularizadora resta
+    totales = libro.saldos_por_tipo(balanza['final'])
+    total_activo = a_decimal(totales.get('Activo', 0))
+    total_pasivo = a_decimal(totales.get('Pasivo', 0))
+    total_capital = a_decimal(totales.get('Patrimonio', 0))
+    datos = {
+        'cuentas': cuentas,
+        'total_activo': total_activo,
+        'total_pasivo': total_pasivo,
+        'total_capital': total_capital,
+        'total_pasivo_capital': total_pasivo + total_capital,
+        'cierre': balanza['cierre']
+    }
+    if verificar:
+        _, distintas, diferencias = libro.verificar_cierre(desde, hasta)
+        datos['diferencias'] = [(libro.codigos[i], libro.nombres[i], a_decimal(d))
+                                for i, d in zip(distintas, diferencias)]
+    return datos
+
+
 @informes_bp.route('/balance-general')
 def balance_general():
     """Balance General"""
     fecha = request.args.get('fecha', datetime.now().strftime('%Y-%m-%d'))
     nivel_detalle = request.args.get('nivel', '3')  # 1, 2, 3 niveles
+    verificar = request.args.get('verificar') == '1'
 
     ahora = datetime.now()
     hoy_str = ahora.strftime('%Y-%m-%d')
     
-    # Obtener datos del balance
-    conn = get_connection()
     try:
-        cursor = conn.cursor()
-        
-        # Consulta para balance general
-        query = """
-        WITH saldos_actualizados AS (
-            SELECT 
-                cc.id,
-                cc.codigo,
-                cc.nombre,
-                cc.tipo,
-                cc.nivel,
-                cc.naturaleza,
-                COALESCE(sc.saldo_inicial, 0) as saldo_inicial,
-                COALESCE(SUM(CASE 
-                    WHEN ac.debe > 0 THEN ac.debe 
-                    WHEN ac.haber > 0 THEN -ac.haber 
-                    ELSE 0 
-                END), 0) as movimiento
-            FROM cuentas_contables cc
-            LEFT JOIN saldos_cuentas sc ON cc.id = sc.cuenta_id 
-                AND sc.periodo = EXTRACT(YEAR FROM %s::date) || '-' || LPAD(EXTRACT(MONTH FROM %s::date)::text, 2, '0')
-            LEFT JOIN asientos_contables ac ON cc.id = ac.cuenta_id 
-                AND ac.fecha <= %s
-            WHERE cc.tipo IN ('B', 'D')
-            GROUP BY cc.id, cc.codigo, cc.nombre, cc.tipo, cc.nivel, cc.naturaleza, sc.saldo_inicial
-        ),
-        saldos_finales AS (
-            SELECT *,
-                saldo_inicial + movimiento as saldo_final,
-                CASE 
-                    WHEN naturaleza = 'D' THEN 
-                        CASE 
-                            WHEN saldo_inicial + movimiento >= 0 THEN saldo_inicial + movimiento
-                            ELSE 0
-                        END
-                    ELSE 
-                        CASE 
-                            WHEN saldo_inicial + movimiento < 0 THEN ABS(saldo_inicial + movimiento)
-                            ELSE 0
-                        END
-                END as saldo_mostrar
-            FROM saldos_actualizados
-        )
-        SELECT 
-            codigo,
-            nombre,
-            tipo,
-            nivel,
-            naturaleza,
-            saldo_inicial,
-            movimiento,
-            saldo_final,
-            saldo_mostrar
-        FROM saldos_finales
-        WHERE nivel <= %s
-        ORDER BY codigo;
-        """
-        
-        cursor.execute(query, (fecha, fecha, fecha, nivel_detalle))
-        cuentas = cursor.fetchall()
-        
-        # Calcular totales
-        total_activo = Decimal('0')
-        total_pasivo = Decimal('0')
-        total_capital = Decimal('0')
-        
-        for cuenta in cuentas:
-            if cuenta[0].startswith('1'):  # Activo
-                total_activo += Decimal(str(cuenta[7] or 0))
-            elif cuenta[0].startswith('2'):  # Pasivo
-                total_pasivo += Decimal(str(cuenta[7] or 0))
-            elif cuenta[0].startswith('3'):  # Capital
-                total_capital += Decimal(str(cuenta[7] or 0))
-        
-        # Preparar datos para la vista
         datos = {
             'hoy': hoy_str,
             'fecha': fecha,
             'nivel_detalle': nivel_detalle,
-            'cuentas': cuentas,
-            'total_activo': total_activo,
-            'total_pasivo': total_pasivo,
-            'total_capital': total_capital,
-            'total_pasivo_capital': total_pasivo + total_capital
+            **_informe_cacheado('balance_general', _datos_balance_general,
+                                _fecha_normalizada(fecha), int(nivel_detalle), verificar)
         }
         
     except Exception as e:
@@ -132,19 +153,119 @@ def balance_general():
             'total_pasivo_capital': Decimal('0'),
             'error': str(e)
         }
-    finally:
-        cursor.close()
-        conn.close()
     
     return render_template('informes/balance_general.html', **datos)
 
+# Secciones del estado de resultados por el primer dígito del código,
+# igual que el balance usa 1/2/3: (clave, título, prefijo, signo sobre
+# debe - haber). Los ingresos son de naturaleza acreedora.
+SECCIONES_RESULTADOS = [
+    ('ingresos', 'Ingresos', '4', -1),
+    ('costos', 'Costos de venta', '5', 1),
+    ('gastos', 'Gastos de operación', '6', 1),
+    ('gastos_financieros', 'Gastos financieros', '7', 1),
+]
+
+COMPARACIONES = {
+    'ninguna': 'Sin comparar',
+    'anterior': 'Período anterior',
+    'anio': 'Mismo período del año anterior',
+    'ambas': 'Período anterior y año anterior',
+    'meses': 'Últimos 12 meses',
+}
+
+
+def _periodos_comparativos(fecha_inicio, fecha_fin, comparar):
+    """periodos_comparativos() con las fechas 'AAAA-MM-DD' de la solicitud."""
+    desde = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+    hasta = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    return periodos_comparativos(desde, hasta, comparar)
+
+
+def _porcentaje(parte, total):
+    """parte / total * 100 elemento a elemento; 0 donde el total es 0."""
+    parte = np.asarray(parte, dtype=float)
+    total = np.broadcast_to(np.asarray(total, dtype=float), parte.shape)
+    return np.divide(parte * 100, total, out=np.zeros_like(parte), where=total != 0)
+
+
+def _datos_estado_resultados(periodos):
+    """
+    Estado de resultados de varios períodos, que pueden solaparse
+    (LibroMayor.movimientos_por_periodo). Porcentajes sobre
+    ingresos y variaciones contra el primer período se calculan sobre las
+    matrices completas.
+
+    Devuelve, del primer período, las listas (codigo, nombre, monto) y los
+    totales que usan la plantilla y la exportación, más 'comparativo' con
+    una columna por período.
+    """
+    libro = libro_mayor()
+    debe, haber = libro.movimientos_por_periodo([(d, h) for d, h, _ in periodos])
+    neto = debe - haber                        # períodos x cuentas, centavos
+    primer_digito = np.array([c[:1] for c in libro.codigos.astype(str)])
+
+    datos = {}
+    secciones = []
+    totales = {}
+    for clave, titulo, prefijo, signo in SECCIONES_RESULTADOS:
+        columnas = np.flatnonzero(primer_digito == prefijo)
+        montos = signo * neto[:, columnas]     # períodos x cuentas de la sección
+        activas = np.any(montos != 0, axis=0)
+        con_movimiento, montos = columnas[activas], montos[:, activas]
+        totales[clave] = montos.sum(axis=1)
+        secciones.append((clave, titulo, con_movimiento, montos))
+        datos[clave] = [(libro.codigos[i], libro.nombres[i], a_decimal(montos[0, j]))
+                        for j, i in enumerate(con_movimiento)]
+        datos[f'total_{clave}'] = a_decimal(totales[clave][0])
+
+    utilidades = {
+        'utilidad_bruta': totales['ingresos'] - totales['costos'],
+    }
+    utilidades['utilidad_operativa'] = utilidades['utilidad_bruta'] - totales['gastos']
+    utilidades['utilidad_neta'] = utilidades['utilidad_operativa'] - totales['gastos_financieros']
+    for clave, valores in utilidades.items():
+        datos[clave] = a_decimal(valores[0])
+
+    # --- Comparativo: una columna por período
+    ingresos = totales['ingresos'].astype(float)
+
+    def columnas(valores):
+        """montos, % de ingresos y variación del primer período contra cada uno."""
+        valores = np.asarray(valores)
+        variacion = valores[..., :1] - valores
+        return {
+            'montos': [a_decimal(v) for v in valores],
+            'porcentajes': _porcentaje(valores, ingresos).tolist(),
+            'variaciones': _porcentaje(variacion, np.abs(valores)).tolist(),
+        }
+
+    comparativo = {'periodos': [etiqueta for _, _, etiqueta in periodos], 'secciones': [], 'utilidades': []}
+    for clave, titulo, cuentas, montos in secciones:
+        comparativo['secciones'].append({
+            'titulo': titulo,
+            'filas': [dict(codigo=libro.codigos[i], nombre=libro.nombres[i], **columnas(montos[:, j]))
+                      for j, i in enumerate(cuentas)],
+            'total': columnas(totales[clave]),
+        })
+    for clave, titulo in (('utilidad_bruta', 'Utilidad bruta'), ('utilidad_operativa', 'Utilidad operativa'),
+                          ('utilidad_neta', 'Utilidad neta')):
+        comparativo['utilidades'].append(dict(titulo=titulo, **columnas(utilidades[clave])))
+    datos['comparativo'] = comparativo
+    return datos
+
+
 @informes_bp.route('/estado-resultados')
 def estado_resultados():
-    """Estado de Resultados corregido"""
+    """Estado de Resultados, con columnas comparativas opcionales"""
     # 1. Inicialización de variables (Evita el NameError)
-    ingresos = costos = gastos = gastos_financieros = []
-    total_ingresos = total_costos = total_gastos = total_gastos_financieros = Decimal('0')
-    utilidad_bruta = utilidad_operativa = utilidad_neta = Decimal('0')
+    datos = {
+        'ingresos': [], 'costos': [], 'gastos': [], 'gastos_financieros': [],
+        'total_ingresos': Decimal('0'), 'total_costos': Decimal('0'),
+        'total_gastos': Decimal('0'), 'total_gastos_financieros': Decimal('0'),
+        'utilidad_bruta': Decimal('0'), 'utilidad_operativa': Decimal('0'), 'utilidad_neta': Decimal('0'),
+        'comparativo': None,
+    }
     
     # 2. Gestión de fechas
     ahora = datetime.now()
@@ -153,6 +274,9 @@ def estado_resultados():
     
     fecha_inicio = request.args.get('fecha_inicio', primer_dia_mes_str)
     fecha_fin = request.args.get('fecha_fin', hoy_str)
+    comparar = request.args.get('comparar', 'ninguna')
+    if comparar not in COMPARACIONES:
+        comparar = 'ninguna'
 
     # Variables para botones rápidos
     hace_30_dias = (ahora - timedelta(days=30)).strftime('%Y-%m-%d')
@@ -169,66 +293,163 @@ def estado_resultados():
     except:
         dias_periodo = 1
 
-    conn = get_connection()
     try:
-        cursor = conn.cursor()
-        
-        # --- CONSULTA INGRESOS ---
-        cursor.execute("SELECT cc.codigo, cc.nombre, COALESCE(SUM(ac.haber - ac.debe), 0) FROM ...", (fecha_inicio, fecha_fin))
-        ingresos = cursor.fetchall()
-        total_ingresos = sum(Decimal(str(row[2] or 0)) for row in ingresos)
-
-        # --- CONSULTA COSTOS ---
-        # ... (Tu lógica de SQL para costos)
-        # total_costos = ...
-
-        # --- CÁLCULOS FINALES ---
-        utilidad_bruta = total_ingresos - total_costos
-        utilidad_operativa = utilidad_bruta - total_gastos
-        utilidad_neta = utilidad_operativa - total_gastos_financieros
-        
+        periodos = tuple(_periodos_comparativos(fecha_inicio, fecha_fin, comparar))
+        datos.update(_informe_cacheado('estado_resultados', _datos_estado_resultados, periodos))
         error = None
     except Exception as e:
-        print(f"Error en DB: {e}")
+        logger.error(f"Error en estado de resultados: {str(e)}")
         error = str(e)
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
 
     # 3. Retorno unificado
     return render_template('informes/estado_resultados.html', 
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
         hoy=hoy_str,
+        today=hoy_str,
         hace_30_dias=hace_30_dias,
         primer_dia_mes=primer_dia_mes_str,
         primer_dia_anio=primer_dia_anio,
         primer_dia_mes_ant=p_dia_mes_ant,
         ultimo_dia_mes_ant=u_dia_mes_ant_str,
         dias_periodo=dias_periodo,
-        ingresos=ingresos,
-        costos=costos,
-        gastos=gastos,
-        gastos_financieros=gastos_financieros,
-        total_ingresos=total_ingresos,
-        total_costos=total_costos,
-        total_gastos=total_gastos,
-        total_gastos_financieros=total_gastos_financieros,
-        utilidad_bruta=utilidad_bruta,
-        utilidad_operativa=utilidad_operativa,
-        utilidad_neta=utilidad_neta,
-        error=error
+        comparar=comparar,
+        comparaciones=COMPARACIONES,
+        error=error,
+        **datos
     )
 
 
+# Libro diario: asientos en orden (fecha, tipo, folio, consecutivo), el
+# de idx_asientos_fecha, agrupados por comprobante. La paginación es por
+# posición, igual que el mayor general.
+DIARIO_POR_PAGINA = 20
+
+_SQL_DIARIO = """
+    SELECT {top} ac.fecha, ac.id_comprobante_tipo, ac.id_comprobante_folio, ac.consecutivo,
+           c.concepto AS concepto_comprobante, c.estado,
+           ac.id_cuenta, cc.nombre AS cuenta_nombre,
+           ISNULL(ac.concepto, c.concepto) AS concepto,
+           ISNULL(ac.debe, 0) AS debe, ISNULL(ac.haber, 0) AS haber, ac.referencia
+    FROM asientos_contables ac
+    INNER JOIN comprobantes c ON c.tipo = ac.id_comprobante_tipo AND c.folio = ac.id_comprobante_folio
+    INNER JOIN cuentas_contables cc ON cc.codigo = ac.id_cuenta
+    WHERE ac.fecha BETWEEN ? AND ? {despues}
+    ORDER BY ac.fecha, ac.id_comprobante_tipo, ac.id_comprobante_folio, ac.consecutivo
+"""
+
+# Filas estrictamente posteriores a (fecha, tipo, folio, consecutivo)
+_SQL_DIARIO_DESPUES = """
+    AND (ac.fecha > ? OR (ac.fecha = ? AND
+        (ac.id_comprobante_tipo > ? OR (ac.id_comprobante_tipo = ? AND
+        (ac.id_comprobante_folio > ? OR (ac.id_comprobante_folio = ? AND ac.consecutivo > ?))))))
+"""
+
+# Totales por día y del periodo (la fila con fecha NULL) en una sola lectura
+_SQL_DIARIO_TOTALES = """
+    SELECT ac.fecha, COUNT(*) AS lineas,
+           COUNT(DISTINCT ac.id_comprobante_tipo + '|' + ac.id_comprobante_folio) AS comprobantes,
+           ISNULL(SUM(ac.debe), 0) AS total_debe, ISNULL(SUM(ac.haber), 0) AS total_haber
+    FROM asientos_contables ac
+    WHERE ac.fecha BETWEEN ? AND ?
+    GROUP BY GROUPING SETS ((ac.fecha), ())
+    ORDER BY GROUPING(ac.fecha), ac.fecha
+"""
+
+
+def _totales_diario(fecha_inicio, fecha_fin):
+    """(totales del periodo, [totales por día]) del libro diario."""
+    conn = get_connection(readonly=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(_SQL_DIARIO_TOTALES, (fecha_inicio, fecha_fin))
+        filas = cursor.fetchall()
+    finally:
+        conn.close()
+    # Sin asientos, GROUPING SETS igual devuelve la fila del total
+    por_dia = [f for f in filas if f.fecha is not None]
+    total = next((f for f in filas if f.fecha is None), None)
+    return total, por_dia
+
+
+def _agrupar_comprobantes(filas):
+    """Junta las líneas consecutivas de un mismo comprobante (generador)."""
+    actual = None
+    for fila in filas:
+        clave = (fila.fecha, fila.id_comprobante_tipo, fila.id_comprobante_folio)
+        if actual is None or actual['clave'] != clave:
+            if actual is not None:
+                yield actual
+            actual = {
+                'clave': clave,
+                'fecha': fila.fecha,
+                'comprobante': f"{fila.id_comprobante_tipo}-{fila.id_comprobante_folio}",
+                'concepto': fila.concepto_comprobante,
+                'estado': fila.estado,
+                'total_debe': Decimal('0'),
+                'total_haber': Decimal('0'),
+                'lineas': [],
+            }
+        actual['total_debe'] += fila.debe
+        actual['total_haber'] += fila.haber
+        actual['lineas'].append(fila)
+    if actual is not None:
+        yield actual
+
+
+def _cursor_diario(fila):
+    posicion = [fila.fecha.isoformat(), fila.id_comprobante_tipo, fila.id_comprobante_folio, fila.consecutivo]
+    return base64.urlsafe_b64encode(json.dumps(posicion).encode('utf-8')).decode('ascii')
+
+
+def _leer_cursor_diario(texto):
+    try:
+        fecha, tipo, folio, consecutivo = json.loads(base64.urlsafe_b64decode(texto.encode('ascii')))
+        return date.fromisoformat(fecha), tipo, folio, int(consecutivo)
+    except (ValueError, TypeError):
+        return None
+
+
+def _pagina_diario(fecha_inicio, fecha_fin, despues=None, por_pagina=DIARIO_POR_PAGINA):
+    """
+    Una página de `por_pagina` líneas agrupadas por comprobante. Devuelve
+    (comprobantes, cursor de la página siguiente o None). Un comprobante
+    que no entra completo sigue en la página siguiente.
+    """
+    params = [por_pagina + 1, fecha_inicio, fecha_fin]
+    clave = _leer_cursor_diario(despues) if despues else None
+    if clave:
+        fecha, tipo, folio, consecutivo = clave
+        params += [fecha, fecha, tipo, tipo, folio, folio, consecutivo]
+
+    conn = get_connection(readonly=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(_SQL_DIARIO.format(top="TOP(?)", despues=_SQL_DIARIO_DESPUES if clave else ""), params)
+        filas = cursor.fetchall()
+    finally:
+        conn.close()
+
+    siguiente = _cursor_diario(filas[por_pagina - 1]) if len(filas) > por_pagina else None
+    return list(_agrupar_comprobantes(filas[:por_pagina])), siguiente
+
+
+def iterar_libro_diario(fecha_inicio, fecha_fin):
+    """
+    Todas las líneas del periodo en orden, leídas de a bloques con
+    iter_rows(): para imprimir y exportar sin cargar el año en memoria.
+    """
+    return iter_rows(_SQL_DIARIO.format(top="", despues=""), (fecha_inicio, fecha_fin), readonly=True)
+
+
 @informes_bp.route('/libro-diario')
 def libro_diario():
     # 1. Inicialización de variables (Evita NameError)
-    asientos = []
+    comprobantes = []
+    resumen_dias = []
     total_debe = total_haber = Decimal('0')
-    total = 0
-    total_paginas = 1
+    total = total_comprobantes = 0
+    siguiente = None
     error = None
 
     # 2. Captura de parámetros y fechas
@@ -236,8 +457,11 @@ def libro_diario():
     fecha_fin = request.args.get('fecha_fin', hoy_dt.strftime('%Y-%m-%d'))
     fecha_inicio = request.args.get('fecha_inicio', 
                                    (hoy_dt - timedelta(days=30)).strftime('%Y-%m-%d'))
-    pagina = int(request.args.get('pagina', 1))
-    por_pagina = int(request.args.get('por_pagina', 20))
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = min(max(request.args.get('por_pagina', DIARIO_POR_PAGINA, type=int), 1), 500)
+    despues = request.args.get('despues')
+    if not despues:
+        pagina = 1
 
     # 3. CÁLCULO DE DÍAS (Hazlo aquí, no en el HTML)
     try:
@@ -247,38 +471,42 @@ def libro_diario():
     except:
         dias_periodo = 0
 
-    conn = get_connection()
+    # Versión para imprimir: todo el periodo, enviado a medida que se lee
+    if request.args.get('imprimir') == '1':
+        return Response(stream_with_context(stream_template(
+            'informes/libro_diario_imprimir.html',
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            comprobantes=_agrupar_comprobantes(iterar_libro_diario(fecha_inicio, fecha_fin)),
+            generado=hoy_dt.strftime('%Y-%m-%d %H:%M'))))
+
     try:
-        cursor = conn.cursor()
-        
-        # --- Lógica de Base de Datos (Count, Asientos, Totales) ---
-        # (Mantén tus queries aquí...)
-        
-        # Ejemplo de asignación segura de totales
-        cursor.execute(query_totales, (fecha_inicio, fecha_fin))
-        res_totales = cursor.fetchone()
-        total_debe = Decimal(str(res_totales[0] or 0))
-        total_haber = Decimal(str(res_totales[1] or 0))
-        
-        # ... (resto de tus queries)
-        
+        totales, resumen_dias = _totales_diario(fecha_inicio, fecha_fin)
+        if totales is not None:
+            total = totales.lineas
+            total_comprobantes = totales.comprobantes
+            total_debe = totales.total_debe
+            total_haber = totales.total_haber
+        comprobantes, siguiente = _pagina_diario(fecha_inicio, fecha_fin, despues, por_pagina)
     except Exception as e:
+        logger.error(f"Error en libro diario: {str(e)}")
         error = str(e)
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
+
+    total_paginas = max((total + por_pagina - 1) // por_pagina, 1)
 
     # 4. Enviar todo procesado al template
     return render_template('informes/libro_diario.html',
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
-        asientos=asientos,
+        comprobantes=comprobantes,
+        resumen_dias=resumen_dias,
         total_debe=total_debe,
         total_haber=total_haber,
         pagina_actual=pagina,
         total_paginas=total_paginas,
+        siguiente=siguiente,
         total=total,
+        total_comprobantes=total_comprobantes,
         por_pagina=por_pagina,
         dias_periodo=dias_periodo, # Variable nueva
         error=error,
@@ -286,6 +514,151 @@ def libro_diario():
     )
 
 
+# Mayor general paginado por posición (keyset): cada página busca desde la
+# última fila de la anterior en el orden (cuenta, fecha, comprobante,
+# consecutivo), que es el orden de idx_asientos_cuenta_fecha más la clave
+# del índice agrupado. Cargar la página 1000 cuesta lo mismo que la 1.
+MAYOR_POR_PAGINA = 100
+
+_SQL_MAYOR = """
+    SELECT {top} ac.id_cuenta, cc.nombre AS cuenta_nombre, ac.fecha,
+           ac.id_comprobante_tipo, ac.id_comprobante_folio, ac.consecutivo,
+           ISNULL(ac.concepto, c.concepto) AS concepto,
+           ISNULL(ac.debe, 0) AS debe, ISNULL(ac.haber, 0) AS haber, ac.referencia
+    FROM asientos_contables ac
+    INNER JOIN cuentas_contables cc ON cc.codigo = ac.id_cuenta
+    INNER JOIN comprobantes c ON c.tipo = ac.id_comprobante_tipo AND c.folio = ac.id_comprobante_folio
+    WHERE ac.fecha BETWEEN ? AND ? {filtros}
+    ORDER BY ac.id_cuenta, ac.fecha, ac.id_comprobante_tipo, ac.id_comprobante_folio, ac.consecutivo
+"""
+
+# Filas estrictamente posteriores a (cuenta, fecha, tipo, folio, consecutivo)
+_SQL_MAYOR_DESPUES = """
+    AND (ac.id_cuenta > ? OR (ac.id_cuenta = ? AND (ac.fecha > ? OR (ac.fecha = ? AND
+        (ac.id_comprobante_tipo > ? OR (ac.id_comprobante_tipo = ? AND
+        (ac.id_comprobante_folio > ? OR (ac.id_comprobante_folio = ? AND ac.consecutivo > ?))))))))
+"""
+
+
+# Neto (debe - haber) de una cuenta en el día de la fila del cursor, hasta
+# esa fila inclusive: la parte del saldo que el libro en memoria no puede
+# separar porque no guarda el orden dentro del día
+_SQL_MAYOR_DIA_HASTA = """
+    SELECT ISNULL(SUM(ISNULL(debe, 0) - ISNULL(haber, 0)), 0)
+    FROM asientos_contables
+    WHERE id_cuenta = ? AND fecha = ? AND fecha >= ?
+      AND (id_comprobante_tipo < ? OR (id_comprobante_tipo = ? AND
+          (id_comprobante_folio < ? OR (id_comprobante_folio = ? AND consecutivo <= ?))))
+"""
+
+
+def _cursor_mayor(fila):
+    """Posición de la última fila de la página, para la URL."""
+    posicion = [fila.id_cuenta, fila.fecha.isoformat(), fila.id_comprobante_tipo,
+                fila.id_comprobante_folio, fila.consecutivo]
+    return base64.urlsafe_b64encode(json.dumps(posicion).encode('utf-8')).decode('ascii')
+
+
+def _leer_cursor_mayor(texto):
+    """Clave (cuenta, fecha, tipo, folio, consecutivo) de un cursor de _cursor_mayor(); None si no es válido."""
+    try:
+        cuenta, fecha, tipo, folio, consecutivo = json.loads(base64.urlsafe_b64decode(texto.encode('ascii')))
+        return str(cuenta), date.fromisoformat(fecha), str(tipo), str(folio), int(consecutivo)
+    except (ValueError, TypeError):
+        return None
+
+
+def _saldo_hasta_cursor(libro, cursor, fecha_inicio, iniciales, clave):
+    """
+    Saldo según naturaleza de la cuenta del cursor justo después de su
+    fila: saldo al inicio del periodo, más los días completos anteriores
+    (libro mayor en memoria), más las filas de ese día hasta la del cursor.
+    Se recalcula siempre: el cursor solo trae la posición.
+    """
+    cuenta, fecha, tipo, folio, consecutivo = clave
+    i = libro.indice.get(cuenta)
+    if i is None:
+        return Decimal('0')
+    debe, haber = libro.movimientos(fecha_inicio, fecha - timedelta(days=1))
+    saldo = iniciales[i] + libro.saldo_por_naturaleza(debe[i], haber[i])
+    cursor.execute(_SQL_MAYOR_DIA_HASTA, (cuenta, fecha, fecha_inicio, tipo, tipo, folio, folio, consecutivo))
+    neto_dia = cursor.fetchone()[0]
+    return a_decimal(saldo) + int(libro.signos[i]) * neto_dia
+
+
+def _pagina_mayor(fecha_inicio, fecha_fin, cuenta_id=None, despues=None, por_pagina=MAYOR_POR_PAGINA):
+    """
+    Una página del mayor agrupada por cuenta. El saldo acumulado de cada
+    cuenta arranca en su saldo al inicio del periodo (libro mayor en
+    memoria) o, si la cuenta viene de la página anterior, en su saldo
+    recalculado hasta la fila del cursor `despues`. Devuelve (grupos,
+    cursor de la página siguiente o None).
+    """
+    libro = libro_mayor()
+    iniciales = libro.balanza_desde_cierre(fecha_inicio, fecha_inicio)['inicial']
+    clave = _leer_cursor_mayor(despues) if despues else None
+
+    filtros, params = "", [por_pagina + 1, fecha_inicio, fecha_fin]
+    if cuenta_id:
+        filtros += " AND ac.id_cuenta = ?"
+        params.append(cuenta_id)
+    if clave:
+        cuenta, fecha, tipo, folio, consecutivo = clave
+        filtros += _SQL_MAYOR_DESPUES
+        params += [cuenta, cuenta, fecha, fecha, tipo, tipo, folio, folio, consecutivo]
+
+    conn = get_connection(readonly=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(_SQL_MAYOR.format(top="TOP(?)", filtros=filtros), params)
+        filas = cursor.fetchall()
+        continua = bool(filas) and clave is not None and clave[0] == filas[0].id_cuenta
+        saldo_anterior = _saldo_hasta_cursor(libro, cursor, fecha_inicio, iniciales, clave) if continua else None
+    finally:
+        conn.close()
+
+    siguiente_fila = filas[por_pagina] if len(filas) > por_pagina else None
+    grupos = []
+    for fila in filas[:por_pagina]:
+        if not grupos or grupos[-1]['codigo'] != fila.id_cuenta:
+            i = libro.indice.get(fila.id_cuenta)
+            continua = not grupos and saldo_anterior is not None
+            if continua:
+                saldo = saldo_anterior
+            else:
+                saldo = a_decimal(iniciales[i]) if i is not None else Decimal('0')
+            grupos.append({
+                'codigo': fila.id_cuenta,
+                'nombre': fila.cuenta_nombre,
+                'signo': int(libro.signos[i]) if i is not None else 1,
+                'continua': continua,
+                'completa': True,
+                'saldo_inicial': saldo,
+                'saldo_final': saldo,
+                'total_debe': Decimal('0'),
+                'total_haber': Decimal('0'),
+                'movimientos': [],
+            })
+        grupo = grupos[-1]
+        grupo['saldo_final'] += grupo['signo'] * (fila.debe - fila.haber)
+        grupo['total_debe'] += fila.debe
+        grupo['total_haber'] += fila.haber
+        grupo['movimientos'].append({
+            'fecha': fila.fecha,
+            'comprobante': f"{fila.id_comprobante_tipo}-{fila.id_comprobante_folio}",
+            'concepto': fila.concepto,
+            'referencia': fila.referencia,
+            'debe': fila.debe,
+            'haber': fila.haber,
+            'saldo': grupo['saldo_final'],
+        })
+
+    if siguiente_fila is None:
+        return grupos, None
+    grupos[-1]['completa'] = siguiente_fila.id_cuenta != grupos[-1]['codigo']
+    return grupos, _cursor_mayor(filas[por_pagina - 1])
+
+
 @informes_bp.route('/mayor-general')
 def mayor_general():
     """Mayor General"""
@@ -299,6 +672,8 @@ def mayor_general():
     fecha_inicio = request.args.get('fecha_inicio', primer_dia_str)
     fecha_fin = request.args.get('fecha_fin', hoy_str)
     cuenta_id = request.args.get('cuenta_id')
+    despues = request.args.get('despues')
+    por_pagina = min(max(request.args.get('por_pagina', MAYOR_POR_PAGINA, type=int), 1), 500)
 
     # 3. Calcular diferencia de días para el badge del HTML
     try:
@@ -308,106 +683,58 @@ def mayor_general():
     except:
         dias_periodo = 0
 
-    conn = get_connection()
+    datos = {
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'cuenta_id': cuenta_id,
+        'por_pagina': por_pagina,
+        'despues': despues,
+        'hoy': hoy_str,
+        'today': hoy_str,
+        'primer_dia_mes': primer_dia_str,
+        'hace_30_dias': hace_30_dias_str,
+        'dias_periodo': dias_periodo
+    }
     try:
-        cursor = conn.cursor()
-        
-        # --- Obtener lista de cuentas para el filtro ---
-        query_cuentas = """
-        SELECT id, codigo, nombre 
-        FROM cuentas_contables 
-        WHERE tipo = 'D'
-        ORDER BY codigo;
-        """
-        cursor.execute(query_cuentas)
-        cuentas = cursor.fetchall()
-        
-        # --- Construir query de movimientos ---
-        query_params = [fecha_inicio, fecha_fin]
-        query_where = "WHERE ac.fecha BETWEEN %s AND %s"
-        
-        if cuenta_id:
-            query_where += " AND cc.id = %s"
-            query_params.append(cuenta_id)
-        
-        query = f"""
-        SELECT 
-            cc.codigo,
-            cc.nombre as cuenta_nombre,
-            ac.fecha,
-            c.folio,
-            c.concepto,
-            ac.debe,
-            ac.haber,
-            ac.referencia,
-            SUM(ac.debe - ac.haber) OVER (PARTITION BY cc.id ORDER BY ac.fecha, ac.id) as saldo_acumulado
-        FROM asientos_contables ac
-        JOIN comprobantes c ON ac.comprobante_id = c.id
-        JOIN cuentas_contables cc ON ac.cuenta_id = cc.id
-        {query_where}
-        ORDER BY cc.codigo, ac.fecha, ac.id;
-        """
-        cursor.execute(query, tuple(query_params))
-        movimientos = cursor.fetchall()
-        
-        # --- Calcular saldo inicial ---
-        query_saldo_inicial = """
-        SELECT 
-            cc.codigo,
-            cc.nombre,
-            COALESCE(SUM(sc.saldo_inicial), 0) as saldo_inicial
-        FROM cuentas_contables cc
-        LEFT JOIN saldos_cuentas sc ON cc.id = sc.cuenta_id 
-            AND sc.periodo = EXTRACT(YEAR FROM %s::date) || '-' || LPAD(EXTRACT(MONTH FROM %s::date)::text, 2, '0')
-        WHERE cc.tipo = 'D'
-        """
-        if cuenta_id:
-            query_saldo_inicial += " AND cc.id = %s"
-            cursor.execute(query_saldo_inicial, (fecha_inicio, fecha_inicio, cuenta_id))
+        libro = libro_mayor()
+        # --- Cuentas de detalle para el filtro: (valor, código, nombre)
+        datos['cuentas'] = [(libro.codigos[i], libro.codigos[i], libro.nombres[i])
+                            for i in libro.cuentas_de_detalle()]
+
+        grupos, siguiente = _informe_cacheado('mayor_general', _pagina_mayor,
+                                              _fecha_normalizada(fecha_inicio), _fecha_normalizada(fecha_fin),
+                                              cuenta_id or None, despues or None, por_pagina)
+        datos['grupos'] = grupos
+        datos['siguiente'] = siguiente
+        datos['movimientos_pagina'] = sum(len(g['movimientos']) for g in grupos)
+
+        # --- Saldo inicial de la cuenta elegida
+        i = libro.indice.get(cuenta_id) if cuenta_id else None
+        if i is not None:
+            inicial = libro.balanza_desde_cierre(fecha_inicio, fecha_inicio)['inicial'][i]
+            datos['saldos_iniciales'] = [(libro.codigos[i], libro.nombres[i], a_decimal(inicial))]
         else:
-            query_saldo_inicial += " GROUP BY cc.id, cc.codigo, cc.nombre ORDER BY cc.codigo"
-            cursor.execute(query_saldo_inicial, (fecha_inicio, fecha_inicio))
-        
-        saldos_iniciales = cursor.fetchall()
-        
-        # 4. Empaquetar datos para la plantilla
-        datos = {
-            'fecha_inicio': fecha_inicio,
-            'fecha_fin': fecha_fin,
-            'cuenta_id': cuenta_id,
-            'cuentas': cuentas,
-            'movimientos': movimientos,
-            'saldos_iniciales': saldos_iniciales,
-            'hoy': hoy_str,
-            'primer_dia_mes': primer_dia_str,
-            'hace_30_dias': hace_30_dias_str,
-            'dias_periodo': dias_periodo
-        }
-        
+            datos['saldos_iniciales'] = []
+
     except Exception as e:
-        # logger.error(f"Error en mayor general: {str(e)}") # Asegúrate de tener definido 'logger'
-        datos = {
-            'fecha_inicio': fecha_inicio,
-            'fecha_fin': fecha_fin,
-            'cuenta_id': cuenta_id,
+        logger.error(f"Error en mayor general: {str(e)}")
+        datos.update({
             'cuentas': [],
-            'movimientos': [],
+            'grupos': [],
+            'siguiente': None,
+            'movimientos_pagina': 0,
             'saldos_iniciales': [],
-            'hoy': hoy_str,
-            'primer_dia_mes': primer_dia_str,
-            'hace_30_dias': hace_30_dias_str,
-            'dias_periodo': 0,
             'error': str(e)
-        }
-    finally:
-        cursor.close()
-        conn.close()
+        })
     
     return render_template('informes/mayor_general.html', **datos)
 
 @informes_bp.route('/exportar/<informe>/<formato>')
 def exportar_informe(informe, formato):
     """Exportar informe a Excel o PDF"""
+    if informe not in ('balance-general', 'estado-resultados', 'libro-diario', 'mayor-general'):
+        abort(404)
+
     # Obtener parámetros
     fecha = request.args.get('fecha', datetime.now().strftime('%Y-%m-%d'))
     fecha_inicio = request.args.get('fecha_inicio', 
@@ -416,76 +743,10 @@ def exportar_informe(informe, formato):
     cuenta_id = request.args.get('cuenta_id')
     
     # Obtener datos según el informe
-    conn = get_connection()
     try:
-        cursor = conn.cursor()
-        
         if informe == 'balance-general':
-            # Obtener datos para balance general (similar a la función balance_general)
-            query = """
-            WITH saldos_actualizados AS (
-                SELECT 
-                    cc.id,
-                    cc.codigo,
-                    cc.nombre,
-                    cc.tipo,
-                    cc.nivel,
-                    cc.naturaleza,
-                    COALESCE(sc.saldo_inicial, 0) as saldo_inicial,
-                    COALESCE(SUM(CASE 
-                        WHEN ac.debe > 0 THEN ac.debe 
-                        WHEN ac.haber > 0 THEN -ac.haber 
-                        ELSE 0 
-                    END), 0) as movimiento
-                FROM cuentas_contables cc
-                LEFT JOIN saldos_cuentas sc ON cc.id = sc.cuenta_id 
-                    AND sc.periodo = EXTRACT(YEAR FROM %s::date) || '-' || LPAD(EXTRACT(MONTH FROM %s::date)::text, 2, '0')
-                LEFT JOIN asientos_contables ac ON cc.id = ac.cuenta_id 
-                    AND ac.fecha <= %s
-                WHERE cc.tipo IN ('B', 'D')
-                GROUP BY cc.id, cc.codigo, cc.nombre, cc.tipo, cc.nivel, cc.naturaleza, sc.saldo_inicial
-            ),
-            saldos_finales AS (
-                SELECT *,
-                    saldo_inicial + movimiento as saldo_final
-                FROM saldos_actualizados
-            )
-            SELECT 
-                codigo,
-                nombre,
-                tipo,
-                nivel,
-                naturaleza,
-                saldo_inicial,
-                movimiento,
-                saldo_final
-            FROM saldos_finales
-            ORDER BY codigo;
-            """
-            
-            cursor.execute(query, (fecha, fecha, fecha))
-            cuentas = cursor.fetchall()
-            
-            # Calcular totales
-            total_activo = Decimal('0')
-            total_pasivo = Decimal('0')
-            total_capital = Decimal('0')
-            
-            for cuenta in cuentas:
-                if cuenta[0].startswith('1'):
-                    total_activo += Decimal(str(cuenta[7] or 0))
-                elif cuenta[0].startswith('2'):
-                    total_pasivo += Decimal(str(cuenta[7] or 0))
-                elif cuenta[0].startswith('3'):
-                    total_capital += Decimal(str(cuenta[7] or 0))
-            
-            datos = {
-                'cuentas': cuentas,
-                'total_activo': total_activo,
-                'total_pasivo': total_pasivo,
-                'total_capital': total_capital,
-                'total_pasivo_capital': total_pasivo + total_capital
-            }
+            datos = _informe_cacheado('balance_general', _datos_balance_general,
+                                      _fecha_normalizada(fecha), 3, False)
             
             if formato == 'excel':
                 from helpers.export_helper import exportar_balance_general_excel
@@ -499,32 +760,76 @@ def exportar_informe(informe, formato):
                 mimetype = 'application/pdf'
                 
         elif informe == 'estado-resultados':
-            # Similar lógica para estado de resultados
-            # ... (implementar según necesidad)
-            pass
+            if formato != 'excel':
+                # Sin PDF propio: se imprime desde el informe
+                return redirect(url_for('informes.estado_resultados', fecha_inicio=fecha_inicio,
+                                        fecha_fin=fecha_fin))
+            periodos = tuple(_periodos_comparativos(fecha_inicio, fecha_fin, 'ninguna'))
+            datos = _informe_cacheado('estado_resultados', _datos_estado_resultados, periodos)
+            from helpers.export_helper import exportar_estado_resultados_excel
+            output = exportar_estado_resultados_excel(datos, fecha_inicio, fecha_fin)
+            filename = f"estado_resultados_{fecha_inicio}_a_{fecha_fin}.xlsx"
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             
         elif informe == 'libro-diario':
-            # Similar lógica para libro diario
-            # ... (implementar según necesidad)
-            pass
+            if formato != 'excel':
+                # El PDF sale de la versión para imprimir del navegador
+                return redirect(url_for('informes.libro_diario', fecha_inicio=fecha_inicio,
+                                        fecha_fin=fecha_fin, imprimir=1))
+            # Las filas se leen de a bloques mientras se escribe el archivo
+            datos = {
+                'asientos': ((f.fecha, f"{f.id_comprobante_tipo}-{f.id_comprobante_folio}", f.concepto,
+                              f.id_cuenta, f.cuenta_nombre, f.debe, f.haber, f.referencia)
+                             for f in iterar_libro_diario(fecha_inicio, fecha_fin))
+            }
+            from helpers.export_helper import exportar_libro_diario_excel
+            output = exportar_libro_diario_excel(datos, fecha_inicio, fecha_fin)
+            filename = f"libro_diario_{fecha_inicio}_a_{fecha_fin}.xlsx"
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             
-        elif informe == 'mayor-general':
-            # Similar lógica para mayor general
-            # ... (implementar según necesidad)
-            pass
+        else:  # mayor-general
+            if formato != 'excel':
+                # Sin PDF propio: se imprime desde el informe
+                return redirect(url_for('informes.mayor_general', fecha_inicio=fecha_inicio,
+                                        fecha_fin=fecha_fin, cuenta_id=cuenta_id))
+            datos = _datos_mayor_exportacion(fecha_inicio, fecha_fin, cuenta_id or None)
+            from helpers.export_helper import exportar_mayor_general_excel
+            output = exportar_mayor_general_excel(datos, fecha_inicio, fecha_fin)
+            filename = f"mayor_general_{fecha_inicio}_a_{fecha_fin}.xlsx"
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             
     except Exception as e:
         logger.error(f"Error exportando {informe}: {str(e)}")
         return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
     
     return send_file(output, 
                     download_name=filename, 
                     as_attachment=True, 
                     mimetype=mimetype)
 
+
+def _datos_mayor_exportacion(fecha_inicio, fecha_fin, cuenta_id=None):
+    """
+    Todos los movimientos del periodo (de una cuenta o de todas) y los
+    saldos iniciales, con la forma que espera exportar_mayor_general_excel.
+    Ese archivo acumula debe - haber, así que el saldo inicial va como
+    debe - haber y no según la naturaleza de la cuenta.
+    """
+    libro = libro_mayor()
+    iniciales = libro.signos * libro.balanza_desde_cierre(fecha_inicio, fecha_inicio)['inicial']
+    filtros, params = "", [fecha_inicio, fecha_fin]
+    if cuenta_id:
+        filtros = " AND ac.id_cuenta = ?"
+        params.append(cuenta_id)
+    with _lectura_fresca():
+        movimientos = [(f.id_cuenta, f.cuenta_nombre, f.fecha, f"{f.id_comprobante_tipo}-{f.id_comprobante_folio}",
+                        f.concepto, f.debe, f.haber, f.referencia)
+                       for f in iter_rows(_SQL_MAYOR.format(top="", filtros=filtros), params, readonly=True)]
+    codigos = sorted({m[0] for m in movimientos})
+    saldos_iniciales = [(codigo, libro.nombres[libro.indice[codigo]], a_decimal(iniciales[libro.indice[codigo]]))
+                        for codigo in codigos if codigo in libro.indice]
+    return {'movimientos': movimientos, 'saldos_iniciales': saldos_iniciales}
+
 def exportar_excel(informe, fecha_inicio, fecha_fin):
     """Exportar a Excel"""
     # Obtener datos según el informe
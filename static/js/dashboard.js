@@ -37,15 +37,26 @@ class DashboardManager {
             // Mostrar loader
             this.showLoading(true);
             
-            const response = await fetch('/api/dashboard-data');
-            const data = await response.json();
+            // Resumen, resultados, saldos y facturas en una sola solicitud
+            const response = await fetch('/api/batch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    widgets: { summary: {}, estado_resultados: {}, saldos: {}, facturas: {} }
+                })
+            });
+            const respuesta = await response.json();
             
-            if (data.success) {
-                this.updateUI(data);
-                this.showNotification('Datos actualizados correctamente', 'success');
-            } else {
-                throw new Error(data.error || 'Error al actualizar datos');
+            if (!response.ok) {
+                throw new Error(respuesta.error || 'Error al actualizar datos');
             }
+            const data = {};
+            Object.entries(respuesta.widgets).forEach(([nombre, w]) => {
+                if (w.error) throw new Error(`${nombre}: ${w.error}`);
+                data[nombre] = w.datos;
+            });
+            this.updateUI(data);
+            this.showNotification('Datos actualizados correctamente', 'success');
         } catch (error) {
             console.error('Error:', error);
             this.showNotification('Error al actualizar datos: ' + error.message, 'danger');
@@ -120,6 +131,48 @@ class DashboardManager {
     }
 }
 
+// ======================
+// GRÁFICOS (Plotly en el navegador)
+// ======================
+// El servidor envía solo las series ({labels, ...valores}); aquí se arma
+// la figura completa.
+const GraficosDashboard = {
+    ventasVsGastos(el, serie) {
+        const trazas = [
+            { type: 'bar', x: serie.labels, y: serie.ventas, name: 'Ventas', marker: { color: 'rgb(55, 83, 109)' } },
+            { type: 'bar', x: serie.labels, y: serie.gastos, name: 'Gastos', marker: { color: 'rgb(26, 118, 255)' } }
+        ];
+        const layout = {
+            title: 'Ventas vs Gastos (Últimos meses)',
+            xaxis: { tickfont: { size: 14 } },
+            yaxis: { title: { text: 'Monto ($)', font: { size: 16 } }, tickfont: { size: 14 } },
+            legend: { x: 0, y: 1.0, bgcolor: 'rgba(255, 255, 255, 0)', bordercolor: 'rgba(255, 255, 255, 0)' },
+            barmode: 'group',
+            bargap: 0.15,
+            bargroupgap: 0.1,
+            height: 400,
+            plot_bgcolor: 'white'
+        };
+        Plotly.react(el, trazas, layout, { responsive: true });
+    },
+    
+    distribucionPorTipo(el, serie) {
+        const trazas = [{
+            type: 'pie',
+            labels: serie.labels,
+            values: serie.valores,
+            textposition: 'inside',
+            textinfo: 'percent+label'
+        }];
+        const layout = {
+            title: 'Distribución por Tipo de Cuenta',
+            height: 400,
+            plot_bgcolor: 'white'
+        };
+        Plotly.react(el, trazas, layout, { responsive: true });
+    }
+};
+
 // Inicializar cuando el DOM esté listo
 document.addEventListener('DOMContentLoaded', () => {
     window.dashboardManager = new DashboardManager();
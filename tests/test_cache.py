@@ -0,0 +1,134 @@
+# tests/test_cache.py
+"""Pruebas de utils/cache.py."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import utils.cache as modulo
+from utils.cache import CacheLRU, CacheTTL, cacheado
+
+
+class Reloj:
+    """time.monotonic() controlado por la prueba."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo, 'time', SimpleNamespace(monotonic=reloj))
+    return reloj
+
+
+def _esperar(condicion, segundos=5):
+    limite = time.monotonic() + segundos
+    while not condicion():
+        assert time.monotonic() < limite, "no se cumplió a tiempo"
+        time.sleep(0.01)
+
+
+def test_ttl_vencido_devuelve_el_viejo_y_refresca_una_sola_vez(reloj):
+    cache = CacheTTL('prueba')
+    assert cache.obtener(('k',), lambda: 'viejo', ttl=10, max_stale=100) == 'viejo'
+
+    reloj.ahora += 20
+    seguir = threading.Event()
+    llamadas = []
+
+    def refresco():
+        llamadas.append(1)
+        seguir.wait(5)
+        return 'nuevo'
+
+    # Dentro de max_stale: responde al instante con el valor viejo
+    assert cache.obtener(('k',), refresco, ttl=10, max_stale=100) == 'viejo'
+    assert cache.obtener(('k',), refresco, ttl=10, max_stale=100) == 'viejo'
+    seguir.set()
+    _esperar(lambda: cache._datos[('k',)][0] == 'nuevo')
+
+    assert len(llamadas) == 1
+    assert cache.obtener(('k',), lambda: 'otro', ttl=10, max_stale=100) == 'nuevo'
+    stats = cache.estadisticas()
+    assert (stats['stale'], stats['refrescos']) == (2, 1)
+
+
+def test_ttl_demasiado_viejo_se_calcula_en_el_momento(reloj):
+    cache = CacheTTL('prueba')
+    cache.obtener(('k',), lambda: 'viejo', ttl=10, max_stale=100)
+    reloj.ahora += 200
+    assert cache.obtener(('k',), lambda: 'nuevo', ttl=10, max_stale=100) == 'nuevo'
+
+
+def test_ttl_no_guarda_errores(reloj):
+    cache = CacheTTL('prueba')
+    llamadas = []
+
+    def falla():
+        llamadas.append(1)
+        raise RuntimeError('sin base')
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cache.obtener(('k',), falla, ttl=10)
+    assert len(llamadas) == 2
+    assert cache.obtener(('k',), lambda: 'bien', ttl=10) == 'bien'
+    assert cache.estadisticas()['errores'] == 2
+
+
+def test_cacheado_ignora_los_argumentos_indicados():
+    cache = CacheTTL('prueba')
+    llamadas = []
+
+    class Servicio:
+        @cacheado(cache, ttl=60, ignorar=('user_id',))
+        def resumen(self, user_id, anio):
+            llamadas.append((user_id, anio))
+            return anio * 2
+
+    servicio = Servicio()
+    assert servicio.resumen(1, 2025) == 4050
+    assert servicio.resumen(2, 2025) == 4050
+    assert servicio.resumen(user_id=3, anio=2025) == 4050
+    assert servicio.resumen(1, 2026) == 4052
+    # Una llamada por año (posicional y con nombre son claves distintas)
+    assert llamadas == [(1, 2025), (3, 2025), (1, 2026)]
+
+
+def test_lru_no_guarda_un_calculo_invalidado_en_curso():
+    cache = CacheLRU('prueba', 4)
+    empezo, seguir = threading.Event(), threading.Event()
+    resultados = []
+
+    def lento():
+        empezo.set()
+        seguir.wait(5)
+        return 'viejo'
+
+    hilo = threading.Thread(target=lambda: resultados.append(cache.obtener(('a',), lento)))
+    hilo.start()
+    empezo.wait(5)
+    cache.invalidar('a')
+    seguir.set()
+    hilo.join(5)
+
+    assert resultados == ['viejo']
+    assert cache.obtener(('a',), lambda: 'nuevo') == 'nuevo'
+
+
+def test_lru_descarta_la_menos_usada():
+    cache = CacheLRU('prueba', 2)
+    cache.obtener(('a',), lambda: 'a')
+    cache.obtener(('b',), lambda: 'b')
+    cache.obtener(('a',), lambda: 'otra')      # 'a' pasa a ser la más usada
+    cache.obtener(('c',), lambda: 'c')         # sale 'b'
+    assert list(cache._datos) == [('a',), ('c',)]
+    assert cache.obtener(('a',), lambda: 'recalculada') == 'a'
+    assert cache.obtener(('b',), lambda: 'recalculada') == 'recalculada'
+    assert cache.estadisticas()['descartes'] == 2
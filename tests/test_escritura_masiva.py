@@ -0,0 +1,44 @@
+# tests/test_escritura_masiva.py
+"""Pruebas de utils/escritura_masiva.py con un cursor falso."""
+import pytest
+
+from utils.escritura_masiva import insertar_filas
+
+
+class CursorFalso:
+    def __init__(self):
+        self.lotes = []
+        self.tipos = None
+
+    def setinputsizes(self, tipos):
+        self.tipos = tipos
+
+    def executemany(self, sql, lote):
+        self.lotes.append((sql, lote))
+
+
+def test_inserta_por_lotes():
+    cursor = CursorFalso()
+    filas = [(i, f'c{i:02d}') for i in range(5)]
+    assert insertar_filas(cursor, 't', ('a', 'b'), filas, tamano_lote=2) == 5
+    assert [len(lote) for _, lote in cursor.lotes] == [2, 2, 1]
+    assert cursor.lotes[0][0] == "INSERT INTO t (a, b) VALUES (?, ?)"
+
+
+@pytest.mark.parametrize('filas', [
+    [(1, None), (2, 5)],           # NULL en la primera fila
+    [(1, 'ab'), (2, 'abcdef')],    # texto más largo que el de la primera fila
+    [(1, 5), (2, 'cinco')],        # otro tipo
+])
+def test_sin_tipos_rechaza_lo_que_la_primera_fila_no_puede_describir(filas):
+    cursor = CursorFalso()
+    with pytest.raises(ValueError):
+        insertar_filas(cursor, 't', ('a', 'b'), filas)
+    assert not cursor.lotes
+
+
+def test_con_tipos_no_verifica_la_primera_fila():
+    cursor = CursorFalso()
+    tipos = [(4, 0, 0), (4, 0, 0)]
+    assert insertar_filas(cursor, 't', ('a', 'b'), [(1, None), (2, 5)], tipos=tipos) == 2
+    assert cursor.tipos == tipos
@@ -0,0 +1,214 @@
+# tests/test_libro_mayor.py
+"""
+Pruebas del libro mayor en memoria (models/libro_mayor.py) con un plan de
+cuentas y asientos armados en memoria, sin base de datos.
+"""
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+
+import models.libro_mayor as modulo
+from models.libro_mayor import ColumnasAsientos, LibroMayor
+from utils.eventos import emitir
+
+
+def _cuenta(codigo, tipo, naturaleza, padre=None, nivel=1):
+    return SimpleNamespace(codigo=codigo, nombre=f'Cuenta {codigo}', tipo=tipo, nivel=nivel,
+                           naturaleza=naturaleza, id_cuenta_padre=padre)
+
+
+PLAN = [
+    _cuenta('1', 'Activo', 'Débito'),
+    _cuenta('1101', 'Activo', 'Débito', '1', 2),      # caja
+    _cuenta('1201', 'Activo', 'Débito', '1', 2),      # equipo
+    _cuenta('1301', 'Activo', 'Crédito', '1', 2),     # depreciación acumulada
+    _cuenta('2', 'Pasivo', 'Crédito'),
+    _cuenta('2101', 'Pasivo', 'Crédito', '2', 2),
+    _cuenta('3', 'Patrimonio', 'Crédito'),
+    _cuenta('3101', 'Patrimonio', 'Crédito', '3', 2),
+    _cuenta('4', 'Ingreso', 'Crédito'),
+    _cuenta('4101', 'Ingreso', 'Crédito', '4', 2),
+    _cuenta('5', 'Gasto', 'Débito'),
+    _cuenta('5101', 'Gasto', 'Débito', '5', 2),
+    _cuenta('6', 'Gasto', 'Débito'),
+    _cuenta('6101', 'Gasto', 'Débito', '6', 2),       # depreciación del ejercicio
+]
+
+# (cuenta, fecha, debe, haber, tipo, folio) con los importes en centavos
+ASIENTOS = [
+    ('3101', 20250105, 0, 500000, 'D', '1'),       # aporte de capital
+    ('1101', 20250105, 500000, 0, 'D', '1'),
+    ('1201', 20250110, 300000, 0, 'E', '1'),       # compra de equipo
+    ('1101', 20250110, 0, 300000, 'E', '1'),
+    ('1101', 20250215, 200000, 0, 'I', '1'),       # venta
+    ('4101', 20250215, 0, 200000, 'I', '1'),
+    ('5101', 20250220, 80000, 0, 'D', '2'),        # costo a crédito
+    ('2101', 20250220, 0, 80000, 'D', '2'),
+    ('6101', 20250331, 10000, 0, 'D', '3'),        # depreciación
+    ('1301', 20250331, 0, 10000, 'D', '3'),
+    ('1101', 20260115, 150000, 0, 'I', '2'),       # venta del año siguiente
+    ('4101', 20260115, 0, 150000, 'I', '2'),
+]
+
+
+def libro(asientos=ASIENTOS, cierres=(), cuentas=PLAN):
+    return LibroMayor(cuentas, asientos, cierres)
+
+
+def saldo(mayor, valores, codigo):
+    return int(valores[mayor.indice[codigo]])
+
+
+def test_saldos_segun_naturaleza():
+    mayor = libro()
+    saldos = mayor.saldos(hasta=20251231)
+    assert saldo(mayor, saldos, '1101') == 400000
+    assert saldo(mayor, saldos, '1301') == 10000      # acreedora: haber - debe
+    assert saldo(mayor, saldos, '4101') == 200000
+
+
+def test_balanza_parte_del_acumulado_anterior():
+    mayor = libro()
+    balanza = mayor.balanza(date(2025, 2, 1), date(2025, 2, 28))
+    caja = mayor.indice['1101']
+    assert balanza['inicial'][caja] == 200000
+    assert balanza['debe'][caja] == 200000
+    assert balanza['final'][caja] == 400000
+
+
+def test_acumular_saldos_resta_la_regularizadora_en_el_padre():
+    mayor = libro()
+    acumulados = mayor.acumular_saldos(mayor.saldos(hasta=20251231))
+    # caja 4000 + equipo 3000 - depreciación 100
+    assert saldo(mayor, acumulados, '1') == 690000
+
+
+def test_saldos_por_tipo_con_el_signo_del_tipo():
+    mayor = libro()
+    totales = mayor.saldos_por_tipo(mayor.saldos(hasta=20251231))
+    assert totales['Activo'] == 690000
+    assert totales['Pasivo'] == 80000
+    assert totales['Patrimonio'] == 500000
+    assert totales['Ingreso'] == 200000
+    assert totales['Gasto'] == 90000
+    # Activo = Pasivo + Patrimonio + resultado del ejercicio
+    assert totales['Activo'] == totales['Pasivo'] + totales['Patrimonio'] + totales['Ingreso'] - totales['Gasto']
+
+
+def test_tipos_con_nombres_viejos_cuentan_como_los_del_formulario():
+    # Planes cargados antes del formulario: Capital / Ingresos / Gastos
+    viejos = {'Patrimonio': 'Capital', 'Ingreso': 'Ingresos', 'Gasto': 'Gastos'}
+    plan = [_cuenta(c.codigo, viejos.get(c.tipo, c.tipo), c.naturaleza, c.id_cuenta_padre, c.nivel) for c in PLAN]
+    mayor = libro(cuentas=plan)
+    assert mayor.saldos_por_tipo(mayor.saldos(hasta=20251231)) == \
+        libro().saldos_por_tipo(libro().saldos(hasta=20251231))
+    assert set(mayor.tipos) == {'Activo', 'Pasivo', 'Patrimonio', 'Ingreso', 'Gasto'}
+
+
+def test_movimientos_por_periodo_igual_a_movimientos():
+    mayor = libro()
+    periodos = [(20250101, 20250131), (20250201, 20250331), (20260101, 20260131)]
+    debe, haber = mayor.movimientos_por_periodo(periodos)
+    for fila, (desde, hasta) in enumerate(periodos):
+        esperado_debe, esperado_haber = mayor.movimientos(desde, hasta)
+        assert np.array_equal(debe[fila], esperado_debe)
+        assert np.array_equal(haber[fila], esperado_haber)
+
+
+def test_asientos_de_cuentas_fuera_del_plan_se_ignoran():
+    mayor = libro(ASIENTOS + [('9999', 20250301, 100, 0, 'D', '4')])
+    assert len(mayor.fecha) == len(ASIENTOS)
+
+
+def _cierres(mayor, periodo, saldos):
+    """Filas de saldos_cuentas (cuenta, periodo, debe - haber) para todas las cuentas con saldo."""
+    return [(str(mayor.codigos[i]), periodo, int(saldos[i])) for i in np.flatnonzero(saldos)]
+
+
+def test_cierre_consistente_se_usa():
+    debe, haber = libro().movimientos(hasta=20250228)
+    mayor = libro(cierres=_cierres(libro(), 202502, debe - haber))
+    assert list(mayor.periodos_cierre) == [202502]
+    balanza = mayor.balanza_desde_cierre(date(2025, 3, 1), date(2025, 12, 31))
+    assert balanza['cierre'] == 202502
+    assert np.array_equal(balanza['final'], mayor.balanza(date(2025, 3, 1), date(2025, 12, 31))['final'])
+
+
+def test_cierre_que_no_coincide_con_los_asientos_no_se_usa():
+    base = libro()
+    debe, haber = base.movimientos(hasta=20250228)
+    # Guardado según naturaleza: las acreedoras quedan con el signo al revés
+    mayor = libro(cierres=_cierres(base, 202502, base.signos * (debe - haber)))
+    assert len(mayor.periodos_cierre) == 0
+    assert mayor.balanza_desde_cierre(date(2025, 3, 1), date(2025, 12, 31))['cierre'] is None
+
+
+def test_cierre_deja_de_usarse_si_cambia_un_comprobante_anterior():
+    debe, haber = libro().movimientos(hasta=20250228)
+    mayor = libro(cierres=_cierres(libro(), 202502, debe - haber))
+    cambiado = mayor.con_comprobantes([('D', '2')], [])
+    assert len(cambiado.periodos_cierre) == 0
+    assert list(mayor.periodos_cierre) == [202502]
+
+
+def test_columnas_por_bloques_igual_a_un_solo_bloque():
+    por_bloques = ColumnasAsientos(ASIENTOS, bloque=5)
+    entero = ColumnasAsientos(ASIENTOS)
+    for nombre in ('cuenta', 'fecha', 'debe', 'haber', 'comprobante'):
+        assert np.array_equal(getattr(por_bloques, nombre), getattr(entero, nombre))
+
+
+def _mismo_libro(a, b):
+    for nombre in ('fecha', 'cuenta', 'debe', 'haber'):
+        assert np.array_equal(getattr(a, nombre), getattr(b, nombre)), nombre
+
+
+def test_con_comprobantes_reemplaza_los_asientos_del_comprobante():
+    # La venta de febrero se corrige a 2500 y pasa al 10 de febrero
+    corregida = [('1101', 20250210, 250000, 0, 'I', '1'), ('4101', 20250210, 0, 250000, 'I', '1')]
+    esperado = libro([a for a in ASIENTOS if a[4:] != ('I', '1')] + corregida)
+    _mismo_libro(libro().con_comprobantes([('I', '1')], corregida), esperado)
+
+
+def test_con_comprobantes_sin_filas_borra_el_comprobante():
+    esperado = libro([a for a in ASIENTOS if a[4:] != ('D', '3')])
+    _mismo_libro(libro().con_comprobantes([('D', '3')], []), esperado)
+
+
+def test_con_comprobantes_de_cuenta_nueva_pide_recargar():
+    assert libro().con_comprobantes([('D', '4')], [('9999', 20250301, 100, 0, 'D', '4')]) is None
+
+
+def test_libro_mayor_aplica_los_cambios_sin_recargar(monkeypatch):
+    filas = list(ASIENTOS)
+    cargas = []
+
+    def iter_rows(query, params=None, readonly=False, **_):
+        if 'FROM asientos_contables' in query:
+            if params is None:
+                cargas.append(query)
+                return iter(list(filas))
+            pares = set(zip(params[::2], params[1::2]))
+            return iter([f for f in filas if f[4:] in pares])
+        if 'FROM saldos_cuentas' in query:
+            return iter([])
+        return iter(PLAN)
+
+    monkeypatch.setattr(modulo, 'iter_rows', iter_rows)
+    monkeypatch.setattr(modulo, '_libro', None)
+    monkeypatch.setattr(modulo, '_pendientes', {})
+    primero = modulo.libro_mayor()
+    assert modulo.libro_mayor() is primero
+
+    filas.append(('1101', 20250301, 5000, 0, 'I', '3'))
+    filas.append(('4101', 20250301, 0, 5000, 'I', '3'))
+    version = modulo.version_libro()
+    emitir('asiento', tipo='I', folio='3', cuentas=['1101', '4101'])
+    assert modulo.version_libro() > version
+
+    segundo = modulo.libro_mayor()
+    assert len(cargas) == 1
+    assert segundo is not primero
+    _mismo_libro(segundo, libro(filas))
+    assert not modulo._pendientes
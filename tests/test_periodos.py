@@ -0,0 +1,45 @@
+# tests/test_periodos.py
+"""Pruebas de los periodos de comparación de utils/periodos.py."""
+from datetime import date
+
+from utils.periodos import periodo_anterior, periodos_comparativos, restar_anio, sumar_meses
+
+from tests.test_libro_mayor import libro
+
+
+def test_anterior_de_un_mes_es_el_mes_calendario_anterior():
+    assert periodo_anterior(date(2026, 3, 1), date(2026, 3, 31)) == (date(2026, 2, 1), date(2026, 2, 28))
+    assert periodo_anterior(date(2026, 1, 1), date(2026, 3, 31)) == (date(2025, 10, 1), date(2025, 12, 31))
+
+
+def test_anterior_de_un_rango_suelto_son_los_dias_previos():
+    assert periodo_anterior(date(2026, 3, 10), date(2026, 3, 19)) == (date(2026, 2, 28), date(2026, 3, 9))
+
+
+def test_fin_de_mes_sigue_en_fin_de_mes():
+    assert restar_anio(date(2025, 2, 28)) == date(2024, 2, 29)
+    assert restar_anio(date(2024, 2, 29)) == date(2023, 2, 28)
+    assert sumar_meses(date(2026, 3, 30), -1) == date(2026, 2, 28)
+
+
+def test_acumulado_del_anio_con_ambas_comparaciones():
+    periodos = periodos_comparativos(date(2026, 1, 1), date(2026, 10, 18), 'ambas')
+    assert periodos == [
+        (date(2026, 1, 1), date(2026, 10, 18), 'Actual'),
+        (date(2025, 3, 1), date(2025, 12, 18), 'Anterior'),
+        (date(2025, 1, 1), date(2025, 10, 18), 'Año anterior'),
+    ]
+    # Anterior y año anterior se solapan: cada uno suma sus propios asientos
+    mayor = libro()
+    debe, haber = mayor.movimientos_por_periodo([(d, h) for d, h, _ in periodos])
+    for fila, (desde, hasta, _) in enumerate(periodos):
+        esperado_debe, esperado_haber = mayor.movimientos(desde, hasta)
+        assert (debe[fila] == esperado_debe).all()
+        assert (haber[fila] == esperado_haber).all()
+
+
+def test_rango_de_mas_de_un_anio_contra_el_anio_anterior():
+    periodos = periodos_comparativos(date(2025, 1, 1), date(2026, 6, 30), 'anio')
+    assert periodos[1][:2] == (date(2024, 1, 1), date(2025, 6, 30))
+    debe, _ = libro().movimientos_por_periodo([(d, h) for d, h, _ in periodos])
+    assert debe.shape == (2, len(libro().codigos))
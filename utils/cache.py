@@ -0,0 +1,200 @@
+# utils/cache.py
+"""
+Caché en memoria con vencimiento (TTL) y stale-while-revalidate.
+
+- Dentro del TTL se devuelve el valor guardado.
+- Vencido, pero dentro de `max_stale`, se devuelve el valor viejo y se
+  recalcula en segundo plano (una sola vez por clave).
+- Sin valor, o demasiado viejo, se calcula en el momento; si varios hilos
+  piden la misma clave a la vez, solo uno consulta y los demás esperan.
+- invalidar() también descarta los cálculos en marcha de esas claves: su
+  resultado llega a quien ya lo esperaba, pero no se guarda, y la próxima
+  consulta calcula de nuevo con los datos nuevos.
+
+CacheLRU guarda hasta `max_claves` resultados y descarta el usado hace
+más tiempo; sirve cuando las claves cambian solas (p. ej. llevan una
+versión de los datos) y no hace falta invalidar. Su invalidar() trata
+los cálculos en marcha igual que CacheTTL.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+
+CACHE_ACTIVO = os.environ.get("APP_CACHE", "1") != "0"
+
+_refrescos = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresco')
+
+
+class CacheTTL:
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._datos = {}        # clave -> (valor, guardado_en)
+        self._en_curso = {}     # clave -> Future del cálculo en marcha
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale': 0, 'misses': 0, 'refrescos': 0, 'errores': 0}
+
+    def _calcular(self, clave, funcion, futuro):
+        try:
+            valor = funcion()
+        except BaseException as e:
+            with self._lock:
+                self._stats['errores'] += 1
+                if self._en_curso.get(clave) is futuro:
+                    del self._en_curso[clave]
+            futuro.set_exception(e)
+            return
+        with self._lock:
+            # Si se invalidó mientras calculaba, el valor puede ser anterior
+            # al cambio: se entrega a quienes esperaban, pero no se guarda
+            if self._en_curso.get(clave) is futuro:
+                self._datos[clave] = (valor, time.monotonic())
+                del self._en_curso[clave]
+        futuro.set_result(valor)
+
+    def obtener(self, clave, funcion, ttl, max_stale=None):
+        """Valor de `clave`, calculándolo con funcion() si hace falta."""
+        max_stale = ttl * 5 if max_stale is None else max_stale
+        ahora = time.monotonic()
+        with self._lock:
+            guardado = self._datos.get(clave)
+            edad = ahora - guardado[1] if guardado else None
+            if guardado and edad < ttl:
+                self._stats['hits'] += 1
+                return guardado[0]
+
+            futuro = self._en_curso.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = self._en_curso[clave] = Future()
+
+            if guardado and edad < max_stale:
+                self._stats['stale'] += 1
+                if propio:
+                    self._stats['refrescos'] += 1
+                    _refrescos.submit(self._calcular, clave, funcion, futuro)
+                return guardado[0]
+
+            self._stats['misses'] += 1
+
+        if propio:
+            self._calcular(clave, funcion, futuro)
+        return futuro.result()
+
+    def invalidar(self, prefijo=None):
+        """
+        Borra todo, o las claves cuyo primer elemento es `prefijo`, junto
+        con los cálculos en marcha de esas claves.
+        """
+        with self._lock:
+            for tabla in (self._datos, self._en_curso):
+                if prefijo is None:
+                    tabla.clear()
+                else:
+                    for clave in [c for c in tabla if c[0] == prefijo]:
+                        del tabla[clave]
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['claves'] = len(self._datos)
+        consultas = stats['hits'] + stats['stale'] + stats['misses']
+        stats['tasa_aciertos'] = (stats['hits'] + stats['stale']) / consultas if consultas else 0.0
+        return stats
+
+
+class CacheLRU:
+    """Caché acotada por cantidad de claves, con TTL opcional."""
+
+    def __init__(self, nombre, max_claves, ttl=None):
+        self.nombre = nombre
+        self.max_claves = max_claves
+        self.ttl = ttl
+        self._datos = OrderedDict()   # clave -> (valor, guardado_en), la más usada al final
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'descartes': 0, 'errores': 0}
+
+    def obtener(self, clave, funcion):
+        """Valor de `clave`, calculándolo con funcion() si no está o venció."""
+        if not CACHE_ACTIVO:
+            return funcion()
+        with self._lock:
+            guardado = self._datos.get(clave)
+            if guardado and (self.ttl is None or time.monotonic() - guardado[1] < self.ttl):
+                self._datos.move_to_end(clave)
+                self._stats['hits'] += 1
+                return guardado[0]
+            self._stats['misses'] += 1
+            futuro = self._en_curso.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = self._en_curso[clave] = Future()
+        if not propio:
+            return futuro.result()
+
+        try:
+            valor = funcion()
+        except BaseException as e:
+            with self._lock:
+                self._stats['errores'] += 1
+                if self._en_curso.get(clave) is futuro:
+                    del self._en_curso[clave]
+            futuro.set_exception(e)
+            raise
+        with self._lock:
+            # Invalidada mientras calculaba: se entrega, pero no se guarda
+            if self._en_curso.get(clave) is futuro:
+                self._datos[clave] = (valor, time.monotonic())
+                self._datos.move_to_end(clave)
+                while len(self._datos) > self.max_claves:
+                    self._datos.popitem(last=False)
+                    self._stats['descartes'] += 1
+                del self._en_curso[clave]
+        futuro.set_result(valor)
+        return valor
+
+    def invalidar(self, prefijo=None):
+        """
+        Borra todo, o las claves cuyo primer elemento es `prefijo`, junto
+        con los cálculos en marcha de esas claves.
+        """
+        with self._lock:
+            for tabla in (self._datos, self._en_curso):
+                if prefijo is None:
+                    tabla.clear()
+                else:
+                    for clave in [c for c in tabla if c[0] == prefijo]:
+                        del tabla[clave]
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['claves'] = len(self._datos)
+        consultas = stats['hits'] + stats['misses']
+        stats['tasa_aciertos'] = stats['hits'] / consultas if consultas else 0.0
+        return stats
+
+
+def cacheado(cache, ttl, max_stale=None, ignorar=()):
+    """
+    Decorador para métodos: la clave es (nombre del método, argumentos),
+    sin `self` ni los argumentos nombrados en `ignorar` (p. ej. user_id,
+    cuando el resultado es igual para todos los usuarios).
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            if not CACHE_ACTIVO:
+                return metodo(self, *args, **kwargs)
+            clave_kwargs = tuple(sorted((k, v) for k, v in kwargs.items() if k not in ignorar))
+            # Los posicionales ignorados se descartan según la firma del método
+            nombres = metodo.__code__.co_varnames[1:metodo.__code__.co_argcount]
+            clave_args = tuple(v for n, v in zip(nombres, args) if n not in ignorar) + args[len(nombres):]
+            clave = (metodo.__name__, clave_args, clave_kwargs)
+            return cache.obtener(clave, lambda: metodo(self, *args, **kwargs), ttl, max_stale)
+        return envoltura
+    return decorador
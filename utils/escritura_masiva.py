@@ -0,0 +1,72 @@
+# utils/escritura_masiva.py
+"""
+Escritura por lotes: envía muchas filas con pocos viajes al servidor usando
+fast_executemany de pyodbc, partiendo las listas grandes en lotes.
+
+Sin `tipos`, pyodbc deduce el tipo y el tamaño de cada parámetro de la
+primera fila del lote: un NULL o un texto corto en esa fila hace fallar o
+trunca las siguientes. Las columnas que admiten NULL o son de largo
+variable necesitan `tipos` (setinputsizes); sin él, el lote se verifica
+antes de enviarlo y se rechaza con ValueError.
+"""
+from itertools import islice
+
+TAMANO_LOTE = 1000
+
+
+def _lotes(filas, tamano):
+    filas = iter(filas)
+    while True:
+        lote = list(islice(filas, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def _verificar_primera_fila(lote):
+    """
+    ValueError si el tipo deducido de la primera fila no sirve para el resto
+    del lote: una columna NULL en la primera fila y con valor en otra, de
+    otro tipo, o un texto más largo que el de la primera fila.
+    """
+    primera = lote[0]
+    for columna, modelo in enumerate(primera):
+        for fila in lote[1:]:
+            valor = fila[columna]
+            if valor is None:
+                continue
+            if modelo is None or type(valor) is not type(modelo) or \
+                    (isinstance(valor, str) and len(valor) > len(modelo)):
+                raise ValueError(
+                    f"La columna {columna} no se puede deducir de la primera fila "
+                    f"({modelo!r} frente a {valor!r}): pase `tipos`")
+
+
+def ejecutar_en_lotes(cursor, sql, filas, tamano_lote=TAMANO_LOTE, tipos=None):
+    """
+    Ejecuta `sql` una vez por cada fila de `filas` (lista o generador de tuplas)
+    en lotes de `tamano_lote`. `tipos` se pasa a setinputsizes(), un
+    (tipo SQL, tamaño, decimales) por columna como en utils/listados.py;
+    sin él cada lote se verifica con _verificar_primera_fila().
+    Devuelve la cantidad de filas enviadas.
+    """
+    cursor.fast_executemany = True
+    if tipos:
+        cursor.setinputsizes(tipos)
+
+    total = 0
+    for lote in _lotes(filas, tamano_lote):
+        if not tipos:
+            _verificar_primera_fila(lote)
+        cursor.executemany(sql, lote)
+        total += len(lote)
+    return total
+
+
+def insertar_filas(cursor, tabla, columnas, filas, tamano_lote=TAMANO_LOTE, tipos=None):
+    """INSERT INTO tabla (columnas) VALUES (?, ...) para todas las filas, por lotes."""
+    sql = (
+        f"INSERT INTO {tabla} ({', '.join(columnas)}) "
+        f"VALUES ({', '.join('?' for _ in columnas)})"
+    )
+    return ejecutar_en_lotes(cursor, sql, filas, tamano_lote, tipos)
@@ -0,0 +1,123 @@
+# utils/eventos.py
+"""
+Eventos de la aplicación y canal Server-Sent Events.
+
+Los modelos avisan qué cambió con emitir('factura', id_factura=...) una vez
+confirmada la escritura (ver config.db.al_confirmar); quien necesite
+reaccionar se suscribe con al_ocurrir(). Así los modelos no dependen del
+dashboard ni de ningún otro consumidor.
+
+CanalSSE reparte mensajes a todos los navegadores conectados. Cada
+conexión abierta ocupa un hilo del servidor y el canal vive en memoria
+del proceso: con varios procesos cada uno avisa solo a sus clientes (el
+resto se entera por el sondeo de respaldo del navegador).
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from collections import defaultdict
+
+from config.db import al_confirmar
+
+logger = logging.getLogger(__name__)
+
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", 20))  # segundos sin mensajes antes de un ping
+SSE_COLA_MAX = int(os.environ.get("SSE_COLA_MAX", 100))     # mensajes pendientes por cliente
+
+_oyentes = defaultdict(list)
+
+
+def al_ocurrir(evento, funcion):
+    """Registra funcion(**datos) para cada emitir(evento, **datos)."""
+    _oyentes[evento].append(funcion)
+
+
+def emitir(evento, **datos):
+    """Avisa a los oyentes del evento. Un oyente que falla no afecta al resto."""
+    for funcion in _oyentes.get(evento, ()):
+        try:
+            funcion(**datos)
+        except Exception:
+            logger.exception("Error en oyente del evento %s", evento)
+
+
+def emitir_al_confirmar(evento, **datos):
+    """emitir() cuando la escritura en curso quede confirmada."""
+    al_confirmar(lambda: emitir(evento, **datos))
+
+
+def mensaje_sse(evento, datos, id_mensaje=None):
+    """Texto de un mensaje SSE. `datos` puede ser un dict o JSON ya armado."""
+    if not isinstance(datos, str):
+        datos = json.dumps(datos, separators=(',', ':'))
+    lineas = [f"event: {evento}"]
+    if id_mensaje is not None:
+        lineas.append(f"id: {id_mensaje}")
+    lineas += [f"data: {linea}" for linea in datos.splitlines() or ['']]
+    return "\n".join(lineas) + "\n\n"
+
+
+class CanalSSE:
+    """Difusión de mensajes SSE: publicar() una vez, lo reciben todos los clientes."""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._clientes = set()
+        self._lock = threading.Lock()
+        self._secuencia = 0
+
+    def suscribir(self):
+        cola = queue.Queue(maxsize=SSE_COLA_MAX)
+        with self._lock:
+            self._clientes.add(cola)
+        return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._clientes.discard(cola)
+
+    def publicar(self, evento, datos):
+        """Encola el mensaje para cada cliente; el que no da abasto se desconecta."""
+        with self._lock:
+            self._secuencia += 1
+            texto = mensaje_sse(evento, datos, self._secuencia)
+            clientes = list(self._clientes)
+        for cola in clientes:
+            try:
+                cola.put_nowait(texto)
+            except queue.Full:
+                # Cliente lento: se le cierra el flujo y al reconectar
+                # recarga los widgets por HTTP
+                self.desuscribir(cola)
+                try:
+                    cola.get_nowait()
+                    cola.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def flujo(self, heartbeat=SSE_HEARTBEAT):
+        """
+        Generador para la respuesta text/event-stream de un cliente. Envía
+        un comentario de ping si pasan `heartbeat` segundos sin mensajes,
+        para mantener viva la conexión y detectar clientes que se fueron.
+        """
+        cola = self.suscribir()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    texto = cola.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if texto is None:
+                    return
+                yield texto
+        finally:
+            self.desuscribir(cola)
+
+    def estadisticas(self):
+        with self._lock:
+            return {'clientes': len(self._clientes), 'mensajes': self._secuencia}
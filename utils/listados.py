@@ -0,0 +1,170 @@
+# utils/listados.py
+"""
+Constructor de listados filtrados (comprobantes, asientos, facturas...).
+
+El WHERE lleva solo los filtros que vinieron con valor, como `col >= ?`,
+en el orden en que se declaran. Cada combinación de filtros es un texto
+SQL distinto y estable, con su propio plan (que puede buscar por el
+índice de la columna filtrada), en lugar de un único plan con
+(? IS NULL OR col >= ?) que sirve mal a todas. Los parámetros se envían
+con tipo y tamaño fijos (setinputsizes) y del mismo tipo que la columna
+(varchar o nvarchar), para que el plan se reutilice y no haya conversión
+implícita. Orden, paginación y conteo se resuelven igual para todos.
+"""
+from datetime import date, datetime
+
+import pyodbc
+
+from config.db import get_connection, iter_rows
+
+# tipo lógico -> (tipo SQL, tamaño, decimales) para setinputsizes.
+# 'texto' es para columnas varchar y 'ntexto' para nvarchar.
+TIPOS_SQL = {
+    'texto': (pyodbc.SQL_VARCHAR, 200, 0),
+    'ntexto': (pyodbc.SQL_WVARCHAR, 200, 0),
+    'entero': (pyodbc.SQL_INTEGER, 0, 0),
+    'fecha': (pyodbc.SQL_TYPE_DATE, 0, 0),
+}
+
+
+def _convertir(valor, tipo):
+    """Normaliza el valor recibido del formulario; vacío o inválido -> None."""
+    if valor is None or valor == '':
+        return None
+    try:
+        if tipo == 'entero':
+            return int(valor)
+        if tipo == 'fecha':
+            if isinstance(valor, datetime):
+                return valor.date()
+            if isinstance(valor, date):
+                return valor
+            return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+    return str(valor)
+
+
+class Filtro:
+    """
+    Un filtro del listado. `operador` es '=', '>=', '<=' o 'LIKE' (busca el
+    texto en cualquier posición). Un filtro vacío no entra en el WHERE,
+    salvo los obligatorios.
+    """
+
+    def __init__(self, nombre, columna, operador='=', tipo='texto', obligatorio=False):
+        self.nombre = nombre
+        self.columna = columna
+        self.operador = operador
+        self.tipo = tipo
+        self.obligatorio = obligatorio
+
+    def sql(self):
+        return f"{self.columna} {self.operador} ?"
+
+    def parametro(self, valor):
+        """Valor a enviar, o None si el filtro no se aplica."""
+        valor = _convertir(valor, self.tipo)
+        if valor is not None and self.operador == 'LIKE':
+            valor = f'%{valor}%'
+        return valor
+
+
+class Listado:
+    """
+    Definición de un listado:
+
+        LISTADO = Listado(
+            columnas="tipo, folio, fecha",
+            origen="comprobantes",
+            filtros=[Filtro('tipo', 'tipo', 'LIKE'), ...],
+            ordenes={'fecha': "fecha DESC, creado_en DESC"},
+        )
+        filas, total, page, total_pages = LISTADO.pagina(request.args, page=2)
+
+    `ordenes` es la lista blanca de ORDER BY; la primera entrada es la de
+    por defecto. `agrupar` se agrega como GROUP BY después del WHERE.
+    """
+
+    def __init__(self, columnas, origen, filtros, ordenes, agrupar=None):
+        self.columnas = columnas
+        self.origen = origen
+        self.filtros = filtros
+        self.ordenes = ordenes
+        self.agrupar = agrupar
+
+    def _filtrar(self, valores):
+        """(FROM ... WHERE ... con los filtros activos, parámetros, tipos)."""
+        condiciones, params, tipos = [], [], []
+        for f in self.filtros:
+            valor = f.parametro(valores.get(f.nombre))
+            if valor is None and not f.obligatorio:
+                continue
+            condiciones.append(f.sql())
+            params.append(valor)
+            tipos.append(TIPOS_SQL[f.tipo])
+        desde = f"FROM {self.origen} WHERE {' AND '.join(condiciones) or '1=1'}"
+        if self.agrupar:
+            desde += f" GROUP BY {self.agrupar}"
+        return desde, params, tipos
+
+    def _orden(self, orden):
+        return self.ordenes.get(orden) or next(iter(self.ordenes.values()))
+
+    def sql(self, valores, orden=None, paginado=False):
+        """(consulta, parámetros, tipos) para los filtros de `valores`."""
+        desde, params, tipos = self._filtrar(valores)
+        query = f"SELECT {self.columnas} {desde} ORDER BY {self._orden(orden)}"
+        if paginado:
+            query += " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+        return query, params, tipos
+
+    def sql_conteo(self, valores):
+        desde, params, tipos = self._filtrar(valores)
+        if self.agrupar:
+            return f"SELECT COUNT(*) FROM (SELECT 1 AS x {desde}) t", params, tipos
+        return f"SELECT COUNT(*) {desde}", params, tipos
+
+    def contar(self, valores, cursor):
+        query, params, tipos = self.sql_conteo(valores)
+        if tipos:
+            cursor.setinputsizes(tipos)
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+    def pagina(self, valores, page=1, per_page=20, orden=None, readonly=False):
+        """
+        Devuelve (filas, total, page, total_pages). La página se ajusta al
+        rango válido antes de calcular el OFFSET.
+        """
+        conn = get_connection(readonly=readonly)
+        cursor = conn.cursor()
+        try:
+            total = self.contar(valores, cursor)
+            total_pages = max(1, (total + per_page - 1) // per_page)
+            page = min(max(1, page or 1), total_pages)
+
+            query, params, tipos = self.sql(valores, orden, paginado=True)
+            cursor.setinputsizes(tipos + [TIPOS_SQL['entero']] * 2)
+            cursor.execute(query, params + [(page - 1) * per_page, per_page])
+            return cursor.fetchall(), total, page, total_pages
+        finally:
+            conn.close()
+
+    def todas(self, valores, orden=None):
+        """Todas las filas que cumplen los filtros, en una lista."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            query, params, tipos = self.sql(valores, orden)
+            if tipos:
+                cursor.setinputsizes(tipos)
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def iterar(self, valores, orden=None, readonly=True):
+        """Como todas(), pero en streaming (iter_rows) para exportaciones."""
+        query, params, tipos = self.sql(valores, orden)
+        return iter_rows(query, params, readonly=readonly, tipos=tipos)
@@ -0,0 +1,134 @@
+# utils/migraciones.py
+"""
+Migraciones de esquema versionadas.
+
+Los scripts viven en BaseDatos/migraciones con nombre NNNN_descripcion.sql
+y se aplican en orden numérico. Cada script se ejecuta en una transacción
+(los lotes se separan con GO, como en SSMS) y su versión queda registrada
+en la tabla schema_migraciones; volver a ejecutar el comando solo aplica
+las pendientes.
+
+    flask --app app migrar            # aplica las pendientes
+    flask --app app migrar --listar   # muestra el estado sin aplicar
+    python -m utils.migraciones
+"""
+import hashlib
+import os
+import re
+
+from config.db import get_connection
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'BaseDatos', 'migraciones')
+
+_RE_ARCHIVO = re.compile(r'^(\d+)_(.+)\.sql$')
+_RE_GO = re.compile(r'^\s*GO\s*$', re.IGNORECASE | re.MULTILINE)
+
+TABLA_VERSIONES = """
+    IF OBJECT_ID('dbo.schema_migraciones', 'U') IS NULL
+        CREATE TABLE dbo.schema_migraciones (
+            version INT NOT NULL PRIMARY KEY,
+            nombre NVARCHAR(200) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            aplicada_en DATETIME2 NOT NULL DEFAULT SYSDATETIME()
+        )
+"""
+
+
+def listar_scripts(directorio=DIRECTORIO):
+    """Devuelve [(version, nombre, ruta)] ordenados por versión."""
+    scripts = []
+    for archivo in os.listdir(directorio):
+        coincidencia = _RE_ARCHIVO.match(archivo)
+        if coincidencia:
+            scripts.append((int(coincidencia.group(1)), coincidencia.group(2),
+                            os.path.join(directorio, archivo)))
+    return sorted(scripts)
+
+
+def dividir_lotes(sql):
+    """Separa un script T-SQL en lotes por las líneas GO."""
+    return [lote.strip() for lote in _RE_GO.split(sql) if lote.strip()]
+
+
+def _versiones_aplicadas(cursor):
+    cursor.execute("SELECT version, checksum FROM dbo.schema_migraciones")
+    return {fila[0]: fila[1] for fila in cursor.fetchall()}
+
+
+def estado_migraciones(directorio=DIRECTORIO):
+    """[(version, nombre, aplicada)] para todos los scripts del directorio."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(TABLA_VERSIONES)
+        conn.commit()
+        aplicadas = _versiones_aplicadas(cursor)
+        return [(v, nombre, v in aplicadas) for v, nombre, _ in listar_scripts(directorio)]
+    finally:
+        conn.close()
+
+
+def aplicar_migraciones(directorio=DIRECTORIO, log=print):
+    """
+    Aplica los scripts pendientes en orden. Si uno falla se revierte ese
+    script y se detiene; los anteriores quedan aplicados. Devuelve las
+    versiones aplicadas en esta ejecución.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    aplicadas_ahora = []
+    try:
+        cursor.execute(TABLA_VERSIONES)
+        conn.commit()
+        aplicadas = _versiones_aplicadas(cursor)
+
+        for version, nombre, ruta in listar_scripts(directorio):
+            with open(ruta, encoding='utf-8-sig') as f:
+                sql = f.read()
+            checksum = hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+            if version in aplicadas:
+                if aplicadas[version] != checksum:
+                    log(f"Aviso: la migración {version:04d}_{nombre} cambió después de aplicarse")
+                continue
+
+            log(f"Aplicando {version:04d}_{nombre}...")
+            try:
+                for lote in dividir_lotes(sql):
+                    cursor.execute(lote)
+                cursor.execute("""
+                    INSERT INTO dbo.schema_migraciones (version, nombre, checksum)
+                    VALUES (?, ?, ?)
+                """, (version, nombre, checksum))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                log(f"Error en la migración {version:04d}_{nombre}; se revirtió")
+                raise
+            aplicadas_ahora.append(version)
+
+        if not aplicadas_ahora:
+            log("No hay migraciones pendientes")
+        return aplicadas_ahora
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Registra el comando `flask migrar`."""
+    import click
+
+    @app.cli.command('migrar')
+    @click.option('--listar', is_flag=True, help='Muestra el estado sin aplicar nada.')
+    def migrar(listar):
+        """Aplica las migraciones pendientes de BaseDatos/migraciones."""
+        if listar:
+            for version, nombre, aplicada in estado_migraciones():
+                click.echo(f"{version:04d}_{nombre}: {'aplicada' if aplicada else 'pendiente'}")
+        else:
+            aplicar_migraciones(log=click.echo)
+
+
+if __name__ == '__main__':
+    aplicar_migraciones()
@@ -0,0 +1,65 @@
+# utils/periodos.py
+"""
+Periodos de comparación para los informes (estado de resultados).
+
+Los desplazamientos son por calendario: un rango de meses completos se
+compara con los mismos meses anteriores (marzo con febrero, no con los 31
+días previos) y un fin de mes sigue siendo fin de mes (28 de febrero de
+2025 -> 29 de febrero de 2024). Los periodos pueden solaparse: el año
+anterior de un rango de más de doce meses pisa el rango actual.
+"""
+import calendar
+from datetime import timedelta
+
+
+def _ultimo_dia(anio, mes):
+    return calendar.monthrange(anio, mes)[1]
+
+
+def sumar_meses(fecha, meses):
+    """
+    La fecha `meses` meses después (antes si es negativo). El día se
+    recorta al último del mes de destino y un fin de mes queda en fin de mes.
+    """
+    anio, mes = divmod(fecha.year * 12 + fecha.month - 1 + meses, 12)
+    mes += 1
+    if fecha.day == _ultimo_dia(fecha.year, fecha.month):
+        return fecha.replace(year=anio, month=mes, day=_ultimo_dia(anio, mes))
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, _ultimo_dia(anio, mes)))
+
+
+def restar_anio(fecha):
+    return sumar_meses(fecha, -12)
+
+
+def periodo_anterior(desde, hasta):
+    """
+    (desde, hasta) del periodo anterior. Si empieza el día 1 se corre tantos
+    meses como abarca (el mes o el trimestre anterior, o los mismos días del
+    mes anterior si el último mes va a medias); si no, los mismos días justo
+    antes de `desde`.
+    """
+    if desde.day == 1:
+        meses = (hasta.year - desde.year) * 12 + hasta.month - desde.month + 1
+        return sumar_meses(desde, -meses), sumar_meses(hasta, -meses)
+    duracion = hasta - desde
+    return desde - duracion - timedelta(days=1), desde - timedelta(days=1)
+
+
+def periodos_comparativos(desde, hasta, comparar):
+    """[(desde, hasta, etiqueta)]: el periodo pedido primero y luego los de comparación."""
+    if comparar == 'meses':
+        periodos = []
+        inicio_mes = hasta.replace(day=1)
+        for _ in range(12):
+            fin_mes = min(inicio_mes.replace(day=_ultimo_dia(inicio_mes.year, inicio_mes.month)), hasta)
+            periodos.append((inicio_mes, fin_mes, inicio_mes.strftime('%Y-%m')))
+            inicio_mes = sumar_meses(inicio_mes, -1)
+        return periodos
+
+    periodos = [(desde, hasta, 'Actual')]
+    if comparar in ('anterior', 'ambas'):
+        periodos.append((*periodo_anterior(desde, hasta), 'Anterior'))
+    if comparar in ('anio', 'ambas'):
+        periodos.append((restar_anio(desde), restar_anio(hasta), 'Año anterior'))
+    return periodos
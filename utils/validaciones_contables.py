@@ -1,5 +1,7 @@
 # utils/validaciones_contables.py
 from config.db import get_connection
+from utils.eventos import emitir_al_confirmar
+from models.cuentas_actividad import actualizar_actividad
 
 def validar_comprobante_contable(tipo, folio):
     """
@@ -76,61 +78,44 @@ def registrar_comprobante(tipo, folio):
         if not valido:
             return False, mensaje
         
-        # 2. Obtener asientos
-        cursor.execute("""
-            SELECT id_cuenta, debe, haber FROM asientos_contables 
-            WHERE id_comprobante_tipo = ? AND id_comprobante_folio = ?
-        """, (tipo, folio))
-        
-        asientos = cursor.fetchall()
-        
-        # 3. Obtener período (año-mes actual)
+        # 2. Obtener período (año-mes actual)
         from datetime import datetime
         periodo_actual = datetime.now().year * 100 + datetime.now().month
-        
-        # 4. Actualizar saldos por cada asiento
-        for asiento in asientos:
-            id_cuenta = asiento.id_cuenta
-            debe_val = float(asiento.debe) if asiento.debe else 0
-            haber_val = float(asiento.haber) if asiento.haber else 0
-            monto = debe_val - haber_val
-            
-            # Verificar si existe saldo para este período
-            cursor.execute("""
-                SELECT saldo_final FROM saldos_cuentas 
-                WHERE id_cuenta = ? AND periodo = ?
-            """, (id_cuenta, periodo_actual))
-            
-            saldo_existente = cursor.fetchone()
-            
-            if saldo_existente:
-                # Actualizar saldo existente
-                nuevo_saldo = float(saldo_existente.saldo_final) + monto
-                cursor.execute("""
-                    UPDATE saldos_cuentas 
-                    SET saldo_final = ? 
-                    WHERE id_cuenta = ? AND periodo = ?
-                """, (nuevo_saldo, id_cuenta, periodo_actual))
-            else:
-                # Obtener último saldo anterior
-                cursor.execute("""
-                    SELECT saldo_final FROM saldos_cuentas 
-                    WHERE id_cuenta = ? AND periodo < ?
-                    ORDER BY periodo DESC
-                """, (id_cuenta, periodo_actual))
-                
-                saldo_anterior = cursor.fetchone()
-                saldo_inicial = float(saldo_anterior.saldo_final) if saldo_anterior else 0
-                saldo_final = saldo_inicial + monto
-                
-                # Insertar nuevo registro de saldo
-                cursor.execute("""
-                    INSERT INTO saldos_cuentas 
-                    (id_cuenta, periodo, saldo_inicial, saldo_final, creado_en)
-                    VALUES (?, ?, ?, ?, GETDATE())
-                """, (id_cuenta, periodo_actual, saldo_inicial, saldo_final))
-        
-        # 5. Actualizar estado del comprobante
+
+        # 3. Actualizar saldos en bloque: un UPDATE para las cuentas que ya
+        #    tienen saldo en el período y un INSERT...SELECT para las demás,
+        #    partiendo del último saldo anterior de cada cuenta.
+        movimientos = """
+            SELECT id_cuenta, SUM(ISNULL(debe, 0) - ISNULL(haber, 0)) AS monto
+            FROM asientos_contables
+            WHERE id_comprobante_tipo = ? AND id_comprobante_folio = ?
+            GROUP BY id_cuenta
+        """
+        cursor.execute(f"""
+            UPDATE s
+            SET saldo_final = ISNULL(s.saldo_final, 0) + m.monto
+            FROM saldos_cuentas s
+            JOIN ({movimientos}) m ON m.id_cuenta = s.id_cuenta
+            WHERE s.periodo = ?
+        """, (tipo, folio, periodo_actual))
+
+        cursor.execute(f"""
+            INSERT INTO saldos_cuentas
+            (id_cuenta, periodo, saldo_inicial, saldo_final, creado_en)
+            SELECT m.id_cuenta, ?, ISNULL(ant.saldo_final, 0), ISNULL(ant.saldo_final, 0) + m.monto, GETDATE()
+            FROM ({movimientos}) m
+            OUTER APPLY (
+                SELECT TOP 1 saldo_final FROM saldos_cuentas
+                WHERE id_cuenta = m.id_cuenta AND periodo < ?
+                ORDER BY periodo DESC
+            ) ant
+            WHERE NOT EXISTS (
+                SELECT 1 FROM saldos_cuentas s
+                WHERE s.id_cuenta = m.id_cuenta AND s.periodo = ?
+            )
+        """, (periodo_actual, tipo, folio, periodo_actual, periodo_actual))
+        
+        # 4. Actualizar estado del comprobante
         cursor.execute("""
             UPDATE comprobantes 
             SET estado = 'Registrado' 
@@ -138,6 +123,8 @@ def registrar_comprobante(tipo, folio):
         """, (tipo, folio))
         
         conn.commit()
+        emitir_al_confirmar('comprobante', tipo=tipo, folio=folio)
+        emitir_al_confirmar('saldo', id_cuenta=None, periodo=periodo_actual)
         return True, "Comprobante registrado exitosamente"
         
     except Exception as e:
@@ -192,41 +179,29 @@ def crear_comprobante_reverso(tipo_original, folio_original, nuevo_tipo, nuevo_f
             comprobante_original.id_proveedor
         ))
         
-        # 4. Obtener asientos originales
+        # 4. Copiar los asientos originales intercambiando debe/haber,
+        #    en una sola sentencia en el servidor
         cursor.execute("""
-            SELECT consecutivo, id_cuenta, fecha, concepto, 
-                   debe, haber, referencia
-            FROM asientos_contables 
+            INSERT INTO asientos_contables
+            (id_comprobante_tipo, id_comprobante_folio, consecutivo,
+             id_cuenta, fecha, concepto, debe, haber, referencia, creado_en)
+            SELECT ?, ?, consecutivo, id_cuenta, fecha,
+                   CASE WHEN concepto IS NULL OR concepto = '' THEN 'Reverso'
+                        ELSE 'REVERSO: ' + concepto END,
+                   ISNULL(haber, 0), ISNULL(debe, 0), referencia, GETDATE()
+            FROM asientos_contables
             WHERE id_comprobante_tipo = ? AND id_comprobante_folio = ?
-            ORDER BY consecutivo
-        """, (tipo_original, folio_original))
+        """, (nuevo_tipo, nuevo_folio, tipo_original, folio_original))
         
-        asientos_originales = cursor.fetchall()
-        
-        # 5. Insertar asientos reversados (intercambiar debe/haber)
-        for asiento in asientos_originales:
-            # Intercambiar debe y haber
-            nuevo_debe = float(asiento.haber) if asiento.haber else 0
-            nuevo_haber = float(asiento.debe) if asiento.debe else 0
-            
-            cursor.execute("""
-                INSERT INTO asientos_contables 
-                (id_comprobante_tipo, id_comprobante_folio, consecutivo, 
-                 id_cuenta, fecha, concepto, debe, haber, referencia, creado_en)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, GETDATE())
-            """, (
-                nuevo_tipo,
-                nuevo_folio,
-                asiento.consecutivo,
-                asiento.id_cuenta,
-                asiento.fecha,
-                f"REVERSO: {asiento.concepto}" if asiento.concepto else "Reverso",
-                nuevo_debe,
-                nuevo_haber,
-                asiento.referencia
-            ))
+        cursor.execute("""
+            SELECT DISTINCT id_cuenta FROM asientos_contables
+            WHERE id_comprobante_tipo = ? AND id_comprobante_folio = ?
+        """, (nuevo_tipo, nuevo_folio))
+        cuentas = [fila[0] for fila in cursor.fetchall()]
+        actualizar_actividad(cursor, *cuentas)
         
         conn.commit()
+        emitir_al_confirmar('comprobante', tipo=nuevo_tipo, folio=nuevo_folio, cuentas=cuentas)
         return True, "Comprobante de reversión creado exitosamente"
         
     except Exception as e: